@@ -9,13 +9,31 @@ from utils.logger import Logger
 from managers.agents_manager import AgentsManager
 from managers.objective_manager import ObjectiveManager
 from managers.aider_manager import AiderManager
+from managers.worktree_manager import WorktreeManager
+from utils.rate_limiter import get_rate_limiter
+from utils.runtime_metrics import get_runtime_metrics
+from utils.concurrency_controller import ConcurrencyController, CONTROL_INTERVAL
+from utils.file_leases import FileLeaseTable, parse_write_files, SHARED_FILES
+from utils.git_utils import ensure_union_merge
+from utils.llm_gateway import get_llm_gateway
 
 # Configuration constants
 DEFAULT_MODEL = None  # Will use the model passed in from command line
 DEFAULT_AGENT_COUNT = 10
-AGENT_START_DELAY = 10  # seconds between agent starts
+CYCLE_TOKEN_ESTIMATE = 10000  # tokens an objective planning round typically uses
+MAX_PLANNING_ROUNDS = 2  # objective planning rounds running ahead at once
+OBJECTIVE_BATCH_SIZE = int(os.getenv('OBJECTIVE_BATCH_SIZE', 4))  # agents planned per completion
+IDLE_AGENT_MAX_AGE = 1800  # seconds an agent with unchanged inputs is held back
+IDLE_CHECK_INTERVAL = 30  # seconds between checks for new inputs while slots are empty
 DEFAULT_MISSION_FILE = ".aider.mission.md"
 
+
+def _retrieve_exception(task):
+    """Done-callback marking the exception of a task nobody may await as retrieved."""
+    if not task.cancelled():
+        task.exception()
+
+
 class AgentRunner:
     """Runner class for executing and managing agent operations.
     
@@ -28,6 +46,12 @@ class AgentRunner:
         agents_manager (AgentsManager): Manager for agent generation and configuration
         objective_manager (ObjectiveManager): Manager for agent objectives
         aider_manager (AiderManager): Manager for aider operations
+        rate_limiter (RateLimiter): Requests/tokens per minute admission controller
+        worktree_manager (WorktreeManager): Per-agent worktrees, set in isolation mode
+        file_leases (FileLeaseTable): Write sets held by running cycles
+        _prefetches (dict): Objective planning tasks started ahead of time, by agent
+        _planning_rounds (set): Planning rounds still running, each resolving
+            the prefetches of several agents
         _active_agents (set): Set of currently active agent names
         _agent_lock (asyncio.Lock): Lock for synchronizing agent operations
     """
@@ -38,6 +62,12 @@ class AgentRunner:
         self.agents_manager = AgentsManager(model=model)
         self.objective_manager = ObjectiveManager(model=model)
         self.aider_manager = AiderManager(model=model)
+        self.rate_limiter = get_rate_limiter(model)
+        self.worktree_manager = None
+        self.file_leases = FileLeaseTable()
+        self._prefetches = {}
+        self._planning_rounds = set()
+        self.mission_filepath = DEFAULT_MISSION_FILE
         self._active_agents = set()  # Track active agents
         self._agent_lock = asyncio.Lock()  # Use asyncio.Lock for async operations
         self.model = model
@@ -83,8 +113,23 @@ class AgentRunner:
         return await runner.initialize()
         
     async def run(self, mission_filepath=DEFAULT_MISSION_FILE, generate_agents=False, 
-                 agent_count=DEFAULT_AGENT_COUNT, model=None):
-        """Run agents in parallel."""
+                 agent_count=DEFAULT_AGENT_COUNT, model=None, min_agents=None, max_agents=None,
+                 isolate=False):
+        """
+        Run agents in parallel.
+        
+        Args:
+            mission_filepath (str): Path to mission file
+            generate_agents (bool): Regenerate agent files before running
+            agent_count (int): Number of agents running concurrently (initial
+                value when adaptive concurrency is enabled)
+            model (str): Model used by aider
+            min_agents (int, optional): Lower bound enabling adaptive concurrency
+            max_agents (int, optional): Upper bound enabling adaptive concurrency
+            isolate (bool): Run each agent in its own git worktree and merge
+                the results back in batches
+        """
+        self.mission_filepath = mission_filepath
         try:
             # First validate mission file
             if not os.path.exists(mission_filepath):
@@ -104,29 +149,62 @@ class AgentRunner:
                 self.logger.info("🔄 Generating agents automatically...")
                 await self.agents_manager.generate_agents(mission_filepath)
 
+            # Adaptive mode grows or shrinks the agent count within the given bounds
+            controller = None
+            if min_agents is not None or max_agents is not None:
+                controller = ConcurrencyController(
+                    initial=agent_count,
+                    minimum=min_agents or 1,
+                    maximum=max_agents or agent_count,
+                    logger=self.logger
+                )
+                agent_count = controller.target
+                self.logger.info(f"🎚️ Adaptive concurrency between {controller.minimum} and {controller.maximum} agents")
+
+            if isolate:
+                # Files every agent edits are merged line-wise instead of leased
+                try:
+                    await ensure_union_merge(SHARED_FILES)
+                except Exception as e:
+                    self.logger.warning(f"⚠️ Could not configure union merge for shared files: {str(e)}")
+                self.worktree_manager = WorktreeManager(self.aider_manager, logger=self.logger)
+
             self.logger.info(f"🚀 Starting with {agent_count} agents in parallel")
 
+            # Plan the first agents' objectives in one round
+            self._start_prefetch(mission_filepath)
+
             # Create initial pool of agents
             tasks = set()
             available_agents = self._get_available_agents()
             if not available_agents:
                 raise ValueError("No agents available to run")
                 
-            # Create initial tasks up to agent_count
-            for i in range(min(agent_count, len(available_agents))):
-                task = asyncio.create_task(
-                    self._run_single_agent_cycle(mission_filepath, model)
-                )
-                tasks.add(task)
-                await asyncio.sleep(10)  # 10 second delay between each start
-
-            if not tasks:
-                raise ValueError("No tasks could be created")
+            # Create initial tasks up to agent_count, admitting each agent
+            # as soon as the API quota has room for its planning calls
+            await self._start_agent_cycles(tasks, min(agent_count, len(available_agents)), mission_filepath, model)
+            next_idle_check = time.monotonic() + IDLE_CHECK_INTERVAL
 
             # Maintain active agent count
-            while tasks:
-                # Wait for an agent to complete
-                done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            while True:
+                # Slots left empty because no agent had new inputs are filled
+                # when a cycle ends (its edits are new inputs for the others)
+                # or, for changes made outside KinOS, after IDLE_CHECK_INTERVAL
+                timeouts = [CONTROL_INTERVAL] if controller else []
+                if len(tasks) < min(agent_count, len(available_agents)):
+                    timeouts.append(max(0.0, next_idle_check - time.monotonic()))
+                timeout = min(timeouts) if timeouts else None
+
+                # Wait for an agent to complete (or for the next controller update)
+                if tasks:
+                    done, pending = await asyncio.wait(
+                        tasks,
+                        timeout=timeout,
+                        return_when=asyncio.FIRST_COMPLETED
+                    )
+                else:
+                    await asyncio.sleep(IDLE_CHECK_INTERVAL if timeout is None else timeout)
+                    done, pending = set(), set()
                 
                 # Handle completed agents
                 for task in done:
@@ -134,20 +212,24 @@ class AgentRunner:
                         await task  # Get potential errors
                     except Exception as e:
                         self.logger.error(f"Agent task failed: {str(e)}")
+
+                previous_count = agent_count
+                if controller:
+                    agent_count = controller.update()
                     
-                    # Refresh available agents list
-                    available_agents = self._get_available_agents()
-                    
-                    # Create new agent to replace completed one
-                    if len(pending) < agent_count and available_agents:
-                        await asyncio.sleep(3)  # Delay before starting new agent
-                        new_task = asyncio.create_task(
-                            self._run_single_agent_cycle(mission_filepath, model)
-                        )
-                        pending.add(new_task)
-                        self.logger.info(f"🔄 Replaced completed agent. Active agents: {len(pending)}/{agent_count}")
-                    else:
-                        self.logger.warning(f"⚠️ Could not replace agent. Pending: {len(pending)}, Target: {agent_count}, Available: {len(available_agents)}")
+                # Refresh available agents list
+                available_agents = self._get_available_agents()
+                if done and not available_agents:
+                    self.logger.warning(f"⚠️ Could not replace agent. Pending: {len(pending)}, Target: {agent_count}, Available: 0")
+                
+                # Start new agents up to the target; when the target shrinks,
+                # running cycles are left to finish and simply not replaced
+                free_slots = min(agent_count, len(available_agents)) - len(pending)
+                if free_slots > 0 and (done or agent_count > previous_count or time.monotonic() >= next_idle_check):
+                    started = await self._start_agent_cycles(pending, free_slots, mission_filepath, model)
+                    next_idle_check = time.monotonic() + IDLE_CHECK_INTERVAL
+                    if started:
+                        self.logger.info(f"🔄 Started {started} agent cycle(s). Active agents: {len(pending)}/{agent_count}")
                 
                 # Update tasks set
                 tasks = pending
@@ -156,6 +238,20 @@ class AgentRunner:
             self.logger.error(f"Error during execution: {str(e)}")
             raise
             
+        finally:
+            for prefetch in self._prefetches.values():
+                prefetch.cancel()
+            for planning_round in self._planning_rounds:
+                planning_round.cancel()
+            self._prefetches = {}
+            self._planning_rounds = set()
+            llm_stats = get_llm_gateway().stats()
+            if any(llm_stats.values()):
+                self.logger.info("📊 LLM gateway: " + ", ".join(f"{k} {v}" for k, v in llm_stats.items()))
+            if self.worktree_manager:
+                await self.worktree_manager.shutdown()
+            await self.aider_manager.shutdown()
+            
     def _get_agent_emoji(self, agent_type):
         """Get the appropriate emoji for an agent type."""
         agent_emojis = {
@@ -205,16 +301,33 @@ class AgentRunner:
                 
         return missing_agents
         
-    async def _run_single_agent_cycle(self, mission_filepath, model=None):
-        """Execute a single cycle for one agent."""
-        agent_name = None
-        try:
-            # Select an unused agent
-            agent_name = await self._select_available_agent()
-            if not agent_name:
-                await asyncio.sleep(1)  # Wait if no agent available
-                return
+    async def _start_agent_cycles(self, tasks, count, mission_filepath, model=None):
+        """
+        Start cycles for up to count agents with new inputs.
+        
+        Agents are selected in one pass, so inputs are fingerprinted once
+        however many slots are free.
+        
+        Args:
+            tasks (set): Running cycle tasks, the new ones are added to it
+            count (int): Number of free slots
+            mission_filepath (str): Path to mission file
+            model (str): Model used by aider
             
+        Returns:
+            int: Number of cycles started
+        """
+        agent_names = await self._select_available_agents(count)
+        for agent_name in agent_names:
+            await self.rate_limiter.wait_for_capacity(CYCLE_TOKEN_ESTIMATE)
+            tasks.add(asyncio.create_task(
+                self._run_single_agent_cycle(agent_name, mission_filepath, model)
+            ))
+        return len(agent_names)
+
+    async def _run_single_agent_cycle(self, agent_name, mission_filepath, model=None):
+        """Execute a single cycle for an agent selected by _select_available_agents."""
+        try:
             start_time = time.time()
             self.logger.info(f"🕐 Agent {agent_name} starting cycle at {start_time}")
             
@@ -227,6 +340,7 @@ class AgentRunner:
             
             end_time = time.time()
             duration = end_time - start_time
+            get_runtime_metrics().record_cycle(duration)
             self.logger.info(f"⏱️ Agent {agent_name} completed cycle in {duration:.2f} seconds")
             
         except Exception as e:
@@ -240,14 +354,20 @@ class AgentRunner:
                     if agent_name in self._active_agents:
                         self._active_agents.remove(agent_name)
 
-    async def _select_available_agent(self):
-        """Select an unused agent in a thread-safe way.
+    async def _select_available_agents(self, count):
+        """Select unused agents in a thread-safe way.
         
         This method ensures proper synchronization when selecting agents
-        to prevent race conditions in parallel execution.
+        to prevent race conditions in parallel execution. Agents whose inputs
+        did not change since their last cycle are skipped; among the others,
+        agents with a free write set and a prefetched objective come first.
         
+        Args:
+            count (int): Maximum number of agents to select
+            
         Returns:
-            str: Name of selected agent, or None if no agents available
+            list: Names of the selected agents, now marked active (empty if
+                no agent has new inputs)
             
         Thread Safety:
             This method uses asyncio.Lock for thread-safe agent selection
@@ -257,159 +377,140 @@ class AgentRunner:
             unused_agents = [a for a in available_agents if a not in self._active_agents]
             
             if not unused_agents:
-                return None
-                
-            agent_name = random.choice(unused_agents)
-            self._active_agents.add(agent_name)
-            return agent_name
-            
-    def _get_folder_context(self, folder_path: str, files: list, subfolders: list, mission_content: str) -> dict:
-        """
-        Get folder purpose and relationships using GPT.
+                return []
+
+            # Skip agents with nothing new to react to since their last cycle
+            changed_agents = self._get_changed_agents(unused_agents)
+            if not changed_agents:
+                self.logger.debug("💤 No available agent has new inputs, waiting")
+                return []
+
+            # Prefer agents whose last write set does not overlap running cycles
+            write_files = {a: self._get_last_write_files(a) for a in changed_agents}
+            selected = []
+            while changed_agents and len(selected) < count:
+                free_agents = [
+                    a for a in changed_agents
+                    if self.file_leases.is_free(write_files[a], a)
+                ] or changed_agents
+
+                # Then agents whose next objective is already being planned
+                prefetched_agents = [a for a in free_agents if a in self._prefetches]
+                    
+                agent_name = random.choice(prefetched_agents or free_agents)
+                changed_agents.remove(agent_name)
+                self._active_agents.add(agent_name)
+                selected.append(agent_name)
+            return selected
+            
+    def _start_prefetch(self, mission_filepath):
+        """Start planning the objectives of idle agents likely to be scheduled next.
         
+        Up to OBJECTIVE_BATCH_SIZE agents are planned together in one completion,
+        so the shared context is sent once per round instead of once per agent.
+        At most MAX_PLANNING_ROUNDS rounds run at once.
+        """
+        idle_agents = [a for a in self._get_available_agents() if a not in self._active_agents]
+        changed_agents = self._get_changed_agents(idle_agents)
+        self._evict_prefetches(changed_agents)
+        if len(self._planning_rounds) >= MAX_PLANNING_ROUNDS:
+            return
+
+        candidates = [a for a in changed_agents if a not in self._prefetches]
+        if not candidates:
+            return
+
+        agent_names = random.sample(candidates, min(len(candidates), max(1, OBJECTIVE_BATCH_SIZE)))
+        self.logger.debug(f"🔮 Planning next objectives for {', '.join(agent_names)} ahead of time")
+        planning_round = asyncio.create_task(
+            self.objective_manager.plan_objectives(
+                mission_filepath,
+                [f".aider.agent.{agent_name}.md" for agent_name in agent_names]
+            )
+        )
+        self._planning_rounds.add(planning_round)
+        planning_round.add_done_callback(self._planning_rounds.discard)
+        planning_round.add_done_callback(_retrieve_exception)
+
+        async def take_plan(agent_name):
+            plans = await planning_round
+            return plans.get(agent_name)
+
+        # One entry per agent, all resolved by the same planning round
+        for agent_name in agent_names:
+            prefetch = asyncio.create_task(take_plan(agent_name))
+            prefetch.add_done_callback(_retrieve_exception)  # the agent may never be picked
+            self._prefetches[agent_name] = prefetch
+
+    def _evict_prefetches(self, changed_agents):
+        """
+        Drop prefetched objectives that will not be used.
+
+        An entry is dropped when its planning failed, its plan is outdated, or
+        its agent has no new inputs any more (and would not be scheduled).
+
         Args:
-            folder_path (str): Path to current folder
-            files (list): List of files in folder
-            subfolders (list): List of subfolders
-            mission_content (str): Overall mission context
-            
-        Returns:
-            dict: Folder context including:
-                - purpose: Folder's main purpose
-                - relationships: Dict of folder relationships
-                    - parent: Relationship with parent folder
-                    - siblings: Relationships with sibling folders
-                    - children: Relationships with child folders
+            changed_agents (list): Idle agents that have new inputs
         """
-        if not folder_path:
-            raise ValueError("folder_path cannot be empty")
-            
-        try:
-            # Normalize paths
-            abs_path = os.path.abspath(folder_path)
-            if not self._validate_path_in_project(abs_path):
-                raise ValueError(f"Path {folder_path} is outside project directory")
-            rel_path = os.path.relpath(abs_path, self.project_root)
-            
-            # Generate cache key using relative path for consistency
-            cache_key = f"{rel_path}:{','.join(sorted(files))}:{','.join(sorted(subfolders))}"
-            
-            # Check cache first
-            if hasattr(self, '_context_cache'):
-                cached = self._context_cache.get(cache_key)
-                if cached:
-                    self.logger.debug(f"Using cached context for {rel_path}")
-                    return cached
+        changed_agents = set(changed_agents)
+        for agent_name, prefetch in list(self._prefetches.items()):
+            if agent_name in self._active_agents:
+                continue  # being taken by its cycle
+            if agent_name not in changed_agents:
+                stale = True
+            elif not prefetch.done():
+                stale = False
             else:
-                self._context_cache = {}
-
-            # Initialize context with validated paths
-            context = {
-                'path': abs_path,  # Internal absolute path
-                'display_path': rel_path,  # Display relative path
-                'purpose': '',
-                'relationships': {
-                    'parent': 'No parent relationship specified',
-                    'siblings': 'No sibling relationships specified',
-                    'children': 'No children relationships specified'
-                }
-            }
-
-            # Create and execute GPT prompt
-            prompt = self._create_folder_context_prompt(rel_path, files, subfolders, mission_content)
-            self.logger.debug(f"\n🔍 FOLDER CONTEXT PROMPT for {rel_path}:\n{prompt}")
-            
-            client = openai.OpenAI()
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "You are a technical architect analyzing project structure. Always respond in the exact format requested."},
-                    {"role": "user", "content": prompt}
-                ],
-                temperature=0.3,
-                max_tokens=500
-            )
-            
-            content = response.choices[0].message.content.strip()
-            self.logger.debug(f"\n✨ FOLDER CONTEXT RESPONSE:\n{content}")
-            
-            # Parse response and update context
-            for line in content.split('\n'):
-                line = line.strip()
-                if not line:
-                    continue
-                    
-                if line.startswith('Purpose:'):
-                    context['purpose'] = line.replace('Purpose:', '').strip()
-                elif line.startswith('Parent:'):
-                    context['relationships']['parent'] = line.replace('Parent:', '').strip()
-                elif line.startswith('Siblings:'):
-                    context['relationships']['siblings'] = line.replace('Siblings:', '').strip()
-                elif line.startswith('Children:'):
-                    context['relationships']['children'] = line.replace('Children:', '').strip()
-            
-            # Validate required fields
-            if not context['purpose']:
-                context['purpose'] = f"Storage folder for {os.path.basename(rel_path)} content"
-                self.logger.warning(f"Generated default purpose for {rel_path}")
-                
-            # Cache the result
-            self._context_cache[cache_key] = context
-            return context
-            
-        except Exception as e:
-            self.logger.error(f"Failed to get folder context for {rel_path}: {str(e)}")
-            raise
+                stale = (prefetch.cancelled() or prefetch.exception() is not None
+                         or prefetch.result() is None
+                         or not self.objective_manager.is_objective_current(prefetch.result()))
+            if stale:
+                prefetch.cancel()
+                del self._prefetches[agent_name]
+                self.logger.debug(f"🗑️ Dropped prefetched objective of {agent_name}")
 
-    def _get_folder_context_for_path(self, folder_path: str) -> dict:
+    async def _take_prefetched_objective(self, agent_name):
         """
-        Get folder context for a specific path.
+        Return the objective planned ahead for an agent, if still valid.
         
-        Args:
-            folder_path (str): Path to get context for
-            
         Returns:
-            dict: Folder context including path and purpose
-            
-        Note:
-            Uses simpler context generation since this is just for hierarchy display
+            dict: Plan from ObjectiveManager.plan_objective, or None if there is
+                none or its inputs changed since it was planned
         """
+        prefetch = self._prefetches.pop(agent_name, None)
+        if prefetch is None:
+            return None
+
         try:
-            # Convert to absolute path
-            abs_path = os.path.abspath(folder_path)
-            
-            # Check cache first
-            if hasattr(self, '_context_cache'):
-                cached = self._context_cache.get(abs_path)
-                if cached:
-                    return cached
-            
-            # Get files and subfolders
-            files = self._get_folder_files(abs_path)
-            subfolders = self._get_subfolders(abs_path)
-            
-            # Get context with minimal mission content
-            context = self._get_folder_context(
-                folder_path=abs_path,
-                files=files,
-                subfolders=subfolders,
-                mission_content="Analyze folder structure"  # Minimal context needed
-            )
-            
-            return context
-            
+            plan = await prefetch
         except Exception as e:
-            self.logger.warning(f"Could not get context for {folder_path}: {str(e)}")
-            # Return minimal context on error
-            return {
-                'path': abs_path,
-                'purpose': f"Storage folder for {os.path.basename(abs_path)} content",
-                'relationships': {
-                    'parent': 'No parent relationship specified',
-                    'siblings': 'No sibling relationships specified',
-                    'children': 'No children relationships specified'
-                }
-            }
+            self.logger.warning(f"⚠️ Prefetched objective for {agent_name} failed: {str(e)}")
+            return None
+        if plan is None:
+            return None  # planning failed for this agent only, already logged
+
+        if not self.objective_manager.is_objective_current(plan):
+            self.logger.info(f"♻️ Prefetched objective for {agent_name} is outdated, planning again")
+            return None
+
+        self.logger.info(f"⚡ Using objective planned ahead for {agent_name}")
+        return plan
+
+    def _get_changed_agents(self, agents):
+        """Filter agents down to those whose inputs changed since their last cycle."""
+        return [
+            a for a in agents
+            if self.objective_manager.has_new_inputs(a, self.mission_filepath, max_age=IDLE_AGENT_MAX_AGE)
+        ]
+
+    def _get_last_write_files(self, agent_name):
+        """Return the write set of the objective last written for an agent, if any."""
+        objective_filepath = f".aider.objective.{agent_name}.md"
+        try:
+            with open(objective_filepath, 'r', encoding='utf-8') as f:
+                return parse_write_files(f.read())
+        except OSError:
+            return set()
 
     def _get_available_agents(self):
         """List available agents."""
@@ -435,18 +536,45 @@ class AgentRunner:
             agent_filepath = f".aider.agent.{agent_name}.md"
             objective_filepath = f".aider.objective.{agent_name}.md"
             
-            # Generate objective directly since we're in a thread
-            self.objective_manager.generate_objective(
-                mission_filepath,
-                agent_filepath
-            )
-            
-            # Execute aider operation with model parameter - now properly awaited
-            await self.aider_manager.run_aider(
-                objective_filepath,
-                agent_filepath,
-                model=model
-            )
+            # Use the objective planned ahead if its inputs did not change
+            plan = await self._take_prefetched_objective(agent_name)
+            if plan is None:
+                plan = await self.objective_manager.plan_objective(
+                    mission_filepath,
+                    agent_filepath
+                )
+            self.objective_manager.save_objective(plan)
+            
+            # Only one running cycle may modify a given file
+            write_files = self._get_last_write_files(agent_name)
+            await self.file_leases.acquire(agent_name, write_files, logger=self.logger)
+            worktree_path = None
+            try:
+                # In isolation mode the agent works in its own worktree
+                if self.worktree_manager:
+                    worktree_path = await self.worktree_manager.prepare(agent_name)
+
+                # Plan the next agent's objective while aider runs
+                self._start_prefetch(mission_filepath)
+
+                # Execute aider operation with model parameter - now properly awaited
+                await self.aider_manager.run_aider(
+                    objective_filepath,
+                    agent_filepath,
+                    model=model,
+                    cwd=worktree_path
+                )
+            finally:
+                try:
+                    # Keep the leases until the edits have reached the main branch
+                    if worktree_path:
+                        merged = await self.worktree_manager.submit(agent_name)
+                        await asyncio.shield(merged)
+                finally:
+                    await self.file_leases.release(agent_name)
+
+            # Remember what this cycle reacted to, including the agent's own edits
+            self.objective_manager.save_input_fingerprint(agent_name, mission_filepath)
                 
             self.logger.info(f"✅ Completed execution cycle for {agent_name}")
             
@@ -3,20 +3,25 @@ import sys
 import asyncio
 from concurrent.futures import ThreadPoolExecutor
 from utils.logger import Logger
+from utils.llm_gateway import get_llm_gateway
+from utils.model_router import AGENT_GENERATION
+from utils.prompt_budget import PromptBudget, PROMPT_TOKEN_BUDGET, MISSION_TOKEN_BUDGET
 import openai
 from dotenv import load_dotenv
 
 class AgentsManager:
     """Manager class for handling agents and their operations."""
     
-    def __init__(self, model=None):
+    def __init__(self, model=None, use_cache=True):
         self.mission_path = None
         self.logger = Logger(model=model)
         self.model = model
+        self.use_cache = use_cache  # Reuse cached answers for an unchanged mission
         load_dotenv()  # Load environment variables
         openai.api_key = os.getenv('OPENAI_API_KEY')
         if not openai.api_key:
             raise ValueError("OpenAI API key not found in environment variables")
+        self.llm = get_llm_gateway()  # Shared by all parallel agent generations
         
     async def generate_agents(self, mission_filepath=".aider.mission.md"):
         """
@@ -105,10 +110,7 @@ class AgentsManager:
                 self.logger.debug(f"📝 Created prompt for agent: {agent_name}")
                 
                 # Make GPT call and get response
-                agent_config = await asyncio.get_event_loop().run_in_executor(
-                    pool,
-                    lambda: self._call_gpt(prompt)
-                )
+                agent_config = await self._call_gpt(prompt)
                 self.logger.debug(f"🤖 Received GPT response for agent: {agent_name}")
                 
                 # Save agent configuration
@@ -172,22 +174,19 @@ class AgentsManager:
 
         # Ensure we're getting the complete mission content
         self.logger.debug(f"Mission content length: {len(mission_content)} characters")
+
+        # The framework template is fixed; only the mission is shortened if needed
+        budget = PromptBudget(f'{agent_name} agent generation', model=self.model, total=PROMPT_TOKEN_BUDGET)
+        budget.add('mission', mission_content, max_tokens=MISSION_TOKEN_BUDGET * 2)
+        budget.add('framework', custom_prompt, priority=2)
+        sections = budget.build()
         
+        # Static requirements first, then the mission shared by every agent generated
+        # for it, then the agent-specific framework: concurrent generations share a prefix
         return f"""
 # Generate KinOS Agent Configuration
 
-Generate a role definition and plan for the {agent_name} agent that fulfills the mission while following the analysis framework.
-
-## Context Analysis
-1. Mission Details
-````
-{mission_content}
-````
-
-2. Analysis Framework
-````
-{custom_prompt}
-````
+Generate a role definition and plan for the agent named at the end of this prompt, that fulfills the mission while following the analysis framework.
 
 ## Requirements
 
@@ -220,9 +219,23 @@ Example Sections:
 - Key Objectives & Milestones
 - Quality Standards
 - Success Criteria
+
+## Context Analysis
+1. Mission Details
+````
+{sections['mission']}
+````
+
+2. Analysis Framework
+````
+{sections['framework']}
+````
+
+## Agent
+Generate the configuration for the {agent_name} agent.
 """
 
-    def _call_gpt(self, prompt):
+    async def _call_gpt(self, prompt):
         """
         Make a call to GPT to generate agent configuration.
         
@@ -285,8 +298,9 @@ Remember:
             self.logger.debug("\n=== User Message ===")
             self.logger.debug(prompt)
 
-            client = openai.OpenAI()
-            response = client.chat.completions.create(
+            response = await self.llm.chat_completion(
+                cache=self.use_cache,
+                call_class=AGENT_GENERATION,
                 model=self.model,
                 messages=[
                     {"role": "system", "content": """
@@ -9,6 +9,11 @@ from utils.fs_utils import FSUtils
 from utils.encoding_utils import EncodingUtils
 from pathlib import Path
 from managers.vision_manager import VisionManager
+from managers.aider_worker_pool import AiderWorkerPool, WorkerUnavailableError
+from utils.runtime_metrics import get_runtime_metrics
+from utils.git_utils import run_git, git_snapshot, git_changes
+from utils.file_index import get_project_index
+from utils.file_references import find_file_references
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -17,6 +22,23 @@ load_dotenv()
 # Get default model from environment or fallback
 DEFAULT_MODEL = os.getenv('DEFAULT_MODEL', 'gpt-4o-mini')
 
+# Subprocess handling
+STREAM_LINE_LIMIT = 1024 * 1024  # Max bytes per streamed output line
+PROCESS_TERMINATE_TIMEOUT = 10  # seconds to wait before killing a cancelled process
+
+# Keep aider imported in long-lived workers instead of a cold start per phase
+AIDER_WARM_WORKERS = os.getenv('AIDER_WARM_WORKERS', 'true').lower() not in ('0', 'false', 'no')
+
+# Send all phase prompts to one aider session on the warm worker
+AIDER_SINGLE_SESSION = os.getenv('AIDER_SINGLE_SESSION', 'true').lower() not in ('0', 'false', 'no')
+
+# Agent cycle phases: (display name, prompt appended to the objective)
+AIDER_PHASES = [
+    ("🏭 Production", "--> Focus on the Production Objective"),
+    ("👤 Role-specific", "--> Focus on the Role-specific Objective"),
+    ("🔍 Final Check", "--> Any additional changes required? Then update the todolist to reflect the changes."),
+]
+
 class AiderManager:
     """Manager class for handling aider operations."""
     
@@ -25,9 +47,14 @@ class AiderManager:
         self.logger = Logger(model=model)
         self._vision_manager = VisionManager()
         self.encoding_utils = EncodingUtils()  # Add encoding utils
+        self.worker_pool = AiderWorkerPool(self.logger, enabled=AIDER_WARM_WORKERS)
         # Initialize model with fallback chain
         self.model = model or os.getenv('DEFAULT_MODEL', 'gpt-4o-mini')
 
+    async def shutdown(self):
+        """Stop warm aider workers."""
+        await self.worker_pool.shutdown()
+
     def _validate_repo_visualizer(self):
         """
         Validate that repo-visualizer is properly installed and configured.
@@ -58,8 +85,17 @@ class AiderManager:
                 "Please check file permissions."
             )
 
-    async def run_aider(self, objective_filepath, agent_filepath, model=None):
-        """Execute aider operation with defined context."""
+    async def run_aider(self, objective_filepath, agent_filepath, model=None, cwd=None):
+        """
+        Execute aider operation with defined context.
+        
+        Args:
+            objective_filepath (str): Path to objective file
+            agent_filepath (str): Path to agent file (None for interactive runs)
+            model (str, optional): Model used by aider
+            cwd (str, optional): Working tree to run aider in, e.g. an agent's
+                isolated git worktree (defaults to the current directory)
+        """
         try:
             self.logger.debug(f"Starting aider for agent: {agent_filepath}")
             
@@ -93,13 +129,14 @@ class AiderManager:
                 objective_filepath,
                 agent_filepath,
                 context_files=context_files,
-                model=model
+                model=model,
+                cwd=cwd
             )
         except Exception as e:
             self.logger.error(f"Aider operation failed: {str(e)}")
             raise
 
-    async def _run_aider_with_encoding(self, objective_filepath, agent_filepath, context_files=None, model="gpt-4o-mini"):
+    async def _run_aider_with_encoding(self, objective_filepath, agent_filepath, context_files=None, model="gpt-4o-mini", cwd=None):
         """Execute aider with proper UTF-8 encoding handling."""
         try:
             # Build command as before
@@ -139,58 +176,12 @@ class AiderManager:
             self.logger.debug(f"File system encoding: {sys.getfilesystemencoding()}")
             self.logger.debug(f"Default encoding: {sys.getdefaultencoding()}")
 
-            try:
-                # Create process without encoding parameter
-                process = await asyncio.create_subprocess_exec(
-                    *cmd,
-                    stdout=asyncio.subprocess.PIPE,
-                    stderr=asyncio.subprocess.PIPE,
-                    env=env
-                )
-
-                # Stream output in real-time with manual decoding and detailed error logging
-                while True:
-                    line = await process.stdout.readline()
-                    if not line:
-                        break
-                    try:
-                        # Log raw bytes for debugging
-                        self.logger.debug(f"Raw bytes: {line}")
-                        # Manually decode the bytes
-                        decoded_line = line.decode('utf-8', errors='replace').strip()
-                        self.logger.debug(f"AIDER: {decoded_line}")
-                    except Exception as e:
-                        self.logger.error(f"Failed to decode output line: {str(e)}")
-                        self.logger.error(f"Raw bytes causing error: {line.hex()}")
-                        self.logger.error(f"Exception type: {type(e).__name__}")
-                        self.logger.error(f"Exception details: {str(e)}")
-            except Exception as e:
-                self.logger.error(f"Process execution error: {str(e)}")
-                raise
-
-            # Get final output with manual decoding and error details
-            stdout, stderr = await process.communicate()
-            
-            if stdout:
-                self.logger.debug(f"Final stdout raw bytes: {stdout.hex()}")
-            if stderr:
-                self.logger.debug(f"Final stderr raw bytes: {stderr.hex()}")
-            
-            if process.returncode != 0:
-                self.logger.error(f"Aider process failed with return code {process.returncode}")
-                if stdout:
-                    try:
-                        self.logger.error(f"stdout: {stdout.decode('utf-8', errors='replace')}")
-                    except Exception as e:
-                        self.logger.error(f"Failed to decode stdout: {str(e)}")
-                        self.logger.error(f"stdout bytes: {stdout.hex()}")
-                if stderr:
-                    try:
-                        self.logger.error(f"stderr: {stderr.decode('utf-8', errors='replace')}")
-                    except Exception as e:
-                        self.logger.error(f"Failed to decode stderr: {str(e)}")
-                        self.logger.error(f"stderr bytes: {stderr.hex()}")
-                raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+            if agent_filepath:
+                # Agents run the three-phase cycle (Production, Role-specific, Final Check)
+                await self._execute_aider(cmd, env=env, cwd=cwd)
+            else:
+                # Interactive objectives are user-provided, run them as a single phase
+                await self._run_aider_phase(cmd, 'interactive', "💬 Interactive", "", env=env, cwd=cwd)
 
             self.logger.debug("Aider execution completed")
 
@@ -202,40 +193,107 @@ class AiderManager:
                 self.logger.error(f"Traceback:\n{''.join(traceback.format_tb(e.__traceback__))}")
             raise
 
-            # Check if any files were modified by looking for changes in git status
-            modified_files = False
-            try:
-                result = subprocess.run(['git', 'status', '--porcelain'], capture_output=True, text=True, check=True)
-                modified_files = bool(result.stdout.strip())
-            except subprocess.CalledProcessError as e:
-                self.logger.warning(f"Could not check git status: {e}")
+    async def _run_git(self, *args, check=True, cwd=None):
+        """Run a git command without blocking the event loop (see utils.git_utils.run_git)."""
+        return await run_git(*args, cwd=cwd, check=check)
 
-            # Get latest commit info if files were modified
-            if modified_files:
-                try:
-                    result = subprocess.run(
-                        ['git', 'log', '-1', '--pretty=format:%h - %s'],
-                        capture_output=True,
-                        text=True,
-                        check=True
-                    )
-                    if result.stdout:
-                        self.logger.success(f"🔨 Git commit: {result.stdout}")
-                except subprocess.CalledProcessError as e:
-                    self.logger.warning(f"Could not get commit info: {e}")
-
-                # Push changes to GitHub
-                try:
-                    self.logger.info(f"🔄 Attempting to push changes...")
-                    subprocess.run(['git', 'push'], check=True, capture_output=True, text=True)
-                    self.logger.info(f"✨ Changes pushed successfully")
-                except subprocess.CalledProcessError as e:
-                    # Just log info for push failures since remote might not be configured
-                    self.logger.info(f"💡 Git push skipped: {e.stderr.strip()}")
+    async def push_changes(self, cwd=None):
+        """Push committed changes, skipping quietly when no remote is configured."""
+        try:
+            self.logger.info(f"🔄 Attempting to push changes...")
+            await self._run_git('push', cwd=cwd)
+            self.logger.info(f"✨ Changes pushed successfully")
+        except subprocess.CalledProcessError as e:
+            # Just log info for push failures since remote might not be configured
+            self.logger.info(f"💡 Git push skipped: {e.stderr.strip()}")
+
+    async def _stream_process(self, cmd, label, env=None, cwd=None):
+        """
+        Run a subprocess and stream its output incrementally.
+        
+        Stdout and stderr are read concurrently and logged line by line as they
+        arrive. If the calling task is cancelled, the process is terminated
+        before the cancellation propagates.
+        
+        Args:
+            cmd (list): Command arguments
+            label (str): Prefix used when logging output lines
+            env (dict, optional): Environment for the process
+            cwd (str, optional): Working directory for the process
             
-        except Exception as e:
-            self.logger.error(f"Aider operation failed: {str(e)}")
+        Returns:
+            tuple: (returncode, stdout, stderr) with decoded text
+        """
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+            cwd=cwd,
+            limit=STREAM_LINE_LIMIT
+        )
+        stdout_lines = []
+        stderr_lines = []
+
+        async def _pump(stream, sink, prefix):
+            while True:
+                line = await stream.readline()
+                if not line:
+                    break
+                decoded_line = line.decode('utf-8', errors='replace').rstrip()
+                sink.append(decoded_line)
+                self.logger.debug(f"{prefix}: {decoded_line}")
+
+        try:
+            await asyncio.gather(
+                _pump(process.stdout, stdout_lines, label),
+                _pump(process.stderr, stderr_lines, f"{label} (stderr)")
+            )
+            returncode = await process.wait()
+        except asyncio.CancelledError:
+            await self._terminate_process(process, label)
             raise
+
+        return returncode, '\n'.join(stdout_lines), '\n'.join(stderr_lines)
+
+    async def _run_aider_process(self, cmd, agent_name, env=None, cwd=None):
+        """
+        Run an aider command, preferring the agent's warm worker.
+        
+        Falls back to a cold `python -m aider.main` process when workers are
+        disabled or cannot be started.
+        
+        Args:
+            cmd (list): Aider command as built by _build_aider_command
+            agent_name (str): Agent owning the run (selects the worker)
+            env (dict, optional): Environment for the aider process
+            cwd (str, optional): Working tree aider runs in
+            
+        Returns:
+            tuple: (returncode, stdout, stderr) with decoded text
+        """
+        if self.worker_pool.enabled and cmd[1:3] == ["-m", "aider.main"]:
+            try:
+                returncode, output = await self.worker_pool.run(agent_name, cmd[3:], cwd=cwd, env=env)
+                return returncode, output, ""
+            except WorkerUnavailableError as e:
+                self.logger.debug(f"Using a cold aider process for {agent_name}: {str(e)}")
+
+        return await self._stream_process(cmd, f"AIDER {agent_name}", env=env, cwd=cwd)
+
+    async def _terminate_process(self, process, label):
+        """Terminate a running subprocess, killing it if it does not exit in time."""
+        if process.returncode is not None:
+            return
+        self.logger.warning(f"⚠️ Stopping {label} (pid {process.pid})")
+        try:
+            process.terminate()
+            await asyncio.wait_for(process.wait(), timeout=PROCESS_TERMINATE_TIMEOUT)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+        except ProcessLookupError:
+            pass  # Process already exited
             
     def fix_git_encoding(self):
         """Configure git to use UTF-8 for new commits."""
@@ -390,44 +448,12 @@ class AiderManager:
                 # Generate context file content
                 context_content = "# Context Files\n\n"
                     
-                # Find all potential file references using a more comprehensive regex
-                import re
-                # Match anything that looks like a filename with extension
-                potential_files = re.findall(r'[\w\-./\\]+\.[A-Za-z]+', content)
-                    
-                # Get list of all existing files in project
-                existing_files = set()
-                for root, _, files in os.walk('.'):
-                    # Skip .aider folders
-                    if '.aider' in root.split(os.sep):
-                        continue
-                    for file in files:
-                        # Skip .aider files
-                        if file.startswith('.aider'):
-                            continue
-                        # Convert to relative path with forward slashes
-                        rel_path = os.path.relpath(os.path.join(root, file), '.').replace('\\', '/')
-                        existing_files.add(rel_path)
-                        # Also add without ./ prefix
-                        if rel_path.startswith('./'):
-                            existing_files.add(rel_path[2:])
-
-                # Track found files to avoid duplicates
+                # Find the project files the objective refers to, in one pass
                 found_files = set()
-
-                # Process each potential file
-                for potential_file in potential_files:
-                    # Clean up the path
-                    clean_path = potential_file.replace('\\', '/').strip()
-                    if clean_path.startswith('./'):
-                        clean_path = clean_path[2:]
-
-                    # Check against existing files
-                    if clean_path in existing_files:
-                        if clean_path not in found_files:
-                            found_files.add(clean_path)
-                            context_files.append(clean_path)
-                            self.logger.debug(f"Found file reference: {clean_path}")
+                for reference in find_file_references(content):
+                    found_files.add(reference.path)
+                    context_files.append(reference.path)
+                    self.logger.debug(f"Found file reference: {reference.path}")
 
                 # Save context file with found files
                 context_content += "## Found Files\n"
@@ -443,6 +469,10 @@ class AiderManager:
         # Ensure model is not None, use default if needed
         model = model or DEFAULT_MODEL
 
+        # KinOS state files live in the mission directory; use absolute paths
+        # so aider finds them when it runs inside an agent worktree
+        mission_dir = os.getcwd()
+
         # Add required aider arguments
         cmd.extend([
             "--model", model or self.model,  # Use passed model or instance model
@@ -451,13 +481,13 @@ class AiderManager:
             "--no-pretty",
             "--no-fancy-input",
             "--encoding", "utf-8",  # Force UTF-8 encoding
-            "--chat-history-file", f".aider.history.{agent_name}.md",
+            "--chat-history-file", os.path.join(mission_dir, f".aider.history.{agent_name}.md"),
             "--restore-chat-history",
-            "--input-history-file", f".aider.input.{agent_name}.md"
+            "--input-history-file", os.path.join(mission_dir, f".aider.input.{agent_name}.md")
         ])
         
         # Add mission file as read-only
-        cmd.extend(['--read', '.aider.mission.md'])
+        cmd.extend(['--read', os.path.join(mission_dir, '.aider.mission.md')])
         
         # Add todolist.md and context files as writable files
         cmd.extend(['--file', 'todolist.md'])
@@ -466,7 +496,7 @@ class AiderManager:
         agent_name = os.path.basename(agent_filepath).replace('.aider.agent.', '').replace('.md', '') if agent_filepath else 'interactive'
         context_file = f".aider.context.{agent_name}.md"
         if os.path.exists(context_file):
-            cmd.extend(['--read', context_file])  # Use --read for context files
+            cmd.extend(['--read', os.path.join(mission_dir, context_file)])  # Use --read for context files
             self.logger.debug(f"Added context file to aider command: {context_file}")
         else:
             self.logger.warning(f"Context file not found: {context_file}")
@@ -477,7 +507,7 @@ class AiderManager:
 
         # Add agent prompt as read-only if provided
         if agent_filepath:
-            cmd.extend(['--read', agent_filepath])
+            cmd.extend(['--read', os.path.abspath(agent_filepath)])
         
         # Read objective content
         with open(objective_filepath, 'r', encoding='utf-8') as f:
@@ -571,50 +601,25 @@ class AiderManager:
             self.logger.warning(f"⚠️ Encoding issue with commit message: {str(e)}")
             return "other", "🔨"
 
-    def _get_git_file_states(self):
-        """Get dictionary of tracked files and their current hash."""
+    async def _get_git_file_states(self, cwd=None):
+        """Snapshot HEAD and the files git status reports as changed."""
         try:
-            # Get list of tracked files with their hashes
-            result = subprocess.run(
-                ['git', 'ls-files', '-s'],
-                capture_output=True,
-                text=True,
-                check=True
-            )
-            
-            file_states = {}
-            for line in result.stdout.splitlines():
-                # Format: <mode> <hash> <stage> <file>
-                parts = line.split()
-                if len(parts) >= 4:
-                    file_path = ' '.join(parts[3:])  # Handle filenames with spaces
-                    file_hash = parts[1]
-                    file_states[file_path] = file_hash
-                    
-            return file_states
+            return await git_snapshot(cwd=cwd)
         except subprocess.CalledProcessError as e:
             self.logger.error(f"Failed to get git file states: {str(e)}")
             raise
 
-    def _get_modified_files(self, before_state, after_state):
-        """Compare before and after states to find modified files."""
-        modified_files = []
-        
-        # Check for modified files
-        for file_path, after_hash in after_state.items():
-            before_hash = before_state.get(file_path)
-            if before_hash != after_hash:
-                modified_files.append(file_path)
-                self.logger.debug(f"🔍 Detected change in {file_path}")
-                self.logger.debug(f"  Before hash: {before_hash}")
-                self.logger.debug(f"  After hash: {after_hash}")
-                self.logger.debug(f"📝 Modified file: {file_path}")
-        
-        return modified_files
+    async def _get_modified_files(self, before_state, after_state, cwd=None):
+        """Compare before and after snapshots to find added, modified and deleted files."""
+        changes = await git_changes(before_state, after_state, cwd=cwd)
+        for label, paths in (("Added", changes.added), ("Modified", changes.modified), ("Deleted", changes.deleted)):
+            for file_path in sorted(paths):
+                self.logger.debug(f"📝 {label} file: {file_path}")
+        return changes.paths
 
-    async def _handle_post_aider(self, agent_name, before_state, after_state, phase_name):
+    async def _handle_post_aider(self, agent_name, before_state, after_state, phase_name, cwd=None):
         """Handle all post-aider operations for a single phase."""
-        modified_files = self._get_modified_files(before_state, after_state)
+        modified_files = await self._get_modified_files(before_state, after_state, cwd=cwd)
         if modified_files:
             self.logger.info(f"📝 Agent {agent_name} {phase_name} phase modified {len(modified_files)} files")
             
@@ -628,7 +633,7 @@ class AiderManager:
                     
         return modified_files
 
-    async def _run_aider_phase(self, cmd, agent_name, phase_name, phase_prompt):
+    async def _run_aider_phase(self, cmd, agent_name, phase_name, phase_prompt, env=None, cwd=None):
         """Run a single aider phase and handle its results."""
         phase_start = time.time()
         self.logger.info(f"{phase_name} Agent {agent_name} starting phase at {phase_start}")
@@ -638,71 +643,132 @@ class AiderManager:
         phase_cmd[-1] = phase_cmd[-1] + f"\n{phase_prompt}"
         
         # Get initial state
-        initial_state = self._get_git_file_states()
+        initial_state = await self._get_git_file_states(cwd=cwd)
         
         try:
-            # Execute aider with explicit UTF-8 encoding
-            process = subprocess.Popen(
+            # Execute aider, streaming its output as it runs
+            returncode, stdout, stderr = await self._run_aider_process(
                 phase_cmd,
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                encoding='utf-8',
-                errors='replace'  # Handle encoding errors by replacing invalid chars
+                agent_name,
+                env=env,
+                cwd=cwd
             )
-            stdout, stderr = process.communicate()
             
-            if process.returncode != 0:
-                self.logger.error(f"{phase_name} process failed with return code {process.returncode}")
-                raise subprocess.CalledProcessError(process.returncode, phase_cmd, stdout, stderr)
+            if returncode != 0:
+                get_runtime_metrics().record_phase(time.time() - phase_start)
+                self.logger.error(f"{phase_name} process failed with return code {returncode}")
+                raise subprocess.CalledProcessError(returncode, phase_cmd, stdout, stderr)
+
+            return await self._finish_phase(
+                agent_name, phase_name, phase_start, initial_state, stdout + stderr, cwd=cwd
+            )
+            
+        except asyncio.CancelledError:
+            self.logger.warning(f"⚠️ {phase_name} phase cancelled for agent {agent_name}")
+            raise
+        except Exception as e:
+            self.logger.error(f"Error in {phase_name} phase for agent {agent_name}: {str(e)}")
+            raise
 
-            # Get final state and handle post-aider operations
-            final_state = self._get_git_file_states()
-            modified_files = await self._handle_post_aider(agent_name, initial_state, final_state, phase_name)
+    async def _finish_phase(self, agent_name, phase_name, phase_start, initial_state, output, cwd=None):
+        """
+        Record a finished phase, report its commit and push it.
         
-            # Get latest commit info if files were modified
-            if modified_files:
-                try:
-                    result = subprocess.run(
-                        ['git', 'log', '-1', '--pretty=format:%h - %s'],
-                        capture_output=True,
-                        text=True,
-                        encoding='utf-8',  # Explicit UTF-8 encoding
-                        errors='replace',   # Replace invalid chars
-                        check=True
-                    )
-                    if result.stdout:
-                        # Ensure proper encoding of commit message
-                        commit_msg = result.stdout.encode('utf-8', errors='replace').decode('utf-8')
-                        self.logger.success(f"🔨 Git commit: {commit_msg}")
-                except subprocess.CalledProcessError as e:
-                    self.logger.warning(f"Could not get commit info: {e}")
-
-                # Push changes to GitHub
-                try:
-                    self.logger.info(f"🔄 Attempting to push changes...")
-                    subprocess.run(
-                        ['git', 'push'], 
-                        check=True, 
-                        capture_output=True, 
-                        text=True,
-                        encoding='utf-8',  # Explicit UTF-8 encoding
-                        errors='replace'    # Replace invalid chars
-                    )
-                    self.logger.info(f"✨ Changes pushed successfully")
-                except subprocess.CalledProcessError as e:
-                    # Just log info for push failures since remote might not be configured
-                    error_msg = e.stderr.encode('utf-8', errors='replace').decode('utf-8')
-                    self.logger.info(f"💡 Git push skipped: {error_msg.strip()}")
+        Args:
+            agent_name (str): Agent that ran the phase
+            phase_name (str): Display name of the phase
+            phase_start (float): Epoch timestamp the phase started at
+            initial_state (GitSnapshot): Git state before the phase
+            output (str): Aider console output of the phase
+            cwd (str, optional): Working tree aider ran in
+            
+        Returns:
+            tuple: (modified_files, final_state)
+        """
+        metrics = get_runtime_metrics()
+        metrics.record_phase(time.time() - phase_start)
+        if 'index.lock' in output:
+            metrics.record_git_lock_contention()
+
+        # Get final state and handle post-aider operations
+        final_state = await self._get_git_file_states(cwd=cwd)
+        modified_files = await self._handle_post_aider(agent_name, initial_state, final_state, phase_name, cwd=cwd)
+    
+        # Get latest commit info if files were modified
+        if modified_files:
+            try:
+                commit_msg = await self._run_git('log', '-1', '--pretty=format:%h - %s', cwd=cwd)
+                if commit_msg:
+                    self.logger.success(f"🔨 Git commit: {commit_msg}")
+            except subprocess.CalledProcessError as e:
+                self.logger.warning(f"Could not get commit info: {e}")
+
+            # Push changes to GitHub (isolated worktrees are pushed after merging)
+            if cwd is None:
+                get_project_index().mark_changed(modified_files)
+                await self.push_changes()
+    
+        phase_end = time.time()
+        self.logger.info(f"✨ Agent {agent_name} completed {phase_name} phase in {phase_end - phase_start:.2f} seconds")
+    
+        return modified_files, final_state
+
+    async def _run_aider_session(self, cmd, agent_name, env=None, cwd=None):
+        """
+        Run all agent phases in a single aider session on the agent's warm worker.
         
-            phase_end = time.time()
-            self.logger.info(f"✨ Agent {agent_name} completed {phase_name} phase in {phase_end - phase_start:.2f} seconds")
+        The objective is sent with the first phase prompt and the later phase
+        prompts follow as plain messages, so chat history and the repo map stay
+        in memory instead of being restored and rebuilt for every phase.
         
-            return modified_files, final_state
+        Args:
+            cmd (list): Aider command as built by _build_aider_command
+            agent_name (str): Agent owning the run
+            env (dict, optional): Environment for the aider process
+            cwd (str, optional): Working tree aider runs in
             
-        except Exception as e:
-            self.logger.error(f"Error in {phase_name} phase for agent {agent_name}: {str(e)}")
+        Returns:
+            list: Modified files of each completed phase
+            
+        Raises:
+            WorkerUnavailableError: If the session could not run; the phases
+                already completed are available as the exception's
+                completed_phases attribute
+        """
+        objective_message = cmd[-1]
+        argv = cmd[3:-2]  # Drop the interpreter and the --message argument
+        messages = [f"{objective_message}\n{AIDER_PHASES[0][1]}"]
+        messages.extend(prompt for _, prompt in AIDER_PHASES[1:])
+
+        phase_files = []
+        phase = {'start': time.time()}
+        phase['state'] = await self._get_git_file_states(cwd=cwd)
+        self.logger.info(f"{AIDER_PHASES[0][0]} Agent {agent_name} starting phase at {phase['start']}")
+
+        async def on_phase(index, output):
+            phase_name = AIDER_PHASES[index][0]
+            modified_files, phase['state'] = await self._finish_phase(
+                agent_name, phase_name, phase['start'], phase['state'], output, cwd=cwd
+            )
+            phase_files.append(modified_files)
+            phase['start'] = time.time()
+            if index + 1 < len(AIDER_PHASES):
+                self.logger.info(f"{AIDER_PHASES[index + 1][0]} Agent {agent_name} starting phase at {phase['start']}")
+
+        try:
+            returncode, output = await self.worker_pool.run(
+                agent_name, argv, cwd=cwd, env=env, messages=messages, on_phase=on_phase
+            )
+        except WorkerUnavailableError as e:
+            e.completed_phases = phase_files
             raise
 
+        if returncode != 0:
+            phase_name = AIDER_PHASES[min(len(phase_files), len(AIDER_PHASES) - 1)][0]
+            self.logger.error(f"{phase_name} process failed with return code {returncode}")
+            raise subprocess.CalledProcessError(returncode, cmd, output, "")
+        return phase_files
+
     def _generate_map_maintenance_prompt(self, tree_structure=None):
         """
         Generate map maintenance prompt for updating map.md.
@@ -774,57 +840,52 @@ Update map.md to reflect the current project structure while maintaining its for
     def _get_complete_tree(self):
         """Get complete tree structure without depth limit."""
         fs_utils = FSUtils()
-        current_path = "."
-        files = fs_utils.get_folder_files(current_path)
-        subfolders = fs_utils.get_subfolders(current_path)
         return fs_utils.build_tree_structure(
-            current_path=current_path,
-            files=files,
-            subfolders=subfolders,
-            max_depth=None  # No depth limit
+            current_path=".",
+            max_depth=None,  # No depth limit
+            max_entries=None,
+            collapse_threshold=None
         )
 
-    async def _execute_aider(self, cmd):
+    async def _execute_aider(self, cmd, env=None, cwd=None):
         """Execute aider command and handle results."""
+        agent_name = None
         try:
             # Configure git to use UTF-8 for commit messages
-            subprocess.run(['git', 'config', 'i18n.commitEncoding', 'utf-8'], check=True)
-            subprocess.run(['git', 'config', 'i18n.logOutputEncoding', 'utf-8'], check=True)
+            await self._run_git('config', 'i18n.commitEncoding', 'utf-8')
+            await self._run_git('config', 'i18n.logOutputEncoding', 'utf-8')
             
             # Extract agent name from cmd arguments
             agent_name = None
             for i, arg in enumerate(cmd):
                 if "--chat-history-file" in arg and i+1 < len(cmd):
-                    agent_name = cmd[i+1].replace('.aider.history.', '').replace('.md', '')
+                    agent_name = os.path.basename(cmd[i+1]).replace('.aider.history.', '').replace('.md', '')
                     break
 
             # Log start time
             start_time = time.time()
             self.logger.info(f"⏳ Agent {agent_name} starting aider execution at {start_time}")
 
-            # Run production phase
-            production_files, production_state = await self._run_aider_phase(
-                cmd, agent_name, "🏭 Production", 
-                "--> Focus on the Production Objective"
-            )
-
-            # Run role-specific phase
-            role_files, role_state = await self._run_aider_phase(
-                cmd, agent_name, "👤 Role-specific",
-                "--> Focus on the Role-specific Objective"
-            )
-
-            # Run final check phase
-            final_files, final_state = await self._run_aider_phase(
-                cmd, agent_name, "🔍 Final Check",
-                "--> Any additional changes required? Then update the todolist to reflect the changes."
-            )
+            # Prefer one aider session for all phases, fall back to one process per phase
+            phase_files = []
+            if AIDER_SINGLE_SESSION and self.worker_pool.enabled and cmd[1:3] == ["-m", "aider.main"]:
+                try:
+                    phase_files = await self._run_aider_session(cmd, agent_name, env=env, cwd=cwd)
+                except WorkerUnavailableError as e:
+                    phase_files = getattr(e, 'completed_phases', [])
+                    self.logger.debug(f"Running remaining phases as separate aider runs for {agent_name}: {str(e)}")
+
+            for phase_name, phase_prompt in AIDER_PHASES[len(phase_files):]:
+                modified_files, _ = await self._run_aider_phase(
+                    cmd, agent_name, phase_name, phase_prompt,
+                    env=env, cwd=cwd
+                )
+                phase_files.append(modified_files)
 
             # Get list of all modified/added/deleted files
             all_changes = set()
-            all_changes.update(production_files or [])
-            all_changes.update(role_files or [])
-            all_changes.update(final_files or [])
+            for modified_files in phase_files:
+                all_changes.update(modified_files or [])
 
             # Log total duration and summary
             total_duration = time.time() - start_time
@@ -843,38 +904,39 @@ Update map.md to reflect the current project structure while maintaining its for
     def run_map_maintenance_for_all_folders(self):
         """Run map maintenance for each folder in the repository."""
         self.logger.debug("Starting map maintenance for all folders...")
+
+        # Walk the tree once; each folder's prompt only moves the active marker
         fs_utils = FSUtils()
-        ignore_patterns = fs_utils._get_ignore_patterns()
-
-        for root, dirs, _ in os.walk('.'):
-            # Filter out ignored directories, especially .git and .aider folders
-            dirs[:] = [d for d in dirs 
-                      if not fs_utils._should_ignore(os.path.join(root, d), ignore_patterns) 
-                      and not d.startswith('.git')  # Explicitly exclude .git folders
-                      and not d.startswith('.aider')]  # Explicitly exclude .aider folders
-            
-            for dir_name in dirs:
-                folder_path = os.path.join(root, dir_name)
-                self.logger.debug(f"Initiating map maintenance for folder: {folder_path}")
-                self.run_map_maintenance(folder_path)
-
-    def run_map_maintenance(self, folder_path):
-        """Perform map maintenance for a specific folder."""
+        tree_entries = list(fs_utils.walk_tree(".", max_depth=None, collapse_threshold=None))
+        root_path = os.path.abspath(".")
+
+        for _, _, folder in tree_entries:
+            if folder is None or folder == root_path:
+                continue
+            folder_path = os.path.relpath(folder)
+            self.logger.debug(f"Initiating map maintenance for folder: {folder_path}")
+            self.run_map_maintenance(folder_path, tree_entries=tree_entries)
+
+    def run_map_maintenance(self, folder_path, tree_entries=None):
+        """
+        Perform map maintenance for a specific folder.
+        
+        Args:
+            folder_path (str): Folder whose map is maintained
+            tree_entries (list, optional): Entries of FSUtils.walk_tree() for the
+                whole project, reused instead of walking the tree again
+        """
         self.logger.debug(f"Running map maintenance for folder: {folder_path}")
         
         try:
             # Get the COMPLETE tree structure starting from root
             fs_utils = FSUtils()
             fs_utils.set_current_folder(folder_path)  # Set current folder before building tree
-        
-            root_files = fs_utils.get_folder_files(".")
-            root_subfolders = fs_utils.get_subfolders(".")
-            tree_structure = fs_utils.build_tree_structure(
-                current_path=".",  # Start from root
-                files=root_files,
-                subfolders=root_subfolders,
-                max_depth=None  # No depth limit to get full tree
-            )
+
+            if tree_entries is None:
+                # No depth limit, summaries or cut-off: the map documents every path
+                tree_entries = fs_utils.walk_tree(".", max_depth=None, collapse_threshold=None)
+            tree_structure = list(fs_utils.format_tree(tree_entries, max_entries=None))
 
             # Generate the map maintenance prompt with full tree
             map_prompt = self._generate_map_maintenance_prompt(
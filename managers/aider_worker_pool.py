@@ -0,0 +1,231 @@
+import os
+import json
+import asyncio
+from utils.logger import Logger
+from utils.fs_utils import FSUtils
+
+# Worker configuration
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'utils', 'aider_worker.py')
+WORKER_START_TIMEOUT = 120  # seconds allowed for a worker to import aider
+WORKER_STOP_TIMEOUT = 10  # seconds to wait for a worker to exit on shutdown
+STREAM_LINE_LIMIT = 1024 * 1024  # Max bytes per streamed output line
+OUTPUT_DRAIN_TIMEOUT = 5  # seconds to wait for the end of a job's output
+JOB_END_MARKER = "\x00KINOS_JOB_END "  # Must match utils/aider_worker.py
+
+
+class WorkerUnavailableError(RuntimeError):
+    """Raised when a warm aider worker cannot be started."""
+
+
+class AiderWorker:
+    """A single long-lived aider process executing one job at a time.
+
+    Attributes:
+        key (str): Pool key the worker is bound to (usually the agent name)
+        process (asyncio.subprocess.Process): Underlying worker process
+    """
+
+    def __init__(self, key, logger):
+        self.key = key
+        self.logger = logger
+        self.process = None
+        self._lock = asyncio.Lock()
+        self._output = []
+        self._output_done = asyncio.Event()
+        self._stderr_task = None
+        self._job_id = 0
+
+    @property
+    def alive(self):
+        """Whether the worker process is still running."""
+        return self.process is not None and self.process.returncode is None
+
+    async def start(self, env=None):
+        """
+        Spawn the worker and wait until aider is imported.
+
+        Raises:
+            WorkerUnavailableError: If the worker fails to report readiness
+        """
+        python_cmd = FSUtils.get_python_command()
+        self.process = await asyncio.create_subprocess_exec(
+            python_cmd, WORKER_SCRIPT,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE,
+            env=env,
+            limit=STREAM_LINE_LIMIT
+        )
+        self._stderr_task = asyncio.create_task(self._pump_stderr())
+
+        try:
+            line = await asyncio.wait_for(self.process.stdout.readline(), timeout=WORKER_START_TIMEOUT)
+            message = json.loads(line.decode('utf-8')) if line else {}
+        except (asyncio.TimeoutError, json.JSONDecodeError) as e:
+            await self.stop()
+            raise WorkerUnavailableError(f"Aider worker for {self.key} did not start: {str(e)}")
+
+        if message.get('event') != 'ready':
+            await self.stop()
+            raise WorkerUnavailableError(
+                f"Aider worker for {self.key} did not start: {message.get('error', 'no ready signal')}"
+            )
+        self.logger.debug(f"🔥 Warm aider worker ready for {self.key} (pid {self.process.pid})")
+
+    async def _pump_stderr(self):
+        """Collect aider console output for the job in progress."""
+        while True:
+            line = await self.process.stderr.readline()
+            if not line:
+                break
+            decoded_line = line.decode('utf-8', errors='replace').rstrip()
+            if decoded_line.startswith(JOB_END_MARKER):
+                self._output_done.set()
+                continue
+            self._output.append(decoded_line)
+            self.logger.debug(f"AIDER {self.key}: {decoded_line}")
+
+    async def _collect_output(self):
+        """Wait for the stderr pump to reach the end marker and take the output."""
+        try:
+            await asyncio.wait_for(self._output_done.wait(), timeout=OUTPUT_DRAIN_TIMEOUT)
+        except asyncio.TimeoutError:
+            self.logger.debug(f"Output of aider worker {self.key} may be incomplete")
+        output = '\n'.join(self._output)
+        self._output = []
+        self._output_done.clear()
+        return output
+
+    async def _send(self, message):
+        self.process.stdin.write((json.dumps(message) + "\n").encode('utf-8'))
+        await self.process.stdin.drain()
+
+    async def run(self, argv, cwd=None, messages=None, on_phase=None):
+        """
+        Execute one aider run inside the worker.
+
+        Args:
+            argv (list): Aider command line arguments (without the interpreter)
+            cwd (str, optional): Working directory for the run
+            messages (list, optional): Messages sent in sequence to a single
+                aider session instead of running argv's --message
+            on_phase (callable, optional): Coroutine called as
+                on_phase(index, output) after each session message, before
+                the next one is sent
+
+        Returns:
+            tuple: (returncode, output) with aider's console output
+        """
+        async with self._lock:
+            if not self.alive:
+                raise WorkerUnavailableError(f"Aider worker for {self.key} is not running")
+
+            self._job_id += 1
+            self._output = []
+            self._output_done.clear()
+            job = {"id": self._job_id, "argv": argv, "cwd": cwd or os.getcwd()}
+            if messages:
+                job["messages"] = messages
+
+            try:
+                await self._send(job)
+
+                while True:
+                    line = await self.process.stdout.readline()
+                    if not line:
+                        raise WorkerUnavailableError(f"Aider worker for {self.key} exited during a job")
+                    message = json.loads(line.decode('utf-8'))
+                    if message.get('id') != self._job_id:
+                        continue
+                    if message.get('event') == 'done':
+                        break
+                    if message.get('event') == 'phase':
+                        output = await self._collect_output()
+                        if on_phase:
+                            await on_phase(message['index'], output)
+                        await self._send({"id": self._job_id, "event": "continue"})
+            except (asyncio.CancelledError, Exception):
+                # The worker state is unknown after an interrupted job
+                await self.stop()
+                raise
+
+            # Wait for the stderr pump to reach the end of this job's output
+            return message.get('returncode', 1), await self._collect_output()
+
+    async def stop(self):
+        """Stop the worker process."""
+        if self.process is None:
+            return
+        if self.process.returncode is None:
+            try:
+                self.process.stdin.close()
+                await asyncio.wait_for(self.process.wait(), timeout=WORKER_STOP_TIMEOUT)
+            except (asyncio.TimeoutError, BrokenPipeError, ConnectionResetError):
+                try:
+                    self.process.kill()
+                    await self.process.wait()
+                except ProcessLookupError:
+                    pass
+        if self._stderr_task:
+            self._stderr_task.cancel()
+
+
+class AiderWorkerPool:
+    """Pool of warm aider workers, one per key.
+
+    Workers are started lazily the first time a key runs a job and are reused
+    for every later phase and cycle. If a worker cannot be started the pool
+    disables itself so callers fall back to cold aider processes.
+
+    Attributes:
+        logger (Logger): Logging utility instance
+        enabled (bool): Whether warm workers are used
+        _workers (dict): Mapping of key to AiderWorker
+    """
+
+    def __init__(self, logger=None, enabled=True):
+        self.logger = logger or Logger()
+        self.enabled = enabled
+        self._workers = {}
+        self._lock = asyncio.Lock()
+
+    async def _get_worker(self, key, env=None):
+        """Return a running worker for key, starting one if needed."""
+        async with self._lock:
+            worker = self._workers.get(key)
+            if worker and worker.alive:
+                return worker
+
+            worker = AiderWorker(key, self.logger)
+            try:
+                await worker.start(env=env)
+            except (WorkerUnavailableError, OSError) as e:
+                self.enabled = False
+                self.logger.warning(f"⚠️ Warm aider workers disabled: {str(e)}")
+                raise WorkerUnavailableError(str(e))
+            self._workers[key] = worker
+            return worker
+
+    async def run(self, key, argv, cwd=None, env=None, messages=None, on_phase=None):
+        """
+        Run aider with the given arguments on the worker bound to key.
+
+        With messages, all of them are sent to one aider session (see
+        AiderWorker.run).
+
+        Returns:
+            tuple: (returncode, output)
+
+        Raises:
+            WorkerUnavailableError: If no worker can serve the job
+        """
+        if not self.enabled:
+            raise WorkerUnavailableError("Warm aider workers are disabled")
+        worker = await self._get_worker(key, env=env)
+        return await worker.run(argv, cwd=cwd, messages=messages, on_phase=on_phase)
+
+    async def shutdown(self):
+        """Stop all workers."""
+        workers = list(self._workers.values())
+        self._workers = {}
+        await asyncio.gather(*(worker.stop() for worker in workers), return_exceptions=True)
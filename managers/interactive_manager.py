@@ -1,9 +1,19 @@
 import os
 import asyncio
 import openai
-import requests
 from utils.logger import Logger
 from utils.fs_utils import FSUtils
+from utils.llm_gateway import get_llm_gateway
+from utils.model_router import FILE_SELECTION, PLANNING
+from utils.prompt_budget import (
+    PromptBudget, PROMPT_TOKEN_BUDGET, MISSION_TOKEN_BUDGET, TODOLIST_TOKEN_BUDGET,
+    OBJECTIVE_TOKEN_BUDGET, FILE_LIST_TOKEN_BUDGET
+)
+from utils.prompt_layout import PromptLayout, STATIC, SLOW, VOLATILE
+from utils.file_ranker import get_file_index, format_file_selection, FILE_SELECTION_MODE, RERANK_CANDIDATES
+from utils.research_service import get_research_service
+from utils.file_index import get_project_index
+from utils.file_references import find_file_references
 from managers.aider_manager import AiderManager
 from managers.vision_manager import VisionManager
 
@@ -17,6 +27,7 @@ class InteractiveManager:
         self.aider_manager = AiderManager(model=model)
         self.vision_manager = VisionManager(model=model)
         self.fs_utils = FSUtils()
+        self.llm = get_llm_gateway()
         self._init_history_files()
         
     def _init_history_files(self):
@@ -45,6 +56,8 @@ class InteractiveManager:
         except Exception as e:
             self.logger.error(f"❌ Session error: {str(e)}")
             raise
+        finally:
+            await self.aider_manager.shutdown()
 
     async def _planning_phase(self):
         """Execute the planning phase of interaction."""
@@ -129,55 +142,12 @@ class InteractiveManager:
         try:
             self.logger.info("\n🚀 Starting aider session...")
             
-            # Extract and validate files from objective using regex
-            import re
+            # Extract and validate the project files referenced by the objective
             files_to_modify = []
             filtered_lines = []
-            
-            # Match anything that looks like a filename with extension
-            potential_files = re.findall(r'[\w\-./\\]+\.[A-Za-z]+', objective)
-            
-            # Get list of all existing files in project
-            existing_files = set()
-            for root, _, files in os.walk('.'):
-                # Skip .aider folders
-                if '.aider' in root.split(os.sep):
-                    continue
-                for file in files:
-                    # Skip .aider files
-                    if file.startswith('.aider'):
-                        continue
-                    # Convert to relative path with forward slashes
-                    rel_path = os.path.relpath(os.path.join(root, file), '.').replace('\\', '/')
-                    existing_files.add(rel_path)
-                    # Also add without ./ prefix
-                    if rel_path.startswith('./'):
-                        existing_files.add(rel_path[2:])
-            
-            # Track found files to avoid duplicates
-            found_files = set()
-            
-            # Process each potential file
-            for potential_file in potential_files:
-                # Clean up the path
-                clean_path = potential_file.replace('\\', '/').strip()
-                if clean_path.startswith('./'):
-                    clean_path = clean_path[2:]
-                
-                # Check against existing files
-                if clean_path in existing_files:
-                    if clean_path not in found_files:
-                        found_files.add(clean_path)
-                        description = ""
-                        # Try to find description in original objective
-                        for line in objective.split('\n'):
-                            if clean_path in line:
-                                parts = line.split(clean_path, 1)
-                                if len(parts) > 1:
-                                    description = parts[1].strip()
-                                break
-                        files_to_modify.append((clean_path, description))
-                        filtered_lines.append(f"- ./{clean_path} {description}")
+            for reference in find_file_references(objective):
+                files_to_modify.append((reference.path, reference.description))
+                filtered_lines.append(f"- ./{reference.path} {reference.description}")
 
             if not files_to_modify:
                 self.logger.error("❌ No valid files to modify")
@@ -230,36 +200,14 @@ class InteractiveManager:
     async def _research_objective(self, query):
         """Perform research using Perplexity API if needed."""
         try:
-            perplexity_key = os.getenv('PERPLEXITY_API_KEY')
-            if not perplexity_key:
+            if not os.getenv('PERPLEXITY_API_KEY'):
                 return None
                 
-            headers = {
-                "Authorization": f"Bearer {perplexity_key}",
-                "Content-Type": "application/json"
-            }
-            payload = {
-                "model": "llama-3.1-sonar-small-128k-online",
-                "messages": [
-                    {"role": "system", "content": "You are a helpful research assistant providing accurate, detailed information."},
-                    {"role": "user", "content": query}
-                ]
-            }
-            
             self.logger.info("🔍 Executing research query...")
-            response = requests.post(
-                "https://api.perplexity.ai/chat/completions",
-                headers=headers,
-                json=payload,
-                timeout=30
-            )
-            self.logger.success("✨ Research query completed")
-            
-            if response.status_code == 200:
-                return response.json()["choices"][0]["message"]["content"]
-            else:
-                self.logger.warning(f"⚠️ Perplexity API call failed with status {response.status_code}")
-                return None
+            result = await get_research_service().search(query)
+            if result:
+                self.logger.success("✨ Research query completed")
+            return result
                 
         except Exception as e:
             self.logger.warning(f"⚠️ Research failed: {str(e)}")
@@ -285,9 +233,16 @@ class InteractiveManager:
             self.logger.info("   - Analyzing current todolist...")
             self.logger.info("   - Generating enhanced objective...")
             
-            # Create the prompt
+            budget = PromptBudget('interactive objective', model=self.model, total=PROMPT_TOKEN_BUDGET)
+            budget.add('mission', mission_content, max_tokens=MISSION_TOKEN_BUDGET, priority=2)
+            budget.add('todolist', todolist_content, max_tokens=TODOLIST_TOKEN_BUDGET)
+            budget.add('objective', objective, max_tokens=OBJECTIVE_TOKEN_BUDGET, priority=3)
+            sections = budget.build()
+
+            # Static instructions, then the mission, then the volatile todolist and objective
             system_prompt = """You are an AI project manager helping to process user objectives.
 Your task is to analyze and enhance user objectives to align with the project mission and current state.
+Process each objective to be more specific and actionable while maintaining alignment with the mission.
 
 Format the objective to include:
 1. Clear action items
@@ -296,37 +251,35 @@ Format the objective to include:
 4. Validation steps"""
 
             user_prompt = f"""
-Mission Context
-================
-```
-{mission_content}
-```
-
 Current Todolist
 ================
 ```
-{todolist_content}
+{sections['todolist']}
 ```
 
 User Objective
 ================
-{objective}
+{sections['objective']}"""
 
-Instructions
+            layout = PromptLayout()
+            layout.add(STATIC, "system", system_prompt)
+            layout.add(SLOW, "user", f"""
+Mission Context
 ================
-Process this objective to be more specific and actionable while maintaining alignment with the mission."""
+```
+{sections['mission']}
+```""")
+            layout.add(VOLATILE, "user", user_prompt)
+            messages = layout.messages()
 
             # Log the prompts at debug level
             self.logger.debug("\n🔍 GPT SYSTEM PROMPT:\n" + system_prompt)
-            self.logger.debug("\n🔍 GPT USER PROMPT:\n" + user_prompt)
+            self.logger.debug("\n🔍 GPT USER PROMPT:\n" + messages[-1]["content"])
             
-            client = openai.OpenAI()
-            response = client.chat.completions.create(
+            response = await self.llm.chat_completion(
+                call_class=PLANNING,
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": user_prompt}
-                ],
+                messages=messages,
                 temperature=0.3,
                 max_tokens=500,
                 stream=True  # Enable streaming
@@ -335,8 +288,8 @@ Process this objective to be more specific and actionable while maintaining alig
             # Stream the response
             result = []
             print("\n📝 Enhanced objective:")
-            for chunk in response:
-                if chunk.choices[0].delta.content:
+            async for chunk in response:
+                if chunk.choices and chunk.choices[0].delta.content:
                     content = chunk.choices[0].delta.content
                     result.append(content)
                     print(content, end='', flush=True)
@@ -359,31 +312,79 @@ Process this objective to be more specific and actionable while maintaining alig
                 raise ValueError("No processed objective provided for file context analysis")
 
             # Get list of valid files, excluding .aider and .git
-            valid_files = set()
-            for root, _, files in os.walk('.'):
-                # Skip .git and .aider folders
-                if '.git' in root.split(os.sep) or '.aider' in root.split(os.sep):
-                    continue
-                for file in files:
-                    # Skip .aider files
-                    if file.startswith('.aider'):
-                        continue
-                    rel_path = os.path.relpath(os.path.join(root, file), '.').replace('\\', '/')
-                    valid_files.add(rel_path)
-                    if rel_path.startswith('./'):
-                        valid_files.add(rel_path[2:])
+            valid_files = set(get_project_index().list_files())
 
             # Create tree text with valid files
             tree_text = "\n".join(f"- ./{f}" for f in sorted(valid_files)) if valid_files else "No existing files"
             
             self.logger.debug(f"\n🌳 Available files:\n{tree_text}")
 
-            # Generate fresh visualization
+            # Rank files locally; the LLM only re-ranks the shortlist if asked to
+            result = None
+            if FILE_SELECTION_MODE in ('local', 'rerank') and valid_files:
+                try:
+                    ranked = await asyncio.to_thread(
+                        get_file_index().rank, processed_objective, sorted(valid_files),
+                        RERANK_CANDIDATES if FILE_SELECTION_MODE == 'rerank' else None
+                    )
+                    if FILE_SELECTION_MODE == 'local':
+                        result = format_file_selection(ranked)
+                    else:
+                        tree_text = "\n".join(f"- ./{path}" for path, _ in ranked)
+                except Exception as e:
+                    self.logger.warning(f"⚠️ Local file ranking failed, asking the LLM: {str(e)}")
+
+            if result is None:
+                result = await self._select_files_with_llm(tree_text, processed_objective)
+            
+            # Validate suggested files exist
+            validated_lines = []
+            for line in result.split('\n'):
+                if line.startswith('- ./'):
+                    file_path = line.split(' ')[1]  # Extract path
+                    if os.path.exists(file_path):
+                        validated_lines.append(line)
+                    else:
+                        self.logger.warning(f"⚠️ Skipping non-existent file: {file_path}")
+                else:
+                    validated_lines.append(line)
+                    
+            validated_result = '\n'.join(validated_lines)
+            self.logger.success("✨ File context analysis completed")
+            return validated_result
+            
+        except Exception as e:
+            self.logger.error(f"File context analysis error: {str(e)}")
+            raise
+
+    async def _select_files_with_llm(self, tree_text, processed_objective):
+        """
+        Ask the LLM to pick the context and write files for an objective.
+        
+        Args:
+            tree_text (str): Candidate files, one "- ./path" line each
+            processed_objective (str): Objective the files are selected for
+            
+        Returns:
+            str: "# Context Files" / "# Write Files" lists
+        """
+        budget = PromptBudget('interactive file context', model=self.model, total=PROMPT_TOKEN_BUDGET)
+        budget.add('files', tree_text, max_tokens=FILE_LIST_TOKEN_BUDGET)
+        budget.add('objective', processed_objective, max_tokens=OBJECTIVE_TOKEN_BUDGET, priority=2)
+        sections = budget.build()
+
+        # Generate fresh visualization (only the full-tree selection sends the diagram)
+        if FILE_SELECTION_MODE == 'llm':
             await self.vision_manager.generate_visualization()
 
-            # Initialize messages list
-            messages = [
-                {"role": "system", "content": """You are a technical analyst helping to plan file operations for a development objective.
+        # Instructions, then the project files, then the objective and the fresh diagram
+        layout = PromptLayout()
+        layout.add(STATIC, "system", """You are a technical analyst helping to plan file operations for a development objective.
+
+Based on the current files and objective:
+1. Select relevant existing files to read for context
+2. Suggest files to modify or create
+3. Aider will handle the actual file operations
 
 Format your response as:
 # Context Files (read-only)
@@ -396,108 +397,69 @@ Rules:
 - Files should be organized in appropriate folders
 - Include clear purpose for each file
 - Use relevant emojis
-- Consider project structure best practices"""}
-            ]
+- Consider project structure best practices
 
-            # Add diagram if available
-            if os.path.exists('./diagram.png'):
-                try:
-                    with open('./diagram.png', 'rb') as f:
-                        diagram_content = f.read()
-                    import base64
-                    encoded_bytes = base64.b64encode(diagram_content).decode('utf-8')
-                    messages.append({
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{encoded_bytes}"
-                                }
-                            }
-                        ]
-                    })
-                    self.logger.debug("Added diagram to analysis context")
-                except Exception as e:
-                    self.logger.warning(f"⚠️ Could not encode diagram: {str(e)}")
-
-            # Add main analysis prompt
-            messages.append({
-                "role": "user", 
-                "content": f"""
+Respond with the two file lists as shown in the format above.""")
+        layout.add(SLOW, "user", f"""
 Current Files
 ================
 ```
-{tree_text}
-```
-
+{sections['files']}
+```""")
+        layout.add(VOLATILE, "user", f"""
 Objective
 ================
 ```
-{processed_objective}
-```
+{sections['objective']}
+```""")
 
-Instructions
-================
-Based on the current files and objective:
-1. Select relevant existing files to read for context
-2. Suggest files to modify or create
-3. Aider will handle the actual file operations
-
-Respond with the two file lists as shown in the format above."""
-            })
-            
-            # Log the prompts at debug level
-            self.logger.debug("\n🔍 File Context Analysis Prompt:")
-            for msg in messages:
-                if isinstance(msg["content"], str):
-                    self.logger.debug(f"\n{msg['role'].upper()}:\n{msg['content']}")
-                else:
-                    self.logger.debug(f"\n{msg['role'].upper()}: [Image + Text Content]")
-            
-            # Make API call with explicit error handling
+        # Add diagram if available
+        if FILE_SELECTION_MODE == 'llm' and os.path.exists('./diagram.png'):
             try:
-                self.logger.info("🔍 Analyzing file context with GPT...")
-                client = openai.OpenAI()
-                response = client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=0.3,
-                    max_tokens=500
-                )
-                
-                if not response.choices:
-                    raise ValueError("No response choices received from GPT")
-                    
-                result = response.choices[0].message.content
-                
-                if not result.strip():
-                    raise ValueError("Empty response from GPT")
-                    
+                with open('./diagram.png', 'rb') as f:
+                    diagram_content = f.read()
+                import base64
+                encoded_bytes = base64.b64encode(diagram_content).decode('utf-8')
+                layout.add_image(VOLATILE, encoded_bytes)
+                self.logger.debug("Added diagram to analysis context")
             except Exception as e:
-                self.logger.error(f"GPT API call failed: {str(e)}")
-                raise
+                self.logger.warning(f"⚠️ Could not encode diagram: {str(e)}")
+
+        messages = layout.messages()
+
+        # Log the prompts at debug level
+        self.logger.debug("\n🔍 File Context Analysis Prompt:")
+        for msg in messages:
+            if isinstance(msg["content"], str):
+                self.logger.debug(f"\n{msg['role'].upper()}:\n{msg['content']}")
+            else:
+                self.logger.debug(f"\n{msg['role'].upper()}: [Image + Text Content]")
+        
+        # Make API call with explicit error handling
+        try:
+            self.logger.info("🔍 Analyzing file context with GPT...")
+            response = await self.llm.chat_completion(
+                call_class=FILE_SELECTION,
+                model=self.model,
+                messages=messages,
+                temperature=0.3,
+                max_tokens=500
+            )
             
-            # Validate suggested files exist
-            validated_lines = []
-            for line in result.split('\n'):
-                if line.startswith('- ./'):
-                    file_path = line.split(' ')[1]  # Extract path
-                    if os.path.exists(file_path):
-                        validated_lines.append(line)
-                    else:
-                        self.logger.warning(f"⚠️ Skipping non-existent file: {file_path}")
-                else:
-                    validated_lines.append(line)
-                    
-            validated_result = '\n'.join(validated_lines)
-            self.logger.success("✨ File context analysis completed")
-            return validated_result
+            if not response.choices:
+                raise ValueError("No response choices received from GPT")
+                
+            result = response.choices[0].message.content
             
+            if not result.strip():
+                raise ValueError("Empty response from GPT")
+                
         except Exception as e:
-            self.logger.error(f"File context analysis error: {str(e)}")
+            self.logger.error(f"GPT API call failed: {str(e)}")
             raise
 
+        return result
+
     async def _should_continue(self):
         """Check if user wants to continue with another objective."""
         print("\n🔄 Would you like to work on another objective? [Y/n]")
@@ -1,11 +1,32 @@
 import os
-import requests
+import re
+import json
+import base64
+import asyncio
+import time
+import hashlib
 from utils.logger import Logger
 from utils.encoding_utils import EncodingUtils
 from utils.fs_utils import FSUtils
+from utils.llm_gateway import get_llm_gateway
+from utils.model_router import FILE_SELECTION, PLANNING, SUMMARIZATION
+from utils.file_leases import parse_write_files, SHARED_FILES
+from utils.prompt_budget import (
+    PromptBudget, KEEP_TAIL, PROMPT_TOKEN_BUDGET, MISSION_TOKEN_BUDGET, AGENT_TOKEN_BUDGET,
+    TODOLIST_TOKEN_BUDGET, SUIVI_TOKEN_BUDGET, OBJECTIVE_TOKEN_BUDGET, FILE_LIST_TOKEN_BUDGET
+)
+from utils.prompt_layout import PromptLayout, STATIC, SLOW, VOLATILE
+from utils.file_ranker import get_file_index, format_file_selection, FILE_SELECTION_MODE, RERANK_CANDIDATES
+from utils.research_service import get_research_service
+from utils.file_index import get_project_index
 import openai
 from dotenv import load_dotenv
 
+# Tracking log lines considered when fingerprinting an agent's inputs
+SUIVI_FINGERPRINT_LINES = 80  # same window as the objective prompt
+RESEARCH_TOKEN_BUDGET = 4000  # Perplexity results quoted in the research summary prompt
+BATCH_MAX_TOKENS = 16000  # completion cap of a multi-agent planning round
+
 class ObjectiveManager:
     """Manager class for generating agent-specific objectives."""
     
@@ -18,10 +39,13 @@ class ObjectiveManager:
         if not openai.api_key:
             raise ValueError("OpenAI API key not found in environment variables")
         
+        # Process-wide LLM gateway
+        self.llm = get_llm_gateway()
+        
         # Load mission content
         self.mission_content = self._load_mission_content()
 
-    def generate_objective(self, mission_filepath=".aider.mission.md", agent_filepath=None):
+    async def generate_objective(self, mission_filepath=".aider.mission.md", agent_filepath=None):
         """
         Generate a specific objective for an agent based on mission and agent configuration.
         
@@ -29,6 +53,28 @@ class ObjectiveManager:
             mission_filepath (str): Path to mission specification file
             agent_filepath (str): Path to agent configuration file
             
+        Raises:
+            ValueError: If required files are invalid or missing
+            IOError: If there are file operation issues
+        """
+        plan = await self.plan_objective(mission_filepath, agent_filepath)
+        self.save_objective(plan)
+
+    async def plan_objective(self, mission_filepath=".aider.mission.md", agent_filepath=None):
+        """
+        Generate an objective without writing it, so it can be prepared ahead of time.
+        
+        Args:
+            mission_filepath (str): Path to mission specification file
+            agent_filepath (str): Path to agent configuration file
+            
+        Returns:
+            dict: Planned objective with keys:
+                - agent_name: Agent the objective is for
+                - content: Objective text, including research results
+                - summary: One-line summary for the tracking logs
+                - dependencies: Signatures of the files the objective was based on
+                
         Raises:
             ValueError: If required files are invalid or missing
             IOError: If there are file operation issues
@@ -55,26 +101,238 @@ class ObjectiveManager:
             # Extract agent name from filepath
             agent_name = self._extract_agent_name(agent_filepath)
             
+            # Snapshot the inputs before reading them so later edits invalidate the plan.
+            # Shared files (todolist.md) change on nearly every cycle and an objective
+            # planned from a slightly older version is still useful, so they are left out.
+            dependencies = self._snapshot_files([mission_filepath, agent_filepath])
+            
             # Load content from files
             mission_content = self._read_file(mission_filepath)
             agent_content = self._read_file(agent_filepath)
             
             # Generate objective via GPT
-            objective = self._generate_objective_content(mission_content, agent_content, agent_name)
-        
-            # Generate summary for logging
-            summary = self._generate_summary(objective, agent_name, agent_content)  # Pass agent_content
-            self.logger.success(summary)
+            objective = await self._generate_objective_content(mission_content, agent_content, agent_name)
+            return await self._complete_plan(agent_name, agent_content, objective, dependencies)
+            
+        except Exception as e:
+            self.logger.error(f"❌ Objective generation failed: {str(e)}")
+            raise
+
+    async def plan_objectives(self, mission_filepath=".aider.mission.md", agent_filepaths=()):
+        """
+        Plan the objectives of several agents in one round.
         
-            # Save objective
-            output_path = f".aider.objective.{agent_name}.md"
-            self._save_objective(output_path, objective, agent_name, agent_content)  # Pass agent_content
+        The shared context (mission, todolist, suivi.md, diagram) is sent once
+        and a single JSON completion assigns every agent its own objectives.
+        Agents missing from the answer are planned individually.
         
-            self.logger.info(f"✅ Successfully generated objective for {agent_name}")
+        Args:
+            mission_filepath (str): Path to mission specification file
+            agent_filepaths (list): Paths to the agents' configuration files
+            
+        Returns:
+            dict: Agent name -> plan, as returned by plan_objective; agents
+                whose planning failed are left out
             
+        Raises:
+            ValueError: If required files are invalid or missing
+        """
+        agent_filepaths = list(agent_filepaths)
+        if len(agent_filepaths) == 1:
+            plan = await self.plan_objective(mission_filepath, agent_filepaths[0])
+            return {plan['agent_name']: plan}
+
+        for filepath in [mission_filepath, *agent_filepaths]:
+            if not os.path.exists(filepath):
+                raise ValueError(f"File not found: {filepath}")
+
+        agent_names = [self._extract_agent_name(path) for path in agent_filepaths]
+        self.logger.info(f"🎯 Planning objectives for {len(agent_names)} agents: {', '.join(agent_names)}")
+
+        # Same dependency snapshots as plan_objective, taken before reading
+        dependencies = {
+            agent_name: self._snapshot_files([mission_filepath, agent_filepath])
+            for agent_name, agent_filepath in zip(agent_names, agent_filepaths)
+        }
+        mission_content = self._read_file(mission_filepath)
+        agent_contents = {
+            agent_name: self._read_file(agent_filepath)
+            for agent_name, agent_filepath in zip(agent_names, agent_filepaths)
+        }
+
+        try:
+            objectives = await self._generate_batch_objective_content(mission_content, agent_contents)
         except Exception as e:
-            self.logger.error(f"❌ Objective generation failed: {str(e)}")
+            self.logger.warning(f"⚠️ Batch objective planning failed, planning agents one by one: {str(e)}")
+            objectives = {}
+
+        async def plan_agent(agent_name):
+            objective = objectives.get(agent_name)
+            if objective is None:
+                objective = await self._generate_objective_content(
+                    mission_content, agent_contents[agent_name], agent_name
+                )
+            return await self._complete_plan(
+                agent_name, agent_contents[agent_name], objective, dependencies[agent_name]
+            )
+
+        # One agent's failure must not discard the plans of the others
+        results = await asyncio.gather(
+            *(plan_agent(agent_name) for agent_name in agent_names),
+            return_exceptions=True
+        )
+        plans = {}
+        for agent_name, result in zip(agent_names, results):
+            if isinstance(result, Exception):
+                self.logger.warning(f"⚠️ Objective planning failed for {agent_name}: {str(result)}")
+            else:
+                plans[agent_name] = result
+        return plans
+
+    async def _complete_plan(self, agent_name, agent_content, objective, dependencies):
+        """
+        Add the summary, required files and research to a generated objective.
+        
+        Returns:
+            dict: Plan, as returned by plan_objective
+        """
+        # Everything else only depends on the objective text: run it concurrently
+        summary, file_context, research = await asyncio.gather(
+            self._generate_summary(objective, agent_name, agent_content),
+            self._generate_file_context(objective, agent_content),
+            self._research(objective, agent_name, agent_content)
+        )
+        if file_context:
+            objective += "\n\n# Required Files\n" + file_context
+        objective += research
+        
+        # The files the objective plans to modify are dependencies too
+        dependencies = dict(dependencies)
+        dependencies.update(self._snapshot_files(parse_write_files(objective) - set(SHARED_FILES)))
+        
+        return {
+            'agent_name': agent_name,
+            'content': objective,
+            'summary': summary,
+            'dependencies': dependencies
+        }
+
+    def save_objective(self, plan):
+        """
+        Write a planned objective to .aider.objective.{agent}.md.
+        
+        Args:
+            plan (dict): Objective returned by plan_objective
+        """
+        agent_name = plan['agent_name']
+        self.logger.success(plan['summary'])
+        
+        output_path = f".aider.objective.{agent_name}.md"
+        try:
+            # Save objective with UTF-8 encoding
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(plan['content'])
+        except Exception as e:
+            self.logger.error(f"Error saving objective to {output_path}: {str(e)}")
             raise
+    
+        self.logger.info(f"✅ Successfully generated objective for {agent_name}")
+
+    def is_objective_current(self, plan):
+        """
+        Check that none of the files a planned objective depends on changed.
+        
+        Args:
+            plan (dict): Objective returned by plan_objective
+            
+        Returns:
+            bool: True if the objective can still be used
+        """
+        dependencies = plan['dependencies']
+        return self._snapshot_files(dependencies.keys()) == dependencies
+
+    def compute_input_fingerprint(self, agent_name, mission_filepath=".aider.mission.md"):
+        """
+        Hash everything an agent's next objective would react to.
+        
+        Inputs are the mission, the agent file, todolist.md, the write files of
+        the agent's last objective and the recent suivi.md lines attributed to
+        other agents (the agent's own log lines are not news to it).
+        
+        Args:
+            agent_name (str): Agent to fingerprint
+            mission_filepath (str): Path to mission specification file
+            
+        Returns:
+            str: Hex digest of the agent's inputs
+        """
+        objective_filepath = f".aider.objective.{agent_name}.md"
+        inputs = [mission_filepath, f".aider.agent.{agent_name}.md", 'todolist.md']
+        if os.path.exists(objective_filepath):
+            inputs.extend(sorted(parse_write_files(self._read_file(objective_filepath))))
+
+        digest = hashlib.sha256()
+        for filepath in dict.fromkeys(inputs):
+            digest.update(filepath.encode('utf-8') + b'\0')
+            try:
+                with open(filepath, 'rb') as f:
+                    digest.update(hashlib.sha256(f.read()).digest())
+            except OSError:
+                digest.update(b'missing')
+
+        # Only lines attributed to other agents, without their timestamps
+        if os.path.exists('suivi.md'):
+            try:
+                with open('suivi.md', 'r', encoding='utf-8', errors='replace') as f:
+                    lines = f.readlines()[-SUIVI_FINGERPRINT_LINES:]
+                for line in lines:
+                    match = re.search(r'Agent (\w+)', line)
+                    if match and match.group(1) != agent_name:
+                        digest.update(line[match.start():].strip().encode('utf-8') + b'\n')
+            except OSError as e:
+                self.logger.debug(f"Could not read suivi.md for fingerprint: {str(e)}")
+
+        return digest.hexdigest()
+
+    def save_input_fingerprint(self, agent_name, mission_filepath=".aider.mission.md"):
+        """Record the current inputs of an agent, typically at the end of its cycle."""
+        fingerprint_path = f".aider.objective.{agent_name}.fingerprint"
+        with open(fingerprint_path, 'w', encoding='utf-8') as f:
+            f.write(self.compute_input_fingerprint(agent_name, mission_filepath))
+
+    def has_new_inputs(self, agent_name, mission_filepath=".aider.mission.md", max_age=None):
+        """
+        Check whether an agent's inputs changed since its fingerprint was recorded.
+        
+        Args:
+            agent_name (str): Agent to check
+            mission_filepath (str): Path to mission specification file
+            max_age (float, optional): Seconds after which a recorded fingerprint
+                no longer holds the agent back
+            
+        Returns:
+            bool: True if the agent has something new to react to
+        """
+        fingerprint_path = f".aider.objective.{agent_name}.fingerprint"
+        try:
+            if max_age is not None and time.time() - os.path.getmtime(fingerprint_path) > max_age:
+                return True
+            with open(fingerprint_path, 'r', encoding='utf-8') as f:
+                recorded = f.read().strip()
+        except OSError:
+            return True
+        return recorded != self.compute_input_fingerprint(agent_name, mission_filepath)
+
+    def _snapshot_files(self, filepaths):
+        """Return {path: (mtime_ns, size)} for each path, None for missing files."""
+        snapshot = {}
+        for filepath in filepaths:
+            try:
+                stat = os.stat(filepath)
+                snapshot[filepath] = (stat.st_mtime_ns, stat.st_size)
+            except OSError:
+                snapshot[filepath] = None
+        return snapshot
 
     def _validate_file(self, filepath):
         """Validate file exists and is readable."""
@@ -90,115 +348,49 @@ class ObjectiveManager:
         """Read content from file with robust encoding handling."""
         return self.encoding_utils.read_file_safely(filepath)
 
-    def _generate_objective_content(self, mission_content, agent_content, agent_name):
-        """Generate objective content using GPT."""
-        try:
-            client = openai.OpenAI()
-
-            # Build list of all file paths
-            files = []
-            for root, _, filenames in os.walk('.'):
-                # Skip any folder that starts with .
-                if not any(part.startswith('.') for part in root.split(os.sep)[1:]):
-                    for filename in filenames:
-                        # Skip files that start with . or .aider
-                        if not (filename.startswith('.') or filename.startswith('.aider')):
-                            full_path = os.path.join(root, filename)
-                            rel_path = os.path.relpath(full_path, '.').replace(os.sep, '/')
-                            files.append(f"- ./{rel_path}")
-
-            # Create sorted list of paths
-            tree_text = "\n".join(sorted(files)) if files else "No existing files"
-
-            # Read last 80 lines from suivi.md if it exists
-            suivi_content = ""
-            if os.path.exists('suivi.md'):
-                try:
-                    with open('suivi.md', 'r', encoding='utf-8') as f:
-                        lines = f.readlines()
-                        last_lines = lines[-80:] if len(lines) > 80 else lines
-                        suivi_content = ''.join(last_lines)
-                except Exception as e:
-                    self.logger.warning(f"⚠️ Could not read suivi.md: {str(e)}")
+    def _read_recent_activity(self):
+        """Return the last lines of suivi.md and the todolist, empty when unavailable."""
+        # Read last 80 lines from suivi.md if it exists
+        suivi_content = ""
+        if os.path.exists('suivi.md'):
+            try:
+                with open('suivi.md', 'r', encoding='utf-8') as f:
+                    lines = f.readlines()
+                    last_lines = lines[-80:] if len(lines) > 80 else lines
+                    suivi_content = ''.join(last_lines)
+            except Exception as e:
+                self.logger.warning(f"⚠️ Could not read suivi.md: {str(e)}")
 
-            # Read todolist.md if it exists
-            todolist = ""
-            if os.path.exists('todolist.md'):
-                try:
-                    with open('todolist.md', 'r', encoding='utf-8') as f:
-                        todolist = f.read()
-                except Exception as e:
-                    self.logger.warning(f"⚠️ Could not read todolist.md: {str(e)}")
+        # Read todolist.md if it exists
+        todolist = ""
+        if os.path.exists('todolist.md'):
+            try:
+                with open('todolist.md', 'r', encoding='utf-8') as f:
+                    todolist = f.read()
+            except Exception as e:
+                self.logger.warning(f"⚠️ Could not read todolist.md: {str(e)}")
 
-            # Read and encode diagram.png if it exists
-            diagram_content = None
-            if os.path.exists('./diagram.png'):
-                try:
-                    with open('./diagram.png', 'rb') as f:
-                        diagram_content = f.read()
-                except Exception as e:
-                    self.logger.warning(f"⚠️ Could not read diagram.png: {str(e)}")
+        return suivi_content, todolist
 
-            # Check for Perplexity API key
-            perplexity_key = os.getenv('PERPLEXITY_API_KEY')
-            if perplexity_key:
-                search_instruction = """
+    def _objective_instructions(self, subject):
+        """
+        Static part of the objective planning prompt.
+        
+        Args:
+            subject (str): Which agent(s) to plan for, e.g. "the agent described
+                in the System Prompt"
+        """
+        # Check for Perplexity API key
+        perplexity_key = os.getenv('PERPLEXITY_API_KEY')
+        if perplexity_key:
+            search_instruction = """
 
 4. **Search**
    - If research needed, add "Search:" line with query"""
-            else:
-                search_instruction = ""
-
-            prompt = f"""
-Mission
-================
-````
-{mission_content}
-````
-
-Project Structure Diagram
-================
-The image attached is a visualization of the repository showing folders, file sizes and structure, that you can use to enhance your decision-making.
-
-Recent Activity (last 80 lines)
-================
-````
-{suivi_content}
-````
-
-Todolist
-================
-````
-{todolist}
-````
+        else:
+            search_instruction = ""
 
-Instructions
-================
-Based on the provided info, generate 3 clear specific next steps for the {agent_name} agent.
-Create two objectives in markdown format - one for production, one specific to {agent_name}'s role. Each objective should specify:
-
-1. **Action Statement**
-   - Focused, specific tasks to accomplish (3 max)
-   - Clear relation to current mission state
-   - Within agent's documented capabilities
-
-2. **Operation Type**
-   - What kind of changes will be needed
-   - Expected impact on system
-   - Required capabilities
-
-3. **Validation Points**
-   - How to verify success
-   - What output to check
-   - Which states to validate{search_instruction}
-"""
-            #self.logger.info(f"OBJECTIVE PROMPT: {prompt}")
-
-            # First get the main objective
-            response = client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": f"""
+        return f"""
 # Context
 
 ## KinOS Operation Parameters
@@ -229,84 +421,222 @@ Your planning:
 - Avoids repeating previous work
 - Maintains clear progression
 - Focuses, achievable steps
-                     
+
+# Instructions
+Based on the provided info, generate 3 clear specific next steps for {subject}.
+Create two objectives in markdown format - one for production, one specific to the agent's role. Each objective should specify:
+
+1. **Action Statement**
+   - Focused, specific tasks to accomplish (3 max)
+   - Clear relation to current mission state
+   - Within agent's documented capabilities
+
+2. **Operation Type**
+   - What kind of changes will be needed
+   - Expected impact on system
+   - Required capabilities
+
+3. **Validation Points**
+   - How to verify success
+   - What output to check
+   - Which states to validate{search_instruction}
+"""
+
+    def _add_activity_segments(self, layout, sections):
+        """Add the volatile suivi, todolist and diagram segments to an objective prompt."""
+        layout.add(VOLATILE, "user", f"""
+Recent Activity (last 80 lines)
+================
+````
+{sections['suivi']}
+````
+
+Todolist
+================
+````
+{sections['todolist']}
+````
+""")
+        encoded_diagram = self._read_diagram()
+        if encoded_diagram:
+            layout.add_image(
+                VOLATILE, encoded_diagram,
+                "Above is the current project structure visualization: the repository's folders, "
+                "file sizes and structure. Use it to inform your objective planning."
+            )
+
+    async def _generate_objective_content(self, mission_content, agent_content, agent_name):
+        """Generate objective content using GPT."""
+        try:
+            suivi_content, todolist = self._read_recent_activity()
+
+            budget = PromptBudget('objective', model=self.model, total=PROMPT_TOKEN_BUDGET)
+            budget.add('mission', mission_content, max_tokens=MISSION_TOKEN_BUDGET, priority=3)
+            budget.add('agent', agent_content, max_tokens=AGENT_TOKEN_BUDGET, priority=3)
+            budget.add('todolist', todolist, max_tokens=TODOLIST_TOKEN_BUDGET, priority=2)
+            budget.add('suivi', suivi_content, max_tokens=SUIVI_TOKEN_BUDGET, keep=KEEP_TAIL)
+            sections = budget.build()
+
+            # Stable prefix first so the provider can reuse it across agents and cycles
+            layout = PromptLayout()
+            layout.add(STATIC, "system", self._objective_instructions("the agent described in the System Prompt"))
+            layout.add(SLOW, "user", f"""
+Mission
+================
+````
+{sections['mission']}
+````
+""")
+            layout.add(SLOW, "system", f"""
 # System Prompt
-{agent_content}
-"""}
-                ],
+{sections['agent']}
+""")
+            self._add_activity_segments(layout, sections)
+            layout.add(VOLATILE, "user", f"Generate the objectives for the {agent_name} agent now.")
+
+            # Single completion producing the objective
+            response = await self.llm.chat_completion(
+                call_class=PLANNING,
+                model=self.model,
+                messages=layout.messages(),
                 temperature=0.5,
                 max_tokens=2000
             )
 
-            # Get initial objective content
-            objective = response.choices[0].message.content
+            return response.choices[0].message.content
+            
+        except Exception as e:
+            self.logger.error(f"GPT API call failed: {str(e)}")
+            raise
 
-            # Get file context for objective
-            # Create file context prompt with logged tree text
-            file_context_prompt = f"""
-Objectives
+    async def _generate_batch_objective_content(self, mission_content, agent_contents):
+        """
+        Generate the objectives of several agents in one JSON completion.
+        
+        Args:
+            mission_content (str): Mission specification
+            agent_contents (dict): Agent name -> agent configuration
+            
+        Returns:
+            dict: Agent name -> objective text, for the agents the model answered for
+        """
+        suivi_content, todolist = self._read_recent_activity()
+
+        agent_count = len(agent_contents)
+        budget = PromptBudget(
+            f'batch objective ({agent_count} agents)', model=self.model,
+            total=PROMPT_TOKEN_BUDGET + AGENT_TOKEN_BUDGET * (agent_count - 1)
+        )
+        budget.add('mission', mission_content, max_tokens=MISSION_TOKEN_BUDGET, priority=3)
+        for agent_name, agent_content in agent_contents.items():
+            budget.add(f'agent {agent_name}', agent_content, max_tokens=AGENT_TOKEN_BUDGET, priority=3)
+        budget.add('todolist', todolist, max_tokens=TODOLIST_TOKEN_BUDGET, priority=2)
+        budget.add('suivi', suivi_content, max_tokens=SUIVI_TOKEN_BUDGET, keep=KEEP_TAIL)
+        sections = budget.build()
+
+        agents_text = "\n".join(
+            f"\n## Agent {agent_name}\n{sections[f'agent {agent_name}']}"
+            for agent_name in agent_contents
+        )
+
+        layout = PromptLayout()
+        layout.add(STATIC, "system", self._objective_instructions("each agent listed in the Agents section") + """
+# Coordination
+You are planning for several agents working at the same time:
+- Give every agent its own assignment: no two agents may work on the same task or the same part of the project
+- Stay within each agent's role
+
+# Output Format
+Respond with a JSON object mapping each agent name to its objectives in markdown:
+{"objectives": {"<agent name>": "<markdown objectives>", ...}}
+""")
+        layout.add(SLOW, "user", f"""
+Mission
 ================
 ````
-{objective}
+{sections['mission']}
 ````
+""")
+        layout.add(SLOW, "system", f"""
+# Agents
+{agents_text}
+""")
+        self._add_activity_segments(layout, sections)
+        layout.add(VOLATILE, "user", f"Generate the objectives for these agents now: {', '.join(agent_contents)}.")
+
+        response = await self.llm.chat_completion(
+            call_class=PLANNING,
+            model=self.model,
+            messages=layout.messages(),
+            temperature=0.5,
+            max_tokens=min(BATCH_MAX_TOKENS, 2000 * agent_count),
+            response_format={"type": "json_object"}
+        )
 
-Project structure
-================
-````
-{tree_text}
-````
-"""
-            # Add diagram if available
-            if os.path.exists('./diagram.png'):
+        try:
+            objectives = json.loads(response.choices[0].message.content).get('objectives', {})
+        except (json.JSONDecodeError, AttributeError) as e:
+            self.logger.warning(f"⚠️ Could not parse batch objectives: {str(e)}")
+            return {}
+
+        return {
+            agent_name: objectives[agent_name].strip()
+            for agent_name in agent_contents
+            if isinstance(objectives.get(agent_name), str) and objectives[agent_name].strip()
+        }
+
+    def _read_diagram(self):
+        """Return diagram.png encoded in base64, or None if unavailable."""
+        if not os.path.exists('./diagram.png'):
+            return None
+        try:
+            with open('./diagram.png', 'rb') as f:
+                return base64.b64encode(f.read()).decode('utf-8')
+        except Exception as e:
+            self.logger.warning(f"⚠️ Could not read diagram.png: {str(e)}")
+            return None
+
+    async def _generate_file_context(self, objective, agent_content):
+        """
+        Select the context and write files needed for an objective.
+        
+        Returns:
+            str: "# Context Files" / "# Write Files" lists, empty on failure
+        """
+        try:
+            # Project files, skipping dot-folders and dotfiles
+            files = get_project_index().list_files(hidden=False)
+
+            # Rank files locally; the LLM only re-ranks the shortlist if asked to
+            if FILE_SELECTION_MODE in ('local', 'rerank') and files:
                 try:
-                    with open('./diagram.png', 'rb') as f:
-                        diagram_content = f.read()
-                    import base64
-                    encoded_bytes = base64.b64encode(diagram_content).decode('utf-8')
-                    file_context_prompt = f"""
-[A visual diagram of the project structure is attached to help inform your decisions]
-
-{file_context_prompt}
-"""
-                    messages = [
-                        {"role": "system", "content": f"""
-{agent_content}
-                         
-In this context, you are a precise file context analyzer for AI development tasks. Always follow the existing project structure.
-"""},
-                        {
-                            "role": "user",
-                            "content": [
-                                {
-                                    "type": "image_url",
-                                    "image_url": {
-                                        "url": f"data:image/png;base64,{encoded_bytes}"
-                                    }
-                                },
-                                {
-                                    "type": "text",
-                                    "text": file_context_prompt
-                                }
-                            ]
-                        }
-                    ]
+                    ranked = await asyncio.to_thread(
+                        get_file_index().rank, objective, files,
+                        RERANK_CANDIDATES if FILE_SELECTION_MODE == 'rerank' else None
+                    )
+                    if FILE_SELECTION_MODE == 'local':
+                        file_context = format_file_selection(ranked)
+                        self.logger.debug(f"File context (local ranking):\n{file_context}")
+                        return file_context
+                    files = [path for path, _ in ranked]
                 except Exception as e:
-                    self.logger.warning(f"⚠️ Could not include diagram in context: {str(e)}")
-                    messages = [
-                        {"role": "system", "content": agent_content},
-                        {"role": "user", "content": file_context_prompt}
-                    ]
-            else:
-                messages = [
-                    {"role": "system", "content": agent_content},
-                    {"role": "user", "content": file_context_prompt}
-                ]
+                    self.logger.warning(f"⚠️ Local file ranking failed, asking the LLM: {str(e)}")
 
-            # Log the complete prompt being sent to GPT
-            self.logger.debug(f"File context prompt:\n{file_context_prompt}")
+            # Create list of paths
+            tree_text = "\n".join(f"- ./{path}" for path in files) if files else "No existing files"
+
+            budget = PromptBudget('file context', model=self.model, total=PROMPT_TOKEN_BUDGET)
+            budget.add('objective', objective, max_tokens=OBJECTIVE_TOKEN_BUDGET, priority=3)
+            budget.add('agent', agent_content, max_tokens=AGENT_TOKEN_BUDGET, priority=2)
+            budget.add('files', tree_text, max_tokens=FILE_LIST_TOKEN_BUDGET)
+            sections = budget.build()
+            agent_content = sections['agent']
+
+            # Instructions, then the file list shared by all agents, then the agent and its objectives
+            layout = PromptLayout()
+            layout.add(STATIC, "system", """
+You are a precise file context analyzer for AI development tasks. Always follow the existing project structure.
 
-            # Add instructions to prompt
-            file_context_prompt += """
 Based on the objectives and the project structure, list the files needed to achieve both objectives, in this exact format:
 
 # Context Files (read-only)
@@ -327,91 +657,67 @@ Rules:
 7. Aim for 8 to 12 files
 
 Respond only with the file lists in the format shown above.
+""")
+            layout.add(SLOW, "user", f"""
+Project structure
+================
+````
+{sections['files']}
+````
+""")
+            layout.add(SLOW, "system", agent_content)
+            file_context_prompt = f"""
+Objectives
+================
+````
+{sections['objective']}
+````
 """
-
-            try:
-                file_context_response = client.chat.completions.create(
-                    model=self.model,
-                    messages=messages,
-                    temperature=0.3,
-                    max_tokens=500
+            layout.add(VOLATILE, "user", file_context_prompt)
+            encoded_diagram = self._read_diagram() if FILE_SELECTION_MODE == 'llm' else None
+            if encoded_diagram:
+                layout.add_image(
+                    VOLATILE, encoded_diagram,
+                    "A visual diagram of the project structure is attached to help inform your decisions."
                 )
-                
-                file_context = file_context_response.choices[0].message.content.strip()
-                # Log the response received
-                self.logger.debug(f"File context response:\n{file_context}")
-                
-                # Add file context to objective
-                objective += "\n\n# Required Files\n" + file_context
-
-            except Exception as e:
-                self.logger.warning(f"⚠️ Could not generate file context: {str(e)}")
-                # Continue without file context
-
-            # Initialize messages list
-            messages = []
-            
-            # Add diagram if available
-            if diagram_content:
-                try:
-                    import base64
-                    # Encode bytes to base64
-                    encoded_bytes = base64.b64encode(diagram_content).decode('utf-8')
-                    messages.append({
-                        "role": "user",
-                        "content": [
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/png;base64,{encoded_bytes}"
-                                }
-                            },
-                            {
-                                "type": "text",
-                                "text": "Above is the current project structure visualization. Use it to inform your objective planning."
-                            }
-                        ]
-                    })
-                except Exception as e:
-                    self.logger.warning(f"⚠️ Could not encode diagram: {str(e)}")
 
-            # Add main prompt
-            messages.append({"role": "user", "content": prompt})
+            # Log the objective part of the prompt being sent to GPT
+            self.logger.debug(f"File context prompt:\n{file_context_prompt}")
 
-            response = client.chat.completions.create(
+            file_context_response = await self.llm.chat_completion(
+                call_class=FILE_SELECTION,
                 model=self.model,
-                messages=messages,
-                temperature=0.5,
-                max_tokens=2000
+                messages=layout.messages(),
+                temperature=0.3,
+                max_tokens=500
             )
             
-            return objective
-            
+            file_context = file_context_response.choices[0].message.content.strip()
+            # Log the response received
+            self.logger.debug(f"File context response:\n{file_context}")
+            return file_context
+
         except Exception as e:
-            self.logger.error(f"GPT API call failed: {str(e)}")
-            raise
+            self.logger.warning(f"⚠️ Could not generate file context: {str(e)}")
+            # Continue without file context
+            return ""
 
-    def _generate_summary(self, objective, agent_name, agent_content):
+    async def _generate_summary(self, objective, agent_name, agent_content):
         """Generate a one-line summary of the objective."""
         try:
-            client = openai.OpenAI()
-            prompt = f'''
-Mission Context
-================
-````
-{self.mission_content}
-````
+            budget = PromptBudget('summary', model=self.model, total=PROMPT_TOKEN_BUDGET)
+            budget.add('mission', self.mission_content, max_tokens=MISSION_TOKEN_BUDGET)
+            budget.add('objective', objective, max_tokens=OBJECTIVE_TOKEN_BUDGET, priority=2)
+            budget.add('agent', agent_content, max_tokens=AGENT_TOKEN_BUDGET, priority=2)
+            sections = budget.build()
+            agent_content = sections['agent']
 
-Objective
-================
-````
-{objective}
-````
+            layout = PromptLayout()
+            layout.add(STATIC, "system", """
+You are an assistant who summarizes project actions in a concise sentence with appropriate emojis. These summaries will serve as tracking logs within the mission.
 
-Instructions
-================
 Based on the Objective, summarize in a single sentence what the agent is currently doing as part of the mission, strictly following this format:
-"Agent {agent_name}: I'm [action] [objective] [optional detail] [files to be modified]"
+"Agent [agent name]: I'm [action] [objective] [optional detail] [files to be modified]"
 
 Guidelines:
 - Don't repeat the mission (which is known to the user), but only what the agent is precisely doing within it
@@ -420,17 +726,31 @@ Guidelines:
 - Phrase it from your agent point of view
 
 Reply only with the formatted sentence, nothing else.
-'''
+""")
+            layout.add(SLOW, "user", f"""
+Mission Context
+================
+````
+{sections['mission']}
+````
+""")
+            layout.add(SLOW, "system", f"""
+# Agent {agent_name}
+{agent_content}
+""")
+            layout.add(VOLATILE, "user", f"""
+Objective
+================
+````
+{sections['objective']}
+````
+""")
             
-            response = client.chat.completions.create(
+            response = await self.llm.chat_completion(
+                cache=True,  # Identical text gets the same summary
+                call_class=SUMMARIZATION,
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": f'''
-{agent_content}
-                     
-In this context, you are an assistant who summarizes project actions in a concise sentence with appropriate emojis. These summaries will serve as tracking logs within the mission.'''},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=layout.messages(),
                 temperature=0.4,
                 max_tokens=150
             )
@@ -442,11 +762,29 @@ In this context, you are an assistant who summarizes project actions in a concis
             # Return a basic fallback summary
             return f"Agent {agent_name} 🤖 will execute a new task"
 
-    def _generate_research_summary(self, query, result, agent_name, agent_content):
+    async def _generate_research_summary(self, query, result, agent_name, agent_content):
         """Generate a summary of the Perplexity research results."""
         try:
-            client = openai.OpenAI()
-            prompt = f'''
+            budget = PromptBudget('research summary', model=self.model, total=PROMPT_TOKEN_BUDGET)
+            budget.add('result', result, max_tokens=RESEARCH_TOKEN_BUDGET)
+            budget.add('agent', agent_content, max_tokens=AGENT_TOKEN_BUDGET, priority=2)
+            sections = budget.build()
+            agent_content = sections['agent']
+
+            layout = PromptLayout()
+            layout.add(STATIC, "system", """
+You are an assistant who summarizes project actions in a concise sentence with appropriate emojis. These summaries will serve as tracking logs within the mission.
+
+Summarize in a single sentence what was found by the Perplexity search, following this format:
+"Agent [agent name]: I'm conducting a search on [topic]: [summary of main findings]"
+
+Reply only with the formatted sentence, nothing else.
+""")
+            layout.add(SLOW, "system", f"""
+# Agent {agent_name}
+{agent_content}
+""")
+            layout.add(VOLATILE, "user", f"""
 Search Query 
 ================
 ````
@@ -456,27 +794,15 @@ Search Query
 Complete Results
 ================
 ````
-{result}
+{sections['result']}
 ````
-
-Instructions
-================
-Summarize in a single sentence what was found by the Perplexity search, following this format:
-"Agent {agent_name}: I'm conducting a search on [topic]: [summary of main findings]"
-
-Reply only with the formatted sentence, nothing else.
-'''
+""")
              
-            response = client.chat.completions.create(
+            response = await self.llm.chat_completion(
+                cache=True,  # Identical text gets the same summary
+                call_class=SUMMARIZATION,
                 model=self.model,
-                messages=[
-                    {"role": "system", "content": f'''
-{agent_content}
-
-In this context, you are an assistant who summarizes project actions in a concise sentence with appropriate emojis. These summaries will serve as tracking logs within the mission.
-'''},
-                    {"role": "user", "content": prompt}
-                ],
+                messages=layout.messages(),
                 temperature=0.,
                 max_tokens=150
             )
@@ -499,12 +825,16 @@ In this context, you are an assistant who summarizes project actions in a concis
             self.logger.warning(f"⚠️ Could not load mission file: {str(e)}")
             return ""
 
-    def _save_objective(self, filepath, content, agent_name, agent_content):
-        """Save objective content to file, including Perplexity research results if needed."""
+    async def _research(self, content, agent_name, agent_content):
+        """
+        Run the Perplexity search requested by an objective, if any.
+        
+        Returns:
+            str: "Additional Information" section to append to the objective,
+                empty when no research was requested or the search failed
+        """
+        research = ""
         try:
-            # Extract agent name from filepath
-            agent_name = os.path.basename(filepath).replace('.aider.objective.', '').replace('.md', '')
-            
             # Check for research requirement
             if "Search:" in content:
                 # Extract research query
@@ -513,62 +843,27 @@ In this context, you are an assistant who summarizes project actions in a concis
                 if research_lines:
                     research_query = research_lines[0].replace("Search:", "").strip()
                     
-                    # Call Perplexity API
-                    perplexity_key = os.getenv('PERPLEXITY_API_KEY')
-                    if not perplexity_key:
-                        raise ValueError("Perplexity API key not found in environment variables")
-                        
-                    # Make Perplexity API call with correct format
-                    headers = {
-                        "Authorization": f"Bearer {perplexity_key}",
-                        "Content-Type": "application/json"
-                    }
-                    payload = {
-                        "model": "llama-3.1-sonar-small-128k-online",
-                        "messages": [
-                            {"role": "system", "content": "You are a helpful research assistant providing accurate, detailed information."},
-                            {"role": "user", "content": research_query}
-                        ]
-                    }
-                    
-                    try:
-                        response = requests.post(
-                            "https://api.perplexity.ai/chat/completions",
-                            headers=headers,
-                            json=payload,
-                            timeout=30  # Add timeout
+                    # Shared research service: cached, de-duplicated across agents
+                    research_result = await get_research_service().search(research_query)
+                    if research_result:
+                        # Generate summary of research results with agent name
+                        research_summary = await self._generate_research_summary(
+                            research_query, 
+                            research_result, 
+                            agent_name,
+                            agent_content
                         )
+                        self.logger.success(research_summary)
                         
-                        if response.status_code == 200:
-                            research_result = response.json()["choices"][0]["message"]["content"]
-                            
-                            # Generate summary of research results with agent name
-                            research_summary = self._generate_research_summary(
-                                research_query, 
-                                research_result, 
-                                agent_name,
-                                agent_content
-                            )
-                            self.logger.success(research_summary)
-                            
-                            # Add research results to objective
-                            content += "\n\n## Additional Information\n"
-                            content += f"Perplexity search results for: {research_query}\n\n"
-                            content += research_result
-                        else:
-                            error_msg = f"Perplexity API call failed with status {response.status_code}"
-                            if response.text:
-                                error_msg += f": {response.text}"
-                            self.logger.warning(f"⚠️ {error_msg}")
-                            # Continue without research results
-                    except requests.exceptions.RequestException as e:
-                        self.logger.warning(f"⚠️ Perplexity API request failed: {str(e)}")
-                        # Continue without research results
+                        # Format research results for the objective
+                        research = "\n\n## Additional Information\n"
+                        research += f"Perplexity search results for: {research_query}\n\n"
+                        research += research_result
+                    # Continue without research results on failure
             
-            # Save updated content with UTF-8 encoding
-            with open(filepath, 'w', encoding='utf-8') as f:
-                f.write(content)
+            return research
                 
         except Exception as e:
-            self.logger.error(f"Error saving objective to {filepath}: {str(e)}")
-            raise
+            # Planning goes on without research, like the summary and file context
+            self.logger.warning(f"⚠️ Research skipped for {agent_name}: {str(e)}")
+            return ""
@@ -0,0 +1,186 @@
+import os
+import time
+import asyncio
+import subprocess
+from utils.logger import Logger
+from utils.git_utils import run_git
+from utils.file_index import get_project_index
+
+# Worktree configuration
+WORKTREE_ROOT = ".aider.worktrees"  # per-agent working trees, excluded from git
+BRANCH_PREFIX = "kinos/"
+MERGE_BATCH_WINDOW = 5  # seconds to wait for more finished agents before merging
+
+
+class WorktreeManager:
+    """Manager giving each agent its own git worktree and merging them back in batches.
+
+    Agents running in the main working tree share one index and fight over
+    .git/index.lock, and a phase's before/after snapshot picks up files
+    written by other agents. In isolation mode every agent commits on its own
+    branch (kinos/<agent>) in .aider.worktrees/<agent>. Finished cycles are
+    queued and a single coordinator rebases them onto the main branch and
+    fast-forwards it, then pushes once per batch.
+
+    Attributes:
+        logger (Logger): Logging utility instance
+        aider_manager (AiderManager): Used to push merged batches
+        root (str): Absolute path of the main working tree
+        main_branch (str): Branch the agent branches are merged into
+    """
+
+    def __init__(self, aider_manager, logger=None):
+        self.logger = logger or Logger()
+        self.aider_manager = aider_manager
+        self.root = os.getcwd()
+        self.main_branch = None
+        self._queue = asyncio.Queue()
+        self._pending = {}  # agent -> future resolved once its branch is merged
+        self._coordinator = None
+        self._setup_lock = asyncio.Lock()
+
+    def _worktree_path(self, agent_name):
+        return os.path.join(self.root, WORKTREE_ROOT, agent_name)
+
+    async def _setup(self):
+        """Detect the main branch, hide the worktrees from git and start the coordinator."""
+        async with self._setup_lock:
+            if self.main_branch:
+                return
+
+            self.main_branch = (await run_git('rev-parse', '--abbrev-ref', 'HEAD', cwd=self.root)).strip()
+            if self.main_branch == 'HEAD':
+                raise ValueError("Worktree isolation requires a checked-out branch")
+
+            # Keep worktrees out of `git status` without touching .gitignore
+            git_dir = (await run_git('rev-parse', '--git-common-dir', cwd=self.root)).strip()
+            exclude_path = os.path.join(self.root, git_dir, 'info', 'exclude')
+            os.makedirs(os.path.dirname(exclude_path), exist_ok=True)
+            existing = ""
+            if os.path.exists(exclude_path):
+                with open(exclude_path, 'r', encoding='utf-8') as f:
+                    existing = f.read()
+            if f"{WORKTREE_ROOT}/" not in existing.splitlines():
+                with open(exclude_path, 'a', encoding='utf-8') as f:
+                    if existing and not existing.endswith('\n'):
+                        f.write('\n')
+                    f.write(f"{WORKTREE_ROOT}/\n")
+
+            await run_git('worktree', 'prune', cwd=self.root, check=False)
+            self._coordinator = asyncio.create_task(self._merge_loop())
+            self.logger.info(f"🌳 Agent worktree isolation enabled (merging into {self.main_branch})")
+
+    async def prepare(self, agent_name):
+        """
+        Create or refresh an agent's worktree at the tip of the main branch.
+
+        Args:
+            agent_name (str): Agent to prepare the worktree for
+
+        Returns:
+            str: Absolute path of the worktree
+        """
+        await self._setup()
+
+        # An agent restarting before its previous cycle is merged must not
+        # reset its branch underneath the coordinator
+        pending = self._pending.get(agent_name)
+        if pending:
+            await asyncio.shield(pending)
+
+        path = self._worktree_path(agent_name)
+        branch = f"{BRANCH_PREFIX}{agent_name}"
+        if os.path.exists(os.path.join(path, '.git')):
+            await run_git('checkout', '-B', branch, self.main_branch, cwd=path)
+            await run_git('reset', '--hard', self.main_branch, cwd=path)
+            await run_git('clean', '-fd', cwd=path, check=False)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            await run_git('worktree', 'add', '-B', branch, path, self.main_branch, cwd=self.root)
+
+        self.logger.debug(f"🌳 Worktree ready for {agent_name}: {path}")
+        return path
+
+    async def submit(self, agent_name):
+        """
+        Queue an agent's branch for merging into the main branch.
+
+        Args:
+            agent_name (str): Agent whose cycle just finished
+
+        Returns:
+            asyncio.Future: Resolved once the agent's merge has been attempted,
+                whether it succeeded, conflicted or failed
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._pending[agent_name] = future
+        await self._queue.put(agent_name)
+        return future
+
+    async def _merge_loop(self):
+        """Coordinator collecting finished agents and merging them in batches."""
+        while True:
+            batch = [await self._queue.get()]
+            await asyncio.sleep(MERGE_BATCH_WINDOW)
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            try:
+                await self._merge_batch(batch)
+            except Exception as e:
+                self.logger.error(f"❌ Worktree merge batch failed: {str(e)}")
+            finally:
+                for agent_name in batch:
+                    future = self._pending.pop(agent_name, None)
+                    if future and not future.done():
+                        future.set_result(None)
+                    self._queue.task_done()
+
+    async def _merge_batch(self, batch):
+        """Rebase each agent branch onto the main branch and fast-forward it."""
+        merged = []
+        for agent_name in batch:
+            path = self._worktree_path(agent_name)
+            branch = f"{BRANCH_PREFIX}{agent_name}"
+
+            ahead = (await run_git('rev-list', '--count', f"{self.main_branch}..{branch}", cwd=self.root)).strip()
+            if ahead == '0':
+                self.logger.debug(f"🌳 No commits to merge for {agent_name}")
+                continue
+
+            try:
+                await run_git('rebase', self.main_branch, cwd=path)
+            except subprocess.CalledProcessError as e:
+                await run_git('rebase', '--abort', cwd=path, check=False)
+                conflict_branch = f"{branch}-conflict-{int(time.time())}"
+                await run_git('branch', '-m', branch, conflict_branch, cwd=path)
+                self.logger.warning(
+                    f"⚠️ Could not rebase {agent_name} onto {self.main_branch}, "
+                    f"changes kept on {conflict_branch}: {e.stderr.strip()}"
+                )
+                continue
+
+            try:
+                changed = (await run_git('diff', '--name-only', self.main_branch, branch, cwd=self.root)).splitlines()
+                await run_git('merge', '--ff-only', branch, cwd=self.root)
+                get_project_index(self.root).mark_changed(changed)
+                merged.append(agent_name)
+            except subprocess.CalledProcessError as e:
+                self.logger.warning(f"⚠️ Could not fast-forward {self.main_branch} to {branch}: {e.stderr.strip()}")
+
+        if merged:
+            self.logger.success(f"🔀 Merged {len(merged)} agent branches into {self.main_branch}: {', '.join(merged)}")
+            await self.aider_manager.push_changes(cwd=self.root)
+
+    async def shutdown(self):
+        """Merge the queued branches and stop the coordinator."""
+        if not self._coordinator:
+            return
+        if not self._coordinator.done():
+            await self._queue.join()
+        self._coordinator.cancel()
+        try:
+            await self._coordinator
+        except asyncio.CancelledError:
+            pass
+        self._coordinator = None
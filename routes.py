@@ -44,9 +44,11 @@ def main():
             manager.run_map_maintenance_for_all_folders()
             
         elif subcommand == "agents":
-            manager = AgentsManager(model=model)
+            # --no-cache forces fresh agent definitions instead of cached answers
+            manager = AgentsManager(model=model, use_cache="--no-cache" not in sys.argv)
             # Optional mission file path
-            mission_path = sys.argv[3] if len(sys.argv) > 3 else ".aider.mission.md"
+            args = [arg for arg in sys.argv[3:] if arg != "--no-cache"]
+            mission_path = args[0] if args else ".aider.mission.md"
             asyncio.run(manager.generate_agents(mission_path))
             
         elif subcommand == "viz":
@@ -68,7 +70,7 @@ def main():
             agent_path = f".aider.agent.{agent_name}.md"
             mission_path = ".aider.mission.md"
             
-            manager.generate_objective(mission_path, agent_path)
+            asyncio.run(manager.generate_objective(mission_path, agent_path))
             
             
     elif command == "run":
@@ -79,6 +81,10 @@ def main():
             print("  --verbose     Show detailed debug information")
             print("  --mission     Specify mission file path")
             print("  --model      Specify model to use (default: gpt-4o-mini)")
+            print("  --count      Number of agents running in parallel")
+            print("  --min-count  Lower bound for adaptive agent count")
+            print("  --max-count  Upper bound for adaptive agent count")
+            print("  --isolate    Run each agent in its own git worktree")
             sys.exit(1)
             
         subcommand = sys.argv[2]
@@ -124,6 +130,22 @@ def main():
                     except (ValueError, IndexError):
                         print("Invalid value for --count. Using default (5)")
 
+                # Get adaptive concurrency bounds
+                min_agents = None
+                max_agents = None
+                for flag in ("--min-count", "--max-count"):
+                    if flag in sys.argv:
+                        try:
+                            flag_index = sys.argv.index(flag) + 1
+                            value = int(sys.argv[flag_index])
+                        except (ValueError, IndexError):
+                            print(f"Invalid value for {flag}")
+                            sys.exit(1)
+                        if flag == "--min-count":
+                            min_agents = value
+                        else:
+                            max_agents = value
+
                 # Get model name
                 model = None  # Will use default from command line
                 if "--model" in sys.argv:
@@ -135,6 +157,7 @@ def main():
                 
                 # Check for --generate flag    
                 should_generate = "--generate" in sys.argv
+                should_isolate = "--isolate" in sys.argv
                 
                 # Display startup message
                 runner.logger.success("🌟 Starting KinOS...")
@@ -144,7 +167,10 @@ def main():
                     mission_path, 
                     generate_agents=should_generate,
                     agent_count=agent_count,
-                    model=model
+                    model=model,
+                    min_agents=min_agents,
+                    max_agents=max_agents,
+                    isolate=should_isolate
                 )
 
             # Run the async initialization and execution
@@ -0,0 +1,123 @@
+"""
+Long-lived aider worker process.
+
+The worker imports aider once and then executes aider runs sent by the parent
+process, so interpreter startup and aider's import time are paid once per
+worker instead of once per phase.
+
+Protocol (JSON lines):
+    - stdin receives jobs: {"id": 1, "argv": [...], "cwd": "/path"}
+    - stdout emits events: {"event": "ready"} once aider is imported, then
+      {"id": 1, "event": "done", "returncode": 0} for each finished job
+    - stderr carries aider's own console output, streamed as it runs, and
+      ends each job with a JOB_END_MARKER line so no output is lost
+
+Session jobs also carry "messages": aider is started once and each message is
+sent to the same coder, keeping chat history and repo map in memory. After
+each message the worker writes a JOB_END_MARKER line, emits
+{"id": 1, "event": "phase", "index": 0} and waits for
+{"id": 1, "event": "continue"} on stdin, so the parent can inspect the
+repository between phases.
+
+This module is executed as a script and must only depend on the standard
+library and aider itself.
+"""
+import os
+import sys
+import json
+import contextlib
+import traceback
+
+# Written to stderr after each job so the parent knows the output is complete
+JOB_END_MARKER = "\x00KINOS_JOB_END "
+
+
+def _send(channel, message):
+    """Write a protocol message to the parent."""
+    channel.write(json.dumps(message) + "\n")
+    channel.flush()
+
+
+def _run_session(aider_main, job, channel, requests):
+    """Send each message of a session job to a single aider coder."""
+    coder = aider_main(job['argv'], return_coder=True)
+    if coder is None or isinstance(coder, int):
+        return coder or 1
+
+    for index, message in enumerate(job['messages']):
+        coder.run(with_message=message)
+
+        # Let the parent inspect the repository before the next message
+        sys.stderr.write(f"{JOB_END_MARKER}{job.get('id')}\n")
+        sys.stderr.flush()
+        _send(channel, {"id": job.get('id'), "event": "phase", "index": index})
+        reply = json.loads(requests.readline() or '{}')
+        if reply.get('event') != 'continue':
+            return 1
+    return 0
+
+
+def _run_job(aider_main, job, channel, requests):
+    """Run a single aider invocation in-process and return its exit code."""
+    cwd = job.get('cwd')
+    if cwd:
+        os.chdir(cwd)
+
+    # Aider must never read the protocol channel or write to it
+    with open(os.devnull, 'r') as devnull, \
+            contextlib.redirect_stdout(sys.stderr):
+        previous_stdin = sys.stdin
+        sys.stdin = devnull
+        try:
+            if job.get('messages'):
+                return _run_session(aider_main, job, channel, requests)
+            result = aider_main(job['argv'])
+            return result if isinstance(result, int) else 0
+        except SystemExit as e:
+            return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        finally:
+            sys.stdin = previous_stdin
+            sys.stderr.flush()
+
+
+def main():
+    """Import aider, signal readiness, then serve jobs until stdin closes."""
+    channel = sys.stdout
+    requests = sys.stdin
+
+    # Keep KinOS utility modules from shadowing aider's imports
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path = [p for p in sys.path if os.path.abspath(p or '.') != script_dir]
+
+    try:
+        from aider.main import main as aider_main
+    except Exception as e:
+        _send(channel, {"event": "error", "error": f"Could not import aider: {e}"})
+        return 1
+
+    _send(channel, {"event": "ready", "pid": os.getpid()})
+
+    for line in requests:
+        if not line.strip():
+            continue
+        try:
+            job = json.loads(line)
+        except json.JSONDecodeError as e:
+            _send(channel, {"event": "error", "error": f"Invalid job: {e}"})
+            continue
+
+        try:
+            result = {"returncode": _run_job(aider_main, job, channel, requests)}
+        except Exception as e:
+            traceback.print_exc(file=sys.stderr)
+            result = {"returncode": 1, "error": str(e)}
+
+        sys.stderr.write(f"{JOB_END_MARKER}{job.get('id')}\n")
+        sys.stderr.flush()
+        _send(channel, {"id": job.get('id'), "event": "done", **result})
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
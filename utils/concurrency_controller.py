@@ -0,0 +1,128 @@
+import time
+import psutil
+from utils.runtime_metrics import get_runtime_metrics
+
+# Controller configuration
+CONTROL_INTERVAL = 120  # seconds between two adjustments
+MAX_LLM_ERROR_RATE = 0.1  # share of 429/5xx responses tolerated
+MAX_LATENCY_FACTOR = 2.0  # median LLM latency allowed vs best observed
+MAX_PHASE_FACTOR = 2.0  # median aider phase duration allowed vs best observed
+MAX_GIT_LOCK_CONTENTIONS = 3  # index.lock collisions tolerated per interval
+MAX_CPU_PERCENT = 90
+MAX_MEMORY_PERCENT = 90
+THROUGHPUT_TOLERANCE = 0.9  # throughput ratio below which growth is undone
+DECREASE_FACTOR = 0.75  # multiplicative decrease applied under pressure
+
+
+class ConcurrencyController:
+    """Adaptive controller for the number of concurrently running agents.
+
+    Every CONTROL_INTERVAL seconds the controller inspects the runtime metrics
+    (LLM latency and 429/5xx rate, aider phase duration, git lock contention)
+    and host CPU/memory. Under pressure it shrinks the target multiplicatively;
+    otherwise it grows it by one and keeps the step only if cycle throughput
+    did not drop, converging on the throughput-optimal parallelism.
+
+    Attributes:
+        minimum (int): Lower bound for the target
+        maximum (int): Upper bound for the target
+        target (int): Current number of agents that should be running
+    """
+
+    def __init__(self, initial, minimum, maximum, logger=None, metrics=None):
+        self.minimum = max(1, minimum)
+        self.maximum = max(self.minimum, maximum)
+        self.target = min(self.maximum, max(self.minimum, initial))
+        self.logger = logger
+        self.metrics = metrics or get_runtime_metrics()
+        self._last_update = time.time()
+        self._best_latency = None
+        self._best_phase_duration = None
+        self._last_throughput = None
+        self._last_step = 0
+        psutil.cpu_percent(interval=None)  # Prime CPU sampling
+
+    def _pressure_reasons(self, stats):
+        """List the signals indicating the system is overloaded."""
+        reasons = []
+
+        if stats['llm_calls'] and stats['llm_error_rate'] > MAX_LLM_ERROR_RATE:
+            reasons.append(f"LLM error rate {stats['llm_error_rate']:.0%}")
+
+        latency = stats['llm_latency']
+        if latency is not None:
+            if self._best_latency is None or latency < self._best_latency:
+                self._best_latency = latency
+            elif latency > self._best_latency * MAX_LATENCY_FACTOR:
+                reasons.append(f"LLM latency {latency:.1f}s")
+
+        phase_duration = stats['phase_duration']
+        if phase_duration is not None:
+            if self._best_phase_duration is None or phase_duration < self._best_phase_duration:
+                self._best_phase_duration = phase_duration
+            elif phase_duration > self._best_phase_duration * MAX_PHASE_FACTOR:
+                reasons.append(f"aider phases at {phase_duration:.0f}s")
+
+        if stats['git_lock_contentions'] > MAX_GIT_LOCK_CONTENTIONS:
+            reasons.append(f"{stats['git_lock_contentions']} git lock collisions")
+
+        cpu = psutil.cpu_percent(interval=None)
+        if cpu > MAX_CPU_PERCENT:
+            reasons.append(f"CPU {cpu:.0f}%")
+
+        memory = psutil.virtual_memory().percent
+        if memory > MAX_MEMORY_PERCENT:
+            reasons.append(f"memory {memory:.0f}%")
+
+        return reasons
+
+    def update(self):
+        """
+        Re-evaluate the target if a control interval has elapsed.
+
+        Returns:
+            int: Number of agents that should be running
+        """
+        now = time.time()
+        elapsed = now - self._last_update
+        if elapsed < CONTROL_INTERVAL:
+            return self.target
+
+        stats = self.metrics.snapshot(self._last_update)
+        self._last_update = now
+        throughput = stats['cycles'] * 60 / elapsed  # cycles per minute
+        reasons = self._pressure_reasons(stats)
+        previous = self.target
+
+        if reasons:
+            self.target = max(self.minimum, min(self.target - 1, int(self.target * DECREASE_FACTOR)))
+            reason = ", ".join(reasons)
+            self._last_step = -1
+        elif (self._last_step > 0 and self._last_throughput is not None
+              and throughput < self._last_throughput * THROUGHPUT_TOLERANCE):
+            # Last increase made things worse: step back and hold
+            self.target = max(self.minimum, self.target - 1)
+            reason = f"throughput fell to {throughput:.2f} cycles/min"
+            self._last_step = 0
+        elif self._last_step >= 0 and self.target < self.maximum:
+            self.target += 1
+            reason = f"healthy at {throughput:.2f} cycles/min"
+            self._last_step = 1
+        else:
+            reason = "holding"
+            self._last_step = 0
+
+        self._last_throughput = throughput
+
+        if self.logger:
+            phase = stats['phase_duration']
+            phase_text = f"{phase:.0f}s" if phase is not None else "n/a"
+            message = (f"🎚️ Agent concurrency {previous} → {self.target} ({reason}; "
+                       f"median aider phase {phase_text}; "
+                       f"prompt cache hits {stats['prompt_cache_hit_rate']:.0%})")
+            if self.target != previous:
+                self.logger.info(message)
+            else:
+                self.logger.debug(message)
+
+        return self.target
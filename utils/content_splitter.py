@@ -1,6 +1,6 @@
 import os
-import fnmatch
 from utils.logger import Logger
+from utils.ignore_matcher import get_ignore_matcher
 
 class ContentSplitter:
     """
@@ -68,33 +68,7 @@ class ContentSplitter:
             return True
             
         # Check .gitignore patterns
-        ignore_patterns = self._get_ignore_patterns()
-        rel_path = os.path.relpath(file_path)
-        for pattern in ignore_patterns:
-            if fnmatch.fnmatch(rel_path, pattern):
-                return True
-                
-        return False
-
-    def _get_ignore_patterns(self):
-        """
-        Get patterns from .gitignore file for file exclusion.
-        
-        Reads and parses .gitignore file to create list of patterns for 
-        identifying files that should be excluded from splitting operations.
-        
-        Returns:
-            list: List of gitignore patterns to exclude
-            
-        Note:
-            Ignores comment lines and empty lines in .gitignore
-        """
-        patterns = []
-        if os.path.exists('.gitignore'):
-            with open('.gitignore', 'r') as f:
-                patterns.extend(line.strip() for line in f 
-                              if line.strip() and not line.startswith('#'))
-        return patterns
+        return get_ignore_matcher().is_ignored(os.path.abspath(file_path), is_dir=False)
 
     def _count_sections(self, content):
         """
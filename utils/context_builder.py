@@ -1,8 +1,9 @@
 import os
-import fnmatch
 from pathlib import Path
 import mimetypes
 from typing import List, Set
+from utils.file_index import get_project_index
+from utils.ignore_matcher import get_ignore_matcher
 
 class ContextBuilder:
     """
@@ -31,62 +32,6 @@ class ContextBuilder:
             '.clj', '.ex', '.exs', '.erl', '.fs', '.fsx', '.dart'
         }
 
-    def _get_ignore_patterns(self) -> List[str]:
-        """
-        Get list of patterns for files to ignore from .gitignore and .aiderignore.
-        
-        Returns:
-            List[str]: List of glob patterns for files to ignore
-            
-        Note:
-            Always includes common ignore patterns like .git, node_modules, etc.
-            regardless of .gitignore contents
-        """
-        patterns = []
-        
-        # Always exclude these patterns
-        patterns.extend([
-            '.git*',
-            '.aider*',
-            'node_modules',
-            '__pycache__',
-            '*.pyc',
-            '*.pyo',
-            '*.pyd',
-            '.DS_Store',
-            'Thumbs.db'
-        ])
-        
-        # Read .gitignore
-        if os.path.exists('.gitignore'):
-            with open('.gitignore', 'r', encoding='utf-8') as f:
-                patterns.extend(line.strip() for line in f 
-                              if line.strip() and not line.startswith('#'))
-                
-        # Read .aiderignore
-        if os.path.exists('.aiderignore'):
-            with open('.aiderignore', 'r', encoding='utf-8') as f:
-                patterns.extend(line.strip() for line in f 
-                              if line.strip() and not line.startswith('#'))
-                
-        return patterns
-
-    def _should_ignore(self, file_path: str, ignore_patterns: List[str]) -> bool:
-        """
-        Check if a file should be ignored based on ignore patterns.
-        
-        Args:
-            file_path (str): Path to file to check
-            ignore_patterns (List[str]): List of glob patterns to check against
-            
-        Returns:
-            bool: True if file should be ignored, False otherwise
-        """
-        for pattern in ignore_patterns:
-            if fnmatch.fnmatch(file_path, pattern):
-                return True
-        return False
-
     def _is_text_file(self, file_path: str) -> bool:
         """
         Determine if a file is a text file through extension and content analysis.
@@ -152,52 +97,45 @@ class ContextBuilder:
             - Includes relative paths to original files
             - Handles text encoding using UTF-8
         """
-        ignore_patterns = self._get_ignore_patterns()
+        ignore_matcher = get_ignore_matcher(root_dir)
         processed_files: Set[str] = set()
         
         with open(output_file, 'w', encoding='utf-8') as out:
             out.write("# Project Context\n\n")
             out.write("This file contains all text files from the project for context.\n\n")
             
-            for root, dirs, files in os.walk(root_dir):
-                # Remove ignored directories
-                dirs[:] = [d for d in dirs if not self._should_ignore(
-                    os.path.join(root, d), ignore_patterns
-                )]
-                
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    rel_path = os.path.relpath(file_path, root_dir)
+            for rel_path in get_project_index(root_dir).list_files():
+                file_path = os.path.join(root_dir, rel_path)
+
+                # Skip if file should be ignored
+                if ignore_matcher.is_ignored(rel_path, is_dir=False):
+                    continue
+
+                # Skip if already processed
+                if file_path in processed_files:
+                    continue
                     
-                    # Skip if file should be ignored
-                    if self._should_ignore(rel_path, ignore_patterns):
-                        continue
+                # Skip if file is too large
+                if self._get_file_size(file_path) > max_file_size:
+                    print(f"Skipping large file: {rel_path}")
+                    continue
+                
+                # Process only text files
+                if self._is_text_file(file_path):
+                    try:
+                        with open(file_path, 'r', encoding='utf-8') as f:
+                            content = f.read()
+                            
+                        out.write(f"\n## File: {rel_path}\n")
+                        out.write("```\n")
+                        out.write(content)
+                        out.write("\n```\n")
                         
-                    # Skip if already processed
-                    if file_path in processed_files:
-                        continue
+                        processed_files.add(file_path)
+                        print(f"Added: {rel_path}")
                         
-                    # Skip if file is too large
-                    if self._get_file_size(file_path) > max_file_size:
-                        print(f"Skipping large file: {rel_path}")
-                        continue
-                    
-                    # Process only text files
-                    if self._is_text_file(file_path):
-                        try:
-                            with open(file_path, 'r', encoding='utf-8') as f:
-                                content = f.read()
-                                
-                            out.write(f"\n## File: {rel_path}\n")
-                            out.write("```\n")
-                            out.write(content)
-                            out.write("\n```\n")
-                            
-                            processed_files.add(file_path)
-                            print(f"Added: {rel_path}")
-                            
-                        except Exception as e:
-                            print(f"Error processing {rel_path}: {str(e)}")
+                    except Exception as e:
+                        print(f"Error processing {rel_path}: {str(e)}")
 
 def main():
     """
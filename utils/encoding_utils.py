@@ -2,6 +2,7 @@ import os
 import fnmatch
 import chardet
 from utils.logger import Logger
+from utils.file_index import get_project_index
 
 class EncodingUtils:
     """Utility class for handling file encodings."""
@@ -160,31 +161,38 @@ class EncodingUtils:
                 'skipped': []
             }
             
+            # Indexed files, plus KinOS' own .aider* files (mission, agents,
+            # objectives) which the index leaves out
+            rel_paths = get_project_index().list_files()
+            rel_paths += sorted(
+                entry.name for entry in os.scandir('.')
+                if entry.is_file() and entry.name.startswith('.aider')
+            )
+
             # Process all files
-            for root, _, files in os.walk('.'):
-                for file in files:
-                    if file.endswith(('.md', '.txt', '.py')):  # Add other extensions as needed
-                        filepath = os.path.join(root, file)
+            for rel_path in rel_paths:
+                if rel_path.endswith(('.md', '.txt', '.py')):  # Add other extensions as needed
+                    filepath = f"./{rel_path}"
+                    
+                    # Skip ignored files
+                    if any(fnmatch.fnmatch(filepath, pattern) for pattern in ignore_patterns):
+                        results['skipped'].append(filepath)
+                        continue
                         
-                        # Skip ignored files
-                        if any(fnmatch.fnmatch(filepath, pattern) for pattern in ignore_patterns):
-                            results['skipped'].append(filepath)
-                            continue
-                            
+                    try:
+                        # Check if already UTF-8
                         try:
-                            # Check if already UTF-8
-                            try:
-                                with open(filepath, 'r', encoding='utf-8') as f:
-                                    f.read()
-                                self.logger.debug(f"✅ {filepath} is already UTF-8")
-                                continue
-                            except UnicodeDecodeError:
-                                # Not UTF-8, convert it
-                                if self.convert_to_utf8(filepath):
-                                    results['converted'].append(filepath)
-                        except Exception as e:
-                            self.logger.error(f"❌ Failed to process {filepath}: {str(e)}")
-                            results['failed'].append((filepath, str(e)))
+                            with open(filepath, 'r', encoding='utf-8') as f:
+                                f.read()
+                            self.logger.debug(f"✅ {filepath} is already UTF-8")
+                            continue
+                        except UnicodeDecodeError:
+                            # Not UTF-8, convert it
+                            if self.convert_to_utf8(filepath):
+                                results['converted'].append(filepath)
+                    except Exception as e:
+                        self.logger.error(f"❌ Failed to process {filepath}: {str(e)}")
+                        results['failed'].append((filepath, str(e)))
             
             # Log summary
             self.logger.success(
@@ -0,0 +1,343 @@
+import os
+import json
+import atexit
+import time
+import hashlib
+import logging
+import threading
+from collections import deque
+from utils.ignore_matcher import get_ignore_matcher
+
+# Persistent index of the project tree, shared by all managers
+PROJECT_INDEX_PATH = os.path.join('.aider.cache', 'project_index.json')
+INDEX_REFRESH_INTERVAL = 1.0  # seconds during which a refresh is considered fresh
+INDEX_SAVE_INTERVAL = 30.0  # seconds between two writes of the index file
+CHANGE_LOG_SIZE = 10_000  # changes kept for changed_since()
+
+# Never indexed, whatever the ignore rules say: git internals
+EXCLUDED_DIRS = {'.git'}
+
+
+def _is_hidden(path):
+    """Check whether any component of a relative path starts with a dot."""
+    return any(part.startswith('.') for part in path.split('/'))
+
+
+class ProjectFileIndex:
+    """Incrementally refreshed index of the project's files.
+
+    Directories are rescanned only when their modification time changed, so a
+    refresh costs one stat per directory plus a scan of the directories where
+    files were added, removed or renamed. File contents are hashed lazily and
+    the hash is kept until the file's size or mtime changes. The index is
+    persisted under .aider.cache/ at most every INDEX_SAVE_INTERVAL seconds
+    and at exit (see flush()), and revalidated once when loaded.
+
+    Paths excluded by the project's ignore rules (utils/ignore_matcher.py,
+    which also covers KinOS' own .aider* files) are neither listed nor
+    stat'ed, and the tree is rescanned when those rules change.
+
+    Edits to existing files do not change their directory's mtime; callers
+    that know which files changed (e.g. after an aider phase) report them
+    with mark_changed().
+
+    Attributes:
+        root (str): Absolute path of the indexed project
+        generation (int): Incremented on every detected change
+    """
+
+    def __init__(self, root='.', index_path=None):
+        self.root = os.path.abspath(root)
+        self.index_path = index_path or os.path.join(self.root, PROJECT_INDEX_PATH)
+        self.logger = logging.getLogger('KinOS')
+        self.generation = 0
+        self._dirs = {}  # relative dir ('' for root) -> {'mtime': ns, 'files': [...], 'dirs': [...]}
+        self._files = {}  # relative path -> [size, mtime_ns, sha256 or None]
+        self._changes = deque(maxlen=CHANGE_LOG_SIZE)  # (generation, path)
+        self._refreshed_at = 0.0
+        self._saved_at = 0.0  # the first scan is written right away
+        self._dirty = False  # changes not written to index_path yet
+        self._verify_files = True  # stat every file once after loading from disk
+        self._ignore_matcher = get_ignore_matcher(self.root)
+        self._ignore_generation = None  # rules generation the listings were made with
+        self._lock = threading.RLock()
+        self._load()
+
+    # Persistence
+
+    def _load(self):
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self._dirs = data['dirs']
+            self._files = data['files']
+        except (OSError, ValueError, KeyError):
+            self._dirs, self._files = {}, {}
+
+    def _save(self):
+        self._saved_at = time.time()
+        self._dirty = False
+        try:
+            os.makedirs(os.path.dirname(self.index_path), exist_ok=True)
+            temp_path = f"{self.index_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({'dirs': self._dirs, 'files': self._files}, f)
+            os.replace(temp_path, self.index_path)
+        except OSError as e:
+            self.logger.warning(f"⚠️ Could not save project index: {str(e)}")
+
+    def flush(self):
+        """Write pending changes to the index file."""
+        with self._lock:
+            if self._dirty:
+                self._save()
+
+    # Scanning
+
+    def _abs(self, rel_path):
+        return os.path.join(self.root, rel_path) if rel_path else self.root
+
+    def _record_change(self, path):
+        self._dirty = True
+        self.generation += 1
+        self._changes.append((self.generation, path))
+
+    def _scan_dir(self, rel_dir):
+        """Rescan one directory; new subdirectories are scanned recursively."""
+        try:
+            mtime = os.stat(self._abs(rel_dir)).st_mtime_ns
+            entries = list(os.scandir(self._abs(rel_dir)))
+        except OSError:
+            self._drop_dir(rel_dir)
+            return
+
+        previous = self._dirs.get(rel_dir, {'files': [], 'dirs': []})
+        files, dirs = [], []
+        for entry in entries:
+            name = entry.name
+            if name in EXCLUDED_DIRS:
+                continue
+            path = f"{rel_dir}/{name}" if rel_dir else name
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if not self._ignore_matcher.is_ignored(path, is_dir=True):
+                        dirs.append(name)
+                elif entry.is_file() and not self._ignore_matcher.is_ignored(path, is_dir=False):
+                    files.append(name)
+                    stat = entry.stat()
+                    known = self._files.get(path)
+                    if not known or known[0] != stat.st_size or known[1] != stat.st_mtime_ns:
+                        self._files[path] = [stat.st_size, stat.st_mtime_ns, None]
+                        self._record_change(path)
+            except OSError:
+                continue
+
+        for name in set(previous['files']) - set(files):
+            path = f"{rel_dir}/{name}" if rel_dir else name
+            if self._files.pop(path, None) is not None:
+                self._record_change(path)
+        for name in set(previous['dirs']) - set(dirs):
+            self._drop_dir(f"{rel_dir}/{name}" if rel_dir else name)
+
+        self._dirs[rel_dir] = {'mtime': mtime, 'files': sorted(files), 'dirs': sorted(dirs)}
+        for name in dirs:
+            path = f"{rel_dir}/{name}" if rel_dir else name
+            if path not in self._dirs:
+                self._scan_dir(path)
+
+    def _drop_dir(self, rel_dir):
+        """Forget a directory and everything below it."""
+        info = self._dirs.pop(rel_dir, None)
+        if not info:
+            return
+        for name in info['files']:
+            path = f"{rel_dir}/{name}" if rel_dir else name
+            if self._files.pop(path, None) is not None:
+                self._record_change(path)
+        for name in info['dirs']:
+            self._drop_dir(f"{rel_dir}/{name}" if rel_dir else name)
+
+    def refresh(self, max_age=INDEX_REFRESH_INTERVAL):
+        """
+        Bring the index up to date with the file system.
+
+        Args:
+            max_age (float): Skip the refresh if the last one is more recent
+                than this many seconds (0 forces it)
+
+        Returns:
+            int: The index generation after the refresh
+        """
+        with self._lock:
+            if time.time() - self._refreshed_at < max_age:
+                return self.generation
+            self._ignore_matcher.refresh()
+            rules_changed = self._ignore_generation != self._ignore_matcher.generation
+            self._ignore_generation = self._ignore_matcher.generation
+
+            if '' not in self._dirs:
+                self._scan_dir('')
+                self._verify_files = False
+            elif rules_changed:
+                # Listings may hide newly ignored or miss re-included paths
+                for rel_dir in list(self._dirs):
+                    if rel_dir in self._dirs:
+                        self._scan_dir(rel_dir)
+            else:
+                for rel_dir in list(self._dirs):
+                    info = self._dirs.get(rel_dir)
+                    if info is None:
+                        continue  # dropped with its parent
+                    try:
+                        mtime = os.stat(self._abs(rel_dir)).st_mtime_ns
+                    except OSError:
+                        self._drop_dir(rel_dir)
+                        continue
+                    if mtime != info['mtime']:
+                        self._scan_dir(rel_dir)
+
+            if self._verify_files:
+                # Files edited while the index was not running
+                self.mark_changed(list(self._files))
+                self._verify_files = False
+
+            self._refreshed_at = time.time()
+            if self._dirty and self._refreshed_at - self._saved_at >= INDEX_SAVE_INTERVAL:
+                self._save()
+            return self.generation
+
+    def mark_changed(self, paths):
+        """
+        Re-stat files known to have been created, modified or deleted.
+
+        Args:
+            paths (iterable): Project-relative paths
+        """
+        with self._lock:
+            for path in paths:
+                path = self.normalize(path)
+                if self._ignore_matcher.is_ignored(path, is_dir=False):
+                    if self._files.pop(path, None) is not None:
+                        self._record_change(path)
+                    continue
+                try:
+                    stat = os.stat(self._abs(path))
+                except OSError:
+                    if self._files.pop(path, None) is not None:
+                        self._record_change(path)
+                        self._refreshed_at = 0.0  # parent listing changed
+                    continue
+                if not os.path.isfile(self._abs(path)):
+                    continue
+                known = self._files.get(path)
+                if not known or known[0] != stat.st_size or known[1] != stat.st_mtime_ns:
+                    if not known:
+                        self._refreshed_at = 0.0  # parent listing changed
+                    self._files[path] = [stat.st_size, stat.st_mtime_ns, None]
+                    self._record_change(path)
+
+    # Queries
+
+    @staticmethod
+    def normalize(path):
+        """Normalize a path to the index form (relative, forward slashes, no ./)."""
+        path = path.replace('\\', '/')
+        while path.startswith('./'):
+            path = path[2:]
+        return path
+
+    def list_files(self, hidden=True):
+        """
+        List the indexed files.
+
+        Args:
+            hidden (bool): Include files in or named after dot-folders/dotfiles
+
+        Returns:
+            list: Sorted project-relative paths
+        """
+        self.refresh()
+        with self._lock:
+            files = sorted(self._files)
+        return files if hidden else [path for path in files if not _is_hidden(path)]
+
+    def list_dirs(self):
+        """List the indexed directories (project-relative, root excluded), sorted."""
+        self.refresh()
+        with self._lock:
+            return sorted(d for d in self._dirs if d)
+
+    def exists(self, path):
+        """Check whether a file is in the index."""
+        self.refresh()
+        with self._lock:
+            return self.normalize(path) in self._files
+
+    def get_stat(self, path):
+        """Return (size, mtime_ns) of an indexed file, or None."""
+        self.refresh()
+        with self._lock:
+            entry = self._files.get(self.normalize(path))
+            return (entry[0], entry[1]) if entry else None
+
+    def get_hash(self, path):
+        """
+        Return the sha256 of a file's content, computed once per version.
+
+        Returns:
+            str: Hex digest, or None if the file is not indexed or unreadable
+        """
+        path = self.normalize(path)
+        self.mark_changed([path])
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is None:
+                return None
+            if entry[2] is None:
+                try:
+                    with open(self._abs(path), 'rb') as f:
+                        entry[2] = hashlib.sha256(f.read()).hexdigest()
+                    self._dirty = True
+                except OSError:
+                    return None
+            return entry[2]
+
+    def changed_since(self, generation):
+        """
+        Return the paths that changed after a generation.
+
+        Args:
+            generation (int): Value of `generation` (or refresh()) seen earlier
+
+        Returns:
+            set: Changed paths, or None if the change log no longer reaches
+                back that far (callers should then treat everything as changed)
+        """
+        self.refresh()
+        with self._lock:
+            if generation >= self.generation:
+                return set()
+            if not self._changes or self._changes[0][0] > generation + 1:
+                return None
+            changed = set()
+            for change_generation, path in reversed(self._changes):
+                if change_generation <= generation:
+                    break
+                changed.add(path)
+            return changed
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_project_index(root='.'):
+    """Return the process-wide ProjectFileIndex of a project root."""
+    root = os.path.abspath(root)
+    with _indexes_lock:
+        index = _indexes.get(root)
+        if index is None:
+            index = ProjectFileIndex(root)
+            _indexes[root] = index
+            atexit.register(index.flush)
+        return index
@@ -0,0 +1,92 @@
+import os
+import asyncio
+
+# Files every agent edits; they are never leased and rely on union merges
+# (see utils.git_utils.ensure_union_merge) instead of exclusive access
+SHARED_FILES = ('todolist.md',)
+
+
+def normalize_path(path):
+    """Normalize a project-relative path for comparison (forward slashes, no ./)."""
+    path = path.strip().strip('`"\'').replace('\\', '/')
+    path = os.path.normpath(path).replace('\\', '/')
+    return path[2:] if path.startswith('./') else path
+
+
+def parse_write_files(objective_content):
+    """
+    Extract the "# Write Files" list from an objective.
+
+    Args:
+        objective_content (str): Objective markdown as written by ObjectiveManager
+
+    Returns:
+        set: Normalized paths the objective plans to modify
+    """
+    write_files = set()
+    in_section = False
+    for line in objective_content.splitlines():
+        stripped = line.strip()
+        if stripped.startswith('#'):
+            in_section = stripped.lstrip('#').strip().lower().startswith('write files')
+            continue
+        if in_section and stripped.startswith(('-', '*')):
+            parts = stripped[1:].split()
+            if parts:
+                write_files.add(normalize_path(parts[0]))
+    return write_files
+
+
+class FileLeaseTable:
+    """Exclusive leases on the files agents are about to modify.
+
+    A cycle acquires its whole write set at once, so two running cycles never
+    hold overlapping files and acquisition cannot deadlock. Shared files are
+    left out of the leases.
+
+    Attributes:
+        shared_files (set): Paths every agent may modify concurrently
+    """
+
+    def __init__(self, shared_files=SHARED_FILES):
+        self.shared_files = {normalize_path(p) for p in shared_files}
+        self._leases = {}  # path -> agent holding it
+        self._condition = asyncio.Condition()
+
+    def _lease_set(self, paths):
+        return {normalize_path(p) for p in paths} - self.shared_files
+
+    def holders(self, paths, agent_name=None):
+        """Return the agents (other than agent_name) holding any of the given paths."""
+        return {
+            self._leases[path] for path in self._lease_set(paths)
+            if path in self._leases and self._leases[path] != agent_name
+        }
+
+    def is_free(self, paths, agent_name=None):
+        """Check whether none of the paths is leased by another agent."""
+        return not self.holders(paths, agent_name)
+
+    async def acquire(self, agent_name, paths, logger=None):
+        """
+        Wait until no other agent holds any of the paths, then lease them all.
+
+        Args:
+            agent_name (str): Agent requesting the lease
+            paths (iterable): Files the agent's cycle will modify
+            logger (Logger, optional): Used to report waits
+        """
+        paths = self._lease_set(paths)
+        async with self._condition:
+            holders = self.holders(paths, agent_name)
+            if holders and logger:
+                logger.info(f"🔒 Agent {agent_name} waiting for files held by {', '.join(sorted(holders))}")
+            await self._condition.wait_for(lambda: self.is_free(paths, agent_name))
+            for path in paths:
+                self._leases[path] = agent_name
+
+    async def release(self, agent_name):
+        """Release every lease held by an agent and wake up waiting cycles."""
+        async with self._condition:
+            self._leases = {p: a for p, a in self._leases.items() if a != agent_name}
+            self._condition.notify_all()
@@ -0,0 +1,380 @@
+import os
+import re
+import json
+import math
+import struct
+import hashlib
+import logging
+import threading
+from array import array
+from collections import Counter
+
+# File selection strategy for objectives:
+#   local  - rank files with the local index only (no LLM call)
+#   rerank - rank locally, then let the LLM pick from the shortlist
+#   llm    - let the LLM pick from the whole project tree
+FILE_SELECTION_MODE = os.getenv('FILE_SELECTION', 'local').lower()
+
+# Semantic ranking embeds files with a local model run on CPU through
+# transformers; it downloads the model on first use, so it is opt-in. The
+# lexical (BM25) ranking is used when it is off, or when transformers/torch
+# are missing or the model cannot be loaded
+SEMANTIC_RANKING = os.getenv('SEMANTIC_RANKING', 'false').lower() in ('1', 'true', 'yes')
+EMBEDDING_MODEL = os.getenv('EMBEDDING_MODEL', 'sentence-transformers/all-MiniLM-L6-v2')
+EMBEDDING_MAX_TOKENS = 256  # tokens of each file embedded
+EMBEDDING_BATCH_SIZE = 16
+
+FILE_INDEX_PATH = os.path.join('.aider.cache', 'file_index.json')
+VECTORS_SUFFIX = '.vectors'  # side file of the embedding vectors, next to the index
+VECTOR_HEADER = struct.Struct('<32sI')  # sha256 digest of the content, vector length
+FILE_RANK_MAX_BYTES = 512 * 1024  # larger files are ranked by path only
+FILE_RANK_MAX_CHARS = 8000  # characters of a file used for ranking
+
+# Selection sizes
+RANKED_WRITE_FILES = 3  # best ranked files proposed for modification
+RANKED_CONTEXT_FILES = 9  # next best files proposed as read-only context
+RERANK_CANDIDATES = 30  # shortlist size sent to the LLM re-ranker
+
+# BM25 parameters of the lexical ranking
+BM25_K1 = 1.5
+BM25_B = 0.75
+PATH_TERM_WEIGHT = 3  # path terms count as this many content occurrences
+
+_TERM_PATTERN = re.compile(r'[A-Z]?[a-z]+|[A-Z]+(?![a-z])|[0-9]+')
+
+
+def tokenize(text):
+    """Split text into lowercase terms, breaking camelCase and snake_case words."""
+    return [term.lower() for term in _TERM_PATTERN.findall(text) if len(term) > 1]
+
+
+class _TransformerEmbedder:
+    """Mean-pooled sentence embeddings computed on CPU with transformers."""
+
+    def __init__(self, model_name):
+        # Imported lazily: loading torch is slow and only needed here
+        import torch
+        from transformers import AutoModel, AutoTokenizer
+        self.torch = torch
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+
+    def embed(self, texts):
+        """Return one L2-normalized vector (list of floats) per text."""
+        vectors = []
+        for start in range(0, len(texts), EMBEDDING_BATCH_SIZE):
+            batch = texts[start:start + EMBEDDING_BATCH_SIZE]
+            inputs = self.tokenizer(batch, padding=True, truncation=True,
+                                    max_length=EMBEDDING_MAX_TOKENS, return_tensors='pt')
+            with self.torch.no_grad():
+                output = self.model(**inputs).last_hidden_state
+            mask = inputs['attention_mask'].unsqueeze(-1).float()
+            pooled = (output * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+            pooled = self.torch.nn.functional.normalize(pooled, dim=1)
+            vectors.extend([round(v, 5) for v in row] for row in pooled.tolist())
+        return vectors
+
+
+_embedders = {}  # model name -> embedder, or None when it could not be loaded
+_embedders_lock = threading.Lock()
+
+
+def get_embedder(model_name=EMBEDDING_MODEL, logger=None):
+    """
+    Return the process-wide embedder of a model, loading it on first use.
+
+    Returns:
+        _TransformerEmbedder: The embedder, or None if SEMANTIC_RANKING is off
+            or transformers, torch or the model are unavailable (reported once)
+    """
+    if not SEMANTIC_RANKING:
+        return None
+    with _embedders_lock:
+        if model_name not in _embedders:
+            logger = logger or logging.getLogger('KinOS')
+            try:
+                _embedders[model_name] = _TransformerEmbedder(model_name)
+                logger.debug(f"🧮 Loaded embedding model {model_name}")
+            except Exception as e:
+                _embedders[model_name] = None
+                logger.warning(f"⚠️ Embedding model {model_name} unavailable, using lexical matching: {str(e)}")
+        return _embedders[model_name]
+
+
+class FileRelevanceIndex:
+    """Persistent index ranking project files against an objective.
+
+    Each file is stored under the hash of its path and content, so only new
+    or modified files are read, tokenized and embedded again; unchanged files
+    are recognized by their size and modification time without rehashing.
+    Files are ranked by BM25 over their path and content terms, or by
+    embedding similarity when SEMANTIC_RANKING is enabled.
+
+    Terms are kept in a JSON file; embedding vectors go to an append-only
+    binary side file keyed by content hash, so a refresh only writes the
+    vectors it computed. The side file is compacted once most of its
+    records are stale.
+
+    Attributes:
+        path (str): JSON file holding the index
+        vectors_path (str): Binary file holding the embedding vectors
+        model_name (str): Embedding model
+    """
+
+    def __init__(self, path=FILE_INDEX_PATH, model_name=EMBEDDING_MODEL, logger=None):
+        self.path = path
+        self.vectors_path = os.path.splitext(path)[0] + VECTORS_SUFFIX
+        self.model_name = model_name
+        self.logger = logger or logging.getLogger('KinOS')
+        self._files = {}  # path -> [mtime_ns, size, key]
+        self._entries = {}  # key -> {'terms': {term: count}, 'length': n}
+        self._vectors = {}  # key -> embedding vector
+        self._vector_records = 0  # records in the side file, stale ones included
+        self._rewrite_vectors = False  # side file holds another model's vectors
+        self._lock = threading.Lock()
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return
+        self._files = data.get('files', {})
+        self._entries = data.get('entries', {})
+        for entry in self._entries.values():
+            entry.pop('vector', None)  # stored inline by older versions
+        if data.get('model') == self.model_name:
+            self._load_vectors()
+        else:
+            # Vectors from another model are not comparable
+            self._rewrite_vectors = True
+
+    def _load_vectors(self):
+        """Read the side file; a truncated last record is ignored."""
+        try:
+            with open(self.vectors_path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return
+        offset = 0
+        while offset + VECTOR_HEADER.size <= len(data):
+            digest, dimensions = VECTOR_HEADER.unpack_from(data, offset)
+            offset += VECTOR_HEADER.size
+            end = offset + dimensions * 4
+            if end > len(data):
+                break
+            vector = array('f')
+            vector.frombytes(data[offset:end])
+            self._vectors[digest.hex()] = vector.tolist()
+            self._vector_records += 1
+            offset = end
+
+    @staticmethod
+    def _pack_vector(key, vector):
+        return VECTOR_HEADER.pack(bytes.fromhex(key), len(vector)) + array('f', vector).tobytes()
+
+    def _save(self, new_vectors):
+        """Write the terms and append the new vectors, compacting stale ones."""
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'model': self.model_name, 'files': self._files, 'entries': self._entries}, f)
+
+        stale = self._vector_records - len(self._vectors)
+        if stale > len(self._vectors) or self._rewrite_vectors or not os.path.exists(self.vectors_path):
+            vectors_temp = f"{self.vectors_path}.{os.getpid()}.tmp"
+            with open(vectors_temp, 'wb') as f:
+                for key, vector in self._vectors.items():
+                    f.write(self._pack_vector(key, vector))
+            os.replace(vectors_temp, self.vectors_path)
+            self._vector_records = len(self._vectors)
+            self._rewrite_vectors = False
+        elif new_vectors:
+            with open(self.vectors_path, 'ab') as f:
+                for key in new_vectors:
+                    f.write(self._pack_vector(key, self._vectors[key]))
+            self._vector_records += len(new_vectors)
+
+        os.replace(temp_path, self.path)
+
+    def _get_embedder(self):
+        return get_embedder(self.model_name, self.logger)
+
+    def _read_text(self, path, size):
+        """Text used to rank a file: its path, plus its content when it is text."""
+        if size > FILE_RANK_MAX_BYTES:
+            return path
+        try:
+            with open(path, 'rb') as f:
+                content = f.read(FILE_RANK_MAX_CHARS * 4)
+            return f"{path}\n{content.decode('utf-8')[:FILE_RANK_MAX_CHARS]}"
+        except (OSError, UnicodeDecodeError):
+            return path
+
+    def refresh(self, paths):
+        """
+        Bring the index up to date for a set of files.
+
+        Files indexed earlier but not listed are kept (callers rank different
+        subsets of the project), unless they no longer exist.
+
+        Args:
+            paths (list): Project-relative file paths
+
+        Returns:
+            int: Number of files (re)indexed
+        """
+        with self._lock:
+            pending = {}  # key -> (path, text) of entries to build
+            listed = set()
+            changed = False
+            for path in paths:
+                listed.add(path)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    changed = self._files.pop(path, None) is not None or changed
+                    continue
+                known = self._files.get(path)
+                if known and known[0] == stat.st_mtime_ns and known[1] == stat.st_size and known[2] in self._entries:
+                    continue
+                text = self._read_text(path, stat.st_size)
+                key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+                self._files[path] = [stat.st_mtime_ns, stat.st_size, key]
+                changed = True
+                if key not in self._entries:
+                    pending[key] = (path, text)
+
+            # Forget files deleted since they were indexed
+            for path in [p for p in self._files if p not in listed and not os.path.exists(p)]:
+                del self._files[path]
+                changed = True
+
+            for key, (path, text) in pending.items():
+                terms = Counter(tokenize(text))
+                for term in tokenize(path):
+                    terms[term] += PATH_TERM_WEIGHT - 1
+                self._entries[key] = {'terms': dict(terms), 'length': sum(terms.values())}
+
+            # Embed new entries, and older ones indexed while the model was unavailable
+            new_vectors = []
+            embedder = self._get_embedder()
+            if embedder:
+                key_paths = {self._files[p][2]: p for p in listed if p in self._files}
+                missing = [k for k in key_paths if k not in self._vectors]
+                if missing:
+                    texts = [
+                        pending[k][1] if k in pending else self._read_text(key_paths[k], self._files[key_paths[k]][1])
+                        for k in missing
+                    ]
+                    for key, vector in zip(missing, embedder.embed(texts)):
+                        self._vectors[key] = vector
+                    new_vectors = missing
+
+            # Drop entries no indexed file refers to anymore
+            live_keys = {f[2] for f in self._files.values()}
+            if len(self._entries) != len(live_keys) or len(self._vectors) > len(live_keys):
+                self._entries = {k: e for k, e in self._entries.items() if k in live_keys}
+                self._vectors = {k: v for k, v in self._vectors.items() if k in live_keys}
+                changed = True
+            if changed or new_vectors:
+                try:
+                    self._save(new_vectors)
+                except OSError as e:
+                    self.logger.warning(f"⚠️ Could not save file index: {str(e)}")
+
+            if pending:
+                self.logger.debug(f"🗂️ File index refreshed: {len(pending)} of {len(listed)} files indexed")
+            return len(pending)
+
+    def rank(self, query, paths, top_k=None):
+        """
+        Rank files by relevance to a query.
+
+        Args:
+            query (str): Objective or task description
+            paths (list): Project-relative file paths to rank
+            top_k (int, optional): Number of files to return
+
+        Returns:
+            list: (path, score) tuples, most relevant first
+        """
+        self.refresh(paths)
+        with self._lock:
+            candidates = [(p, self._entries[self._files[p][2]]) for p in paths if p in self._files]
+            if not candidates:
+                return []
+
+            embedder = self._get_embedder()
+            if embedder and all(self._files[path][2] in self._vectors for path, _ in candidates):
+                query_vector = embedder.embed([query])[0]
+                scored = [
+                    (path, sum(a * b for a, b in zip(query_vector, self._vectors[self._files[path][2]])))
+                    for path, _ in candidates
+                ]
+            else:
+                scored = self._bm25(query, candidates)
+
+        scored.sort(key=lambda item: -item[1])
+        return scored[:top_k] if top_k else scored
+
+    def _bm25(self, query, candidates):
+        """Score candidates with BM25 over their path and content terms."""
+        query_terms = set(tokenize(query))
+        count = len(candidates)
+        average_length = sum(entry['length'] for _, entry in candidates) / count or 1
+        document_frequency = Counter(
+            term for _, entry in candidates for term in query_terms if term in entry['terms']
+        )
+
+        scored = []
+        for path, entry in candidates:
+            score = 0.0
+            for term in query_terms:
+                frequency = entry['terms'].get(term)
+                if not frequency:
+                    continue
+                idf = math.log(1 + (count - document_frequency[term] + 0.5) / (document_frequency[term] + 0.5))
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * entry['length'] / average_length)
+                score += idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+            scored.append((path, score))
+        return scored
+
+
+def format_file_selection(ranked):
+    """
+    Format ranked files like the LLM file-context answer.
+
+    The best ranked files are proposed for modification, the next ones as
+    read-only context; files with no relevance at all are left out.
+
+    Args:
+        ranked (list): (path, score) tuples, most relevant first
+
+    Returns:
+        str: "# Context Files" / "# Write Files" lists
+    """
+    ranked = [(path, score) for path, score in ranked if score > 0]
+    write_files = ranked[:RANKED_WRITE_FILES]
+    context_files = ranked[RANKED_WRITE_FILES:RANKED_WRITE_FILES + RANKED_CONTEXT_FILES]
+    lines = ["# Context Files (read-only)"]
+    lines.extend(f"- ./{path} (📖) Related to the objective (relevance {score:.2f})" for path, score in context_files)
+    lines.append("")
+    lines.append("# Write Files (to be modified)")
+    lines.extend(f"- ./{path} (✏️) Most relevant to the objective (relevance {score:.2f})" for path, score in write_files)
+    return "\n".join(lines)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_file_index():
+    """Return the process-wide FileRelevanceIndex instance."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FileRelevanceIndex()
+        return _index
@@ -0,0 +1,173 @@
+import bisect
+import threading
+from collections import deque, namedtuple
+from utils.file_index import get_project_index
+
+# A reference: the project path, where it was found and the rest of its line
+FileReference = namedtuple('FileReference', ['path', 'line_number', 'line', 'description'])
+
+_PATH_CHARS = frozenset('abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-./')
+
+
+def _is_path_char(char):
+    return char in _PATH_CHARS or (char.isalnum() and not char.isascii())
+
+
+class FileReferenceExtractor:
+    """Aho-Corasick matcher finding references to project files in text.
+
+    The automaton holds every project path and, when no other file shares
+    it, each file's basename. Text is scanned once: references may use
+    backslashes or a ./ prefix, and must stand as a whole word (a path inside
+    a longer path does not count). Names without a folder only match when
+    they have an extension, so a file called "test" is not found in prose.
+
+    Attributes:
+        paths (list): Project-relative paths the automaton was built from
+    """
+
+    def __init__(self, paths):
+        self.paths = list(paths)
+        self._goto = [{}]  # node -> {char: node}
+        self._fail = [0]
+        self._outputs = [None]  # node -> (key length, path) of the key ending there
+        self._dict_links = [0]  # node -> nearest node on the fail chain with an output
+
+        keys = {}
+        basenames = {}
+        for path in self.paths:
+            keys[path] = path
+            name = path.rsplit('/', 1)[-1]
+            basenames.setdefault(name, []).append(path)
+        for name, owners in basenames.items():
+            if len(owners) == 1:
+                keys.setdefault(name, owners[0])
+
+        for key, path in keys.items():
+            if '/' not in key and '.' not in key.lstrip('.'):
+                continue
+            self._add(key, path)
+        self._build_links()
+
+    def _add(self, key, path):
+        node = 0
+        for char in key:
+            next_node = self._goto[node].get(char)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][char] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._outputs.append(None)
+                self._dict_links.append(0)
+            node = next_node
+        self._outputs[node] = (len(key), path)
+
+    def _build_links(self):
+        """Compute failure and output links breadth first."""
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for char, child in self._goto[node].items():
+                queue.append(child)
+                fail = self._fail[node]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                fail = self._goto[fail].get(char, 0)
+                self._fail[child] = fail
+                self._dict_links[child] = fail if self._outputs[fail] else self._dict_links[fail]
+
+    def _is_boundary(self, text, start, end):
+        """Check that text[start:end] is a whole reference, not part of a longer one."""
+        if start >= 2 and text[start - 2:start] == './':
+            start -= 2
+        if start > 0 and _is_path_char(text[start - 1]):
+            return False
+        if end < len(text):
+            char = text[end]
+            if char == '.':
+                # Sentence punctuation, not a longer extension
+                return end + 1 == len(text) or not _is_path_char(text[end + 1])
+            if _is_path_char(char):
+                return False
+        return True
+
+    def _matches(self, text):
+        """Yield (start, end, path) for every key occurrence in text."""
+        goto, fail, outputs, dict_links = self._goto, self._fail, self._outputs, self._dict_links
+        node = 0
+        for index, char in enumerate(text):
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            match_node = node if outputs[node] else dict_links[node]
+            while match_node:
+                length, path = outputs[match_node]
+                yield index + 1 - length, index + 1, path
+                match_node = dict_links[match_node]
+
+    def find(self, text):
+        """
+        Find the project files referenced in a text.
+
+        Args:
+            text (str): Objective or any other text
+
+        Returns:
+            list: FileReference tuples in order of first appearance, one per
+                file; the description is the rest of the line after the reference
+        """
+        # Same length, so match positions stay valid in the original text
+        normalized = text.replace('\\', '/')
+
+        # Keep the longest reference at each position, then drop overlaps
+        candidates = {}
+        for start, end, path in self._matches(normalized):
+            if self._is_boundary(normalized, start, end) and end > candidates.get(start, (0,))[0]:
+                candidates[start] = (end, path)
+
+        references = []
+        found = set()
+        covered_until = 0
+        line_starts = None
+        for start in sorted(candidates):
+            end, path = candidates[start]
+            if start < covered_until:
+                continue
+            covered_until = end
+            if path in found:
+                continue
+            found.add(path)
+
+            line_start = text.rfind('\n', 0, start) + 1
+            line_end = text.find('\n', end)
+            line_end = len(text) if line_end == -1 else line_end
+            if line_starts is None:
+                line_starts = [0] + [i + 1 for i, char in enumerate(text) if char == '\n']
+            line_number = bisect.bisect_right(line_starts, start)
+            references.append(FileReference(
+                path=path,
+                line_number=line_number,
+                line=text[line_start:line_end],
+                description=text[end:line_end].strip()
+            ))
+        return references
+
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+
+def get_file_reference_extractor():
+    """Return an extractor over the current project files, rebuilt when files are added or removed."""
+    global _extractor
+    paths = get_project_index().list_files()
+    with _extractor_lock:
+        if _extractor is None or _extractor.paths != paths:
+            _extractor = FileReferenceExtractor(paths)
+        return _extractor
+
+
+def find_file_references(text):
+    """Find the project files referenced in a text; see FileReferenceExtractor.find()."""
+    return get_file_reference_extractor().find(text)
@@ -1,7 +1,20 @@
 import os
-import fnmatch
+import threading
+from collections import Counter
 from typing import List, Set
 from utils.logger import Logger
+from utils.ignore_matcher import get_ignore_matcher
+
+# Tree limits
+TREE_MAX_ENTRIES = 20000  # lines after which the tree is cut off
+TREE_COLLAPSE_THRESHOLD = 200  # folders with more files show a summary instead
+TREE_SUMMARY_EXTENSIONS = 5  # extensions listed in a folder summary
+
+# Folder listings shared by all FSUtils instances:
+# absolute path -> (folder mtime, ignore rules generation, files, subfolders)
+_scan_cache = {}
+_scan_cache_lock = threading.Lock()
+
 
 class FSUtils:
     """
@@ -17,146 +30,152 @@ class FSUtils:
     def __init__(self):
         self.logger = Logger()
         self.current_folder_path = None
+        self.ignore_matcher = get_ignore_matcher()
+
+    def _scan(self, folder_path: str) -> tuple:
+        """
+        List a folder's files and subfolders in one scandir pass.
+        
+        Listings are cached until the folder's mtime or the ignore rules change.
+        
+        Returns:
+            tuple: (sorted file names, sorted subfolder names), ignored entries excluded
+        """
+        abs_path = os.path.abspath(folder_path)
+        self.ignore_matcher.refresh()
+        generation = self.ignore_matcher.generation
+        try:
+            mtime = os.stat(abs_path).st_mtime_ns
+        except OSError:
+            return [], []
+
+        cached = _scan_cache.get(abs_path)
+        if cached and cached[0] == mtime and cached[1] == generation:
+            return cached[2], cached[3]
+
+        files, folders = [], []
+        with os.scandir(abs_path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                    if not is_dir and not entry.is_file():
+                        continue
+                except OSError:
+                    continue
+                if not self.ignore_matcher.is_ignored(entry.path, is_dir=is_dir):
+                    (folders if is_dir else files).append(entry.name)
+
+        files.sort()
+        folders.sort()
+        with _scan_cache_lock:
+            _scan_cache[abs_path] = (mtime, generation, files, folders)
+        return files, folders
         
     def get_folder_files(self, folder_path: str) -> list:
         """Get list of files in folder, respecting ignore patterns."""
-        ignore_patterns = self._get_ignore_patterns()
-        files = []
-        
-        for entry in os.scandir(folder_path):
-            if entry.is_file():
-                rel_path = os.path.relpath(entry.path, '.')
-                if not self._should_ignore(rel_path, ignore_patterns):
-                    files.append(entry.name)
-                    
-        return sorted(files)
+        return list(self._scan(folder_path)[0])
 
     def get_subfolders(self, folder_path: str) -> list:
         """Get list of subfolders, respecting ignore patterns."""
-        ignore_patterns = self._get_ignore_patterns()
-        folders = []
+        return list(self._scan(folder_path)[1])
+
+    def _is_current_branch(self, abs_path: str) -> bool:
+        """Check whether a folder is the current folder or one of its parents."""
+        current = self.current_folder_path
+        return bool(current) and (current == abs_path or current.startswith(abs_path.rstrip(os.sep) + os.sep))
+
+    @staticmethod
+    def _summarize_files(files: list) -> str:
+        """Summarize a large folder's files by count and extension."""
+        extensions = Counter(os.path.splitext(f)[1] or 'no extension' for f in files)
+        counts = ", ".join(f"{ext}: {count}" for ext, count in extensions.most_common(TREE_SUMMARY_EXTENSIONS))
+        if len(extensions) > TREE_SUMMARY_EXTENSIONS:
+            counts += ", ..."
+        return f"📄 {len(files)} files ({counts})"
+
+    def walk_tree(self, current_path: str = ".", max_depth: int = 3,
+                  collapse_threshold: int = TREE_COLLAPSE_THRESHOLD):
+        """
+        Walk a folder tree once, yielding its lines as they are found.
         
-        for entry in os.scandir(folder_path):
-            if entry.is_dir():
-                rel_path = os.path.relpath(entry.path, '.')
-                if not self._should_ignore(rel_path, ignore_patterns):
-                    folders.append(entry.name)
-                    
-        return sorted(folders)
-
-    def build_tree_structure(self, current_path: str, files: list, subfolders: list, 
-                           max_depth: int = 3, current_depth: int = 0, 
-                           is_current_branch: bool = True) -> list:
-        """Build tree structure with proper indentation and active folder highlighting."""
-        tree = []
+        Folders deeper than max_depth are shown as "name/..." unless they lead
+        to the current folder. The entries do not depend on the current folder
+        when max_depth is None, so they can be kept and formatted for several
+        folders with format_tree().
         
-        # Initialize current_folder_path if None
-        if self.current_folder_path is None:
-            self.current_folder_path = ""
+        Args:
+            current_path (str): Root of the tree
+            max_depth (int, optional): Depth of expanded folders, None for unlimited
+            collapse_threshold (int, optional): Folders with more files list a
+                summary instead of their files; None lists every file
             
-        # Handle None max_depth by setting it to a large number
+        Yields:
+            tuple: (indent, text, folder) - folder is the absolute path of
+                folder lines and None for other lines
+        """
         if max_depth is None:
             max_depth = float('inf')  # Use infinity for unlimited depth
-        
-        # Determine if this is the active folder
-        is_active = os.path.abspath(current_path) == self.current_folder_path
-        
+        yield from self._walk(os.path.abspath(current_path), 0, max_depth, collapse_threshold)
+
+    def _walk(self, abs_path: str, depth: int, max_depth, collapse_threshold):
+        files, subfolders = self._scan(abs_path)
+
         # Show root folder without indentation
-        if current_depth == 0:
-            active_indicator = "👉 " if is_active else ""
-            tree.append(f"{active_indicator}📂 ./")
+        if depth == 0:
+            yield "", "📂 ./", abs_path
             base_indent = "   "  # Base indentation for root level items
         else:
-            folder_name = os.path.basename(current_path)
-            base_indent = "   " * current_depth
-            active_indicator = "👉 " if is_active else ""
-            tree.append(f"{base_indent}{active_indicator}📂 {folder_name}")
-        
-        # Add files with proper indentation
-        for i, f in enumerate(files):
-            prefix = "├─ " if (i < len(files) - 1 or subfolders) else "└─ "
-            tree.append(f"{base_indent}{prefix}{f}")
-        
+            base_indent = "   " * depth
+            yield base_indent, f"📂 {os.path.basename(abs_path)}", abs_path
+
+        # Add files with proper indentation, or a summary for large folders
+        if collapse_threshold and len(files) > collapse_threshold:
+            prefix = "├─ " if subfolders else "└─ "
+            yield base_indent, f"{prefix}{self._summarize_files(files)}", None
+        else:
+            for i, f in enumerate(files):
+                prefix = "├─ " if (i < len(files) - 1 or subfolders) else "└─ "
+                yield base_indent, f"{prefix}{f}", None
+
         # Add subfolders without extra indentation
         for i, d in enumerate(subfolders):
             prefix = "├─ " if i < len(subfolders) - 1 else "└─ "
-            subfolder_path = os.path.join(current_path, d)
-            
-            # Determine if this subfolder is part of current path
-            is_current_subfolder = (is_current_branch and 
-                                  self.current_folder_path and 
-                                  subfolder_path in self.current_folder_path)
-            
-            if is_current_subfolder or current_depth < max_depth:
-                sub_files = self.get_folder_files(subfolder_path)
-                sub_folders = self.get_subfolders(subfolder_path)
-                
-                # Add subfolder and its contents
-                subtree = self.build_tree_structure(
-                    subfolder_path,
-                    sub_files,
-                    sub_folders,
-                    max_depth,
-                    current_depth + 1,
-                    is_current_subfolder
-                )
-                tree.extend(subtree)
+            subfolder_path = os.path.join(abs_path, d)
+            if depth < max_depth or self._is_current_branch(subfolder_path):
+                yield from self._walk(subfolder_path, depth + 1, max_depth, collapse_threshold)
             else:
                 # Just show folder name for depth-limited branches
-                tree.append(f"{base_indent}{prefix}{d}/...")
-        
-        return tree
-
-    def _get_ignore_patterns(self) -> List[str]:
-        """Get list of patterns to ignore from .gitignore and defaults."""
-        patterns = [
-            '.git/*',
-            '.git*',
-            '.aider*',
-            'node_modules',
-            '__pycache__',
-            '*.pyc',
-            '*.pyo',
-            '*.pyd',
-            '.DS_Store',
-            'Thumbs.db'
-        ]
-        
-        # Add patterns from .gitignore if it exists
-        if os.path.exists('.gitignore'):
-            try:
-                with open('.gitignore', 'r', encoding='utf-8') as f:
-                    patterns.extend(line.strip() for line in f 
-                                  if line.strip() and not line.startswith('#'))
-            except Exception as e:
-                self.logger.warning(f"⚠️ Could not read .gitignore: {str(e)}")
-        
-        # Add patterns from .aiderignore if it exists        
-        if os.path.exists('.aiderignore'):
-            try:
-                with open('.aiderignore', 'r', encoding='utf-8') as f:
-                    patterns.extend(line.strip() for line in f 
-                                  if line.strip() and not line.startswith('#'))
-            except Exception as e:
-                self.logger.warning(f"⚠️ Could not read .aiderignore: {str(e)}")
-                
-        return patterns
-
-    def _should_ignore(self, path: str, ignore_patterns: List[str]) -> bool:
-        """Check if a path should be ignored based on ignore patterns."""
-        # Normalize path for consistent comparison
-        path = path.replace('\\', '/')
+                yield base_indent, f"{prefix}{d}/...", None
+
+    def format_tree(self, entries, max_entries: int = TREE_MAX_ENTRIES):
+        """
+        Format tree entries, highlighting the current folder.
         
-        # Always ignore .git and .aider folders and files
-        path_parts = path.split('/')
-        if any(part.startswith(('.git', '.aider')) for part in path_parts):
-            return True
+        Args:
+            entries (iterable): Entries from walk_tree()
+            max_entries (int, optional): Lines after which the tree is cut off
             
-        # Check against other ignore patterns
-        for pattern in ignore_patterns:
-            if fnmatch.fnmatch(path, pattern):
-                return True
-        return False
+        Yields:
+            str: Tree lines
+        """
+        for count, (indent, text, folder) in enumerate(entries):
+            if max_entries and count >= max_entries:
+                yield f"... (tree cut off after {max_entries} entries)"
+                return
+            active_indicator = "👉 " if folder is not None and folder == self.current_folder_path else ""
+            yield f"{indent}{active_indicator}{text}"
+
+    def iter_tree(self, current_path: str = ".", max_depth: int = 3,
+                  max_entries: int = TREE_MAX_ENTRIES,
+                  collapse_threshold: int = TREE_COLLAPSE_THRESHOLD):
+        """Yield the tree lines of a folder; see walk_tree() and format_tree()."""
+        return self.format_tree(self.walk_tree(current_path, max_depth, collapse_threshold), max_entries)
+
+    def build_tree_structure(self, current_path: str = ".", max_depth: int = 3,
+                             max_entries: int = TREE_MAX_ENTRIES,
+                             collapse_threshold: int = TREE_COLLAPSE_THRESHOLD) -> list:
+        """Build tree structure with proper indentation and active folder highlighting."""
+        return list(self.iter_tree(current_path, max_depth, max_entries, collapse_threshold))
 
     def set_current_folder(self, folder_path: str):
         """Set the current folder path for tree building."""
@@ -0,0 +1,212 @@
+import os
+import asyncio
+import subprocess
+from collections import namedtuple
+from utils.runtime_metrics import get_runtime_metrics
+
+
+async def run_git(*args, cwd=None, check=True):
+    """
+    Run a git command without blocking the event loop.
+
+    Args:
+        *args: Arguments passed to git
+        cwd (str, optional): Working tree to run the command in
+        check (bool): Raise if git exits with a non-zero code
+
+    Returns:
+        str: Decoded stdout of the command
+
+    Raises:
+        subprocess.CalledProcessError: If check is set and git fails
+    """
+    cmd = ['git', *args]
+    process = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd
+    )
+    try:
+        stdout, stderr = await process.communicate()
+    except asyncio.CancelledError:
+        if process.returncode is None:
+            try:
+                process.kill()
+            except ProcessLookupError:
+                pass  # Process already exited
+        raise
+
+    stdout = stdout.decode('utf-8', errors='replace')
+    stderr = stderr.decode('utf-8', errors='replace')
+    if process.returncode != 0 and 'index.lock' in stderr:
+        get_runtime_metrics().record_git_lock_contention()
+    if check and process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+    return stdout
+
+
+async def ensure_union_merge(paths, cwd=None):
+    """
+    Mark files as append-friendly by giving them the union merge driver.
+
+    The attribute is written to .git/info/attributes so the project's own
+    .gitattributes is left untouched. Concurrent edits to these files are then
+    merged line-wise instead of conflicting.
+
+    Args:
+        paths (iterable): Files every agent edits (e.g. todolist.md)
+        cwd (str, optional): Working tree of the repository
+    """
+    git_dir = (await run_git('rev-parse', '--git-common-dir', cwd=cwd)).strip()
+    attributes_path = os.path.join(cwd or '.', git_dir, 'info', 'attributes')
+    os.makedirs(os.path.dirname(attributes_path), exist_ok=True)
+
+    existing = ""
+    if os.path.exists(attributes_path):
+        with open(attributes_path, 'r', encoding='utf-8') as f:
+            existing = f.read()
+    lines = existing.splitlines()
+
+    missing = [f"{path} merge=union" for path in paths if f"{path} merge=union" not in lines]
+    if missing:
+        with open(attributes_path, 'a', encoding='utf-8') as f:
+            if existing and not existing.endswith('\n'):
+                f.write('\n')
+            f.write('\n'.join(missing) + '\n')
+
+
+# Tree of an empty repository, the base of the first commit's diff
+EMPTY_TREE = '4b825dc642cb6eb9a060e54bf8d69288fbee4904'
+
+# HEAD commit and the paths git status reports as changed or untracked,
+# path -> (status, exists, index hash, size, mtime_ns)
+GitSnapshot = namedtuple('GitSnapshot', ['head', 'entries'])
+
+
+class GitChanges(namedtuple('GitChanges', ['added', 'modified', 'deleted'])):
+    """Paths added, modified and deleted between two snapshots."""
+
+    @property
+    def paths(self):
+        """All changed paths, sorted."""
+        return sorted(self.added | self.modified | self.deleted)
+
+
+async def git_snapshot(cwd=None):
+    """
+    Record the state of a working tree in one `git status` call.
+
+    Only HEAD and the entries git reports as changed (staged, unstaged or
+    untracked) are kept, so the snapshot is proportional to the number of
+    pending changes rather than to the size of the repository.
+
+    Args:
+        cwd (str, optional): Working tree of the repository
+
+    Returns:
+        GitSnapshot: HEAD commit (None before the first commit) and changed entries
+
+    Raises:
+        subprocess.CalledProcessError: If git status fails
+    """
+    output = await run_git(
+        'status', '--porcelain=v2', '-z', '--branch', '--no-renames', '--untracked-files=all',
+        cwd=cwd
+    )
+
+    head = None
+    entries = {}
+    records = iter(output.split('\0'))
+    for record in records:
+        if record.startswith('# branch.oid '):
+            oid = record[len('# branch.oid '):]
+            head = None if oid == '(initial)' else oid
+            continue
+
+        kind = record[:1]
+        if kind == '1':
+            fields = record.split(' ', 8)
+            status, index_hash, path = fields[1], fields[7], fields[8]
+        elif kind == '2':
+            fields = record.split(' ', 9)
+            status, index_hash, path = fields[1], fields[7], fields[9]
+            next(records, None)  # original path of the rename
+        elif kind == 'u':
+            fields = record.split(' ', 10)
+            status, index_hash, path = fields[1], None, fields[10]
+        elif kind == '?':
+            status, index_hash, path = '??', None, record[2:]
+        else:
+            continue
+
+        try:
+            stat = os.lstat(os.path.join(cwd or '.', path))
+            size, mtime = stat.st_size, stat.st_mtime_ns
+        except OSError:
+            size, mtime = None, None
+        exists = 'D' not in status and size is not None
+        entries[path] = (status, exists, index_hash, size, mtime)
+
+    return GitSnapshot(head, entries)
+
+
+async def git_changes(before, after, cwd=None):
+    """
+    Compare two snapshots of the same working tree.
+
+    Commits made in between (aider commits its own edits) are read from
+    `git diff` between the two HEADs; uncommitted work is compared entry by
+    entry. Both costs grow with the number of changes only.
+
+    Args:
+        before (GitSnapshot): Earlier snapshot
+        after (GitSnapshot): Later snapshot
+        cwd (str, optional): Working tree of the repository
+
+    Returns:
+        GitChanges: Added, modified and deleted paths
+    """
+    committed = {}  # path -> A, M or D
+    if after.head and after.head != before.head:
+        output = await run_git(
+            'diff', '--name-status', '-z', '--no-renames', before.head or EMPTY_TREE, after.head,
+            cwd=cwd
+        )
+        fields = output.split('\0')
+        for status, path in zip(fields[::2], fields[1::2]):
+            committed[path] = status[:1]
+
+    candidates = set(committed)
+    candidates.update(
+        path for path in before.entries.keys() | after.entries.keys()
+        if before.entries.get(path) != after.entries.get(path)
+    )
+
+    added, modified, deleted = set(), set(), set()
+    for path in candidates:
+        # Existence before the phase
+        if path in before.entries:
+            existed = before.entries[path][1]
+        elif path in committed:
+            existed = committed[path] != 'A'
+        else:
+            # Clean before: tracked unless it only shows up now as untracked
+            existed = after.entries.get(path, ('',))[0] != '??'
+
+        # Existence after the phase
+        if path in after.entries:
+            exists = after.entries[path][1]
+        elif path in committed:
+            exists = committed[path] != 'D'
+        else:
+            exists = os.path.lexists(os.path.join(cwd or '.', path))
+
+        if exists and not existed:
+            added.add(path)
+        elif existed and not exists:
+            deleted.add(path)
+        elif exists:
+            modified.add(path)
+
+    return GitChanges(added, modified, deleted)
@@ -0,0 +1,275 @@
+import os
+import re
+import time
+import logging
+import threading
+
+# Ignore files read in every directory; rules of deeper files take precedence
+IGNORE_FILES = ('.gitignore', '.aiderignore')
+IGNORE_CHECK_INTERVAL = 1.0  # seconds between checks for modified ignore files
+
+# Always ignored, with the lowest precedence (a .gitignore can re-include them)
+DEFAULT_IGNORE_PATTERNS = [
+    '.git*',
+    '.aider*',
+    'node_modules',
+    '__pycache__',
+    '*.pyc',
+    '*.pyo',
+    '*.pyd',
+    '.DS_Store',
+    'Thumbs.db'
+]
+
+
+def _translate(pattern):
+    """Translate a gitignore glob (without its !, leading / or trailing /) to a regex."""
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if c == '*':
+            if pattern.startswith('**', i) and (i == 0 or pattern[i - 1] == '/'):
+                if i + 2 == n:
+                    parts.append('.*')  # trailing /**: everything inside
+                    i += 2
+                    continue
+                if pattern[i + 2] == '/':
+                    parts.append('(?:.*/)?')  # **/: zero or more directories
+                    i += 3
+                    continue
+            while i < n and pattern[i] == '*':
+                i += 1
+            parts.append('[^/]*')
+            continue
+        if c == '?':
+            parts.append('[^/]')
+        elif c == '[':
+            end = pattern.find(']', i + 2 if pattern[i + 1:i + 2] in ('!', '^') else i + 1)
+            if end == -1:
+                parts.append(re.escape(c))
+            else:
+                content = pattern[i + 1:end]
+                if content.startswith(('!', '^')):
+                    content = '^' + content[1:]
+                parts.append(f'[{content}]')
+                i = end
+        elif c == '\\' and i + 1 < n:
+            i += 1
+            parts.append(re.escape(pattern[i]))
+        else:
+            parts.append(re.escape(c))
+        i += 1
+    return ''.join(parts)
+
+
+def parse_rule(line):
+    """
+    Parse one line of an ignore file.
+
+    Args:
+        line (str): Line as read from the file
+
+    Returns:
+        tuple: (regex, negate, dir_only), or None for blank lines and comments
+    """
+    line = line.rstrip('\n\r')
+    if line.endswith(' ') and not line.endswith('\\ '):
+        line = line.rstrip(' ')
+    if not line or line.startswith('#'):
+        return None
+
+    negate = line.startswith('!')
+    if negate or line.startswith('\\!') or line.startswith('\\#'):
+        line = line[1:]
+    dir_only = line.endswith('/')
+    line = line.rstrip('/')
+    if not line:
+        return None
+
+    # A slash anywhere but at the end anchors the rule to its ignore file's directory
+    anchored = '/' in line
+    line = line.lstrip('/')
+    regex = _translate(line)
+    if not anchored:
+        regex = '(?:.*/)?' + regex
+    return regex, negate, dir_only
+
+
+class _RuleSet:
+    """Rules of one directory compiled into two alternations (files and directories).
+
+    Alternatives are listed from the last rule to the first, so the matching
+    group is the rule gitignore gives precedence to.
+    """
+
+    def __init__(self, rules):
+        self._file = self._compile([rule for rule in rules if not rule[2]])
+        self._dir = self._compile(rules)
+
+    @staticmethod
+    def _compile(rules):
+        if not rules:
+            return None
+        rules = rules[::-1]
+        regex = re.compile('|'.join(f'({rule[0]})' for rule in rules), re.DOTALL)
+        return regex, [rule[1] for rule in rules]
+
+    def match(self, rel_path, is_dir):
+        """Return True (ignored), False (re-included) or None (no rule matches)."""
+        compiled = self._dir if is_dir else self._file
+        if compiled is None:
+            return None
+        regex, negations = compiled
+        match = regex.fullmatch(rel_path)
+        if not match:
+            return None
+        return not negations[match.lastindex - 1]
+
+
+class IgnoreMatcher:
+    """gitignore-compatible matcher for a project tree.
+
+    Supports negation, anchored and directory-only rules, ** wildcards and
+    nested .gitignore/.aiderignore files. Each directory's rules are compiled
+    once into a single regex and recompiled only when one of its ignore files
+    changes; whether a directory is ignored is cached, so checking a path costs
+    one regex match per directory level that has rules.
+
+    Attributes:
+        root (str): Absolute path of the project
+        generation (int): Incremented whenever ignore rules are reloaded
+    """
+
+    def __init__(self, root='.', default_patterns=DEFAULT_IGNORE_PATTERNS):
+        self.root = os.path.abspath(root)
+        self.logger = logging.getLogger('KinOS')
+        self.generation = 0
+        self._defaults = [rule for rule in map(parse_rule, default_patterns) if rule]
+        self._rulesets = {}  # relative dir -> (ignore files signature, _RuleSet or None)
+        self._ignored_dirs = {}  # relative dir -> bool
+        self._checked_at = time.time()
+        self._lock = threading.RLock()
+
+    def _signature(self, rel_dir):
+        signature = []
+        for name in IGNORE_FILES:
+            try:
+                stat = os.stat(os.path.join(self.root, rel_dir, name))
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def _ruleset(self, rel_dir):
+        cached = self._rulesets.get(rel_dir)
+        if cached is not None:
+            return cached[1]
+
+        signature = self._signature(rel_dir)
+        rules = list(self._defaults) if rel_dir == '' else []
+        for name, stat in zip(IGNORE_FILES, signature):
+            if stat is None:
+                continue
+            path = os.path.join(self.root, rel_dir, name)
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    rules.extend(rule for rule in map(parse_rule, f) if rule)
+            except (OSError, UnicodeDecodeError) as e:
+                self.logger.warning(f"⚠️ Could not read {path}: {str(e)}")
+        ruleset = _RuleSet(rules) if rules else None
+        self._rulesets[rel_dir] = (signature, ruleset)
+        return ruleset
+
+    def refresh(self, force=False):
+        """
+        Drop the compiled rules of directories whose ignore files changed.
+
+        Args:
+            force (bool): Check now instead of at most every IGNORE_CHECK_INTERVAL
+        """
+        with self._lock:
+            if not force and time.time() - self._checked_at < IGNORE_CHECK_INTERVAL:
+                return
+            self._checked_at = time.time()
+            stale = [d for d, (signature, _) in self._rulesets.items() if self._signature(d) != signature]
+            if stale:
+                for rel_dir in stale:
+                    del self._rulesets[rel_dir]
+                self._ignored_dirs.clear()
+                self.generation += 1
+                self.logger.debug(f"🙈 Ignore rules reloaded for {len(stale)} directories")
+
+    def _normalize(self, path):
+        path = path.replace('\\', '/')
+        if os.path.isabs(path):
+            path = os.path.relpath(path, self.root).replace('\\', '/')
+        path = os.path.normpath(path).replace('\\', '/')
+        return '' if path == '.' else path
+
+    def _match(self, rel_path, is_dir):
+        """Apply the rules of the path's directories, deepest first."""
+        parent = rel_path.rsplit('/', 1)[0] if '/' in rel_path else ''
+        while True:
+            ruleset = self._ruleset(parent)
+            if ruleset:
+                result = ruleset.match(rel_path[len(parent) + 1:] if parent else rel_path, is_dir)
+                if result is not None:
+                    return result
+            if not parent:
+                return False
+            parent = parent.rsplit('/', 1)[0] if '/' in parent else ''
+
+    def _is_dir_ignored(self, rel_dir):
+        ignored = self._ignored_dirs.get(rel_dir)
+        if ignored is None:
+            parent = rel_dir.rsplit('/', 1)[0] if '/' in rel_dir else ''
+            ignored = (bool(parent) and self._is_dir_ignored(parent)) or self._match(rel_dir, True)
+            self._ignored_dirs[rel_dir] = ignored
+        return ignored
+
+    def is_ignored(self, path, is_dir=None):
+        """
+        Check whether a path is ignored.
+
+        A path is ignored when a rule matches it or one of its parent
+        directories; as in git, files below an ignored directory cannot be
+        re-included.
+
+        Args:
+            path (str): Path relative to the project root (./ allowed) or absolute
+            is_dir (bool, optional): Whether the path is a directory; checked
+                on disk when omitted
+
+        Returns:
+            bool: True if the path is ignored
+        """
+        rel_path = self._normalize(path)
+        if not rel_path or rel_path.startswith('../') or rel_path == '..':
+            return False
+        if is_dir is None:
+            is_dir = os.path.isdir(os.path.join(self.root, rel_path))
+
+        self.refresh()
+        with self._lock:
+            if is_dir:
+                return self._is_dir_ignored(rel_path)
+            parent = rel_path.rsplit('/', 1)[0] if '/' in rel_path else ''
+            if parent and self._is_dir_ignored(parent):
+                return True
+            return self._match(rel_path, False)
+
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+
+def get_ignore_matcher(root='.'):
+    """Return the process-wide IgnoreMatcher of a project root."""
+    root = os.path.abspath(root)
+    with _matchers_lock:
+        matcher = _matchers.get(root)
+        if matcher is None:
+            matcher = IgnoreMatcher(root)
+            _matchers[root] = matcher
+        return matcher
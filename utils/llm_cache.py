@@ -0,0 +1,109 @@
+import os
+import json
+import hashlib
+import threading
+
+# Cache configuration
+LLM_CACHE_DIR = os.path.join('.aider.cache', 'llm')
+LLM_CACHE_ENABLED = os.getenv('LLM_CACHE', 'true').lower() not in ('0', 'false', 'no')
+LLM_CACHE_MAX_BYTES = int(float(os.getenv('LLM_CACHE_MAX_MB', 100)) * 1024 * 1024)
+
+
+def cache_key(**kwargs):
+    """
+    Build the content address of a chat completion request.
+
+    Only the fields that determine the answer are hashed: model, messages,
+    temperature and max_tokens.
+
+    Returns:
+        str: Hex digest identifying the request
+    """
+    request = {
+        'model': kwargs.get('model'),
+        'messages': kwargs.get('messages'),
+        'temperature': kwargs.get('temperature'),
+        'max_tokens': kwargs.get('max_tokens'),
+    }
+    payload = json.dumps(request, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class LLMCache:
+    """Content-addressed on-disk cache of chat completion responses.
+
+    Entries are JSON files named by the request hash. Reads refresh the
+    file's modification time, and when the cache grows past its size cap the
+    least recently used entries are removed.
+
+    Attributes:
+        directory (str): Folder holding the entries
+        max_bytes (int): Size cap of the cache
+    """
+
+    def __init__(self, directory=LLM_CACHE_DIR, max_bytes=LLM_CACHE_MAX_BYTES):
+        self.directory = os.path.abspath(directory)
+        self.max_bytes = max_bytes
+        self._size = None  # Computed on first write
+        self._lock = threading.Lock()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Return the cached response data for a key, or None."""
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            os.utime(path)  # Mark as recently used
+            return data
+        except (OSError, json.JSONDecodeError):
+            return None
+
+    def set(self, key, data):
+        """Store response data under a key and evict old entries if needed."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        content = json.dumps(data, ensure_ascii=False)
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            f.write(content)
+        os.replace(temp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = sum(size for _, _, size in self._entries())
+            else:
+                self._size += len(content.encode('utf-8'))
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        """List (mtime, path, size) of every entry."""
+        entries = []
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, path, stat.st_size))
+        return entries
+
+    def _evict(self):
+        """Remove least recently used entries until the cache is under 90% of its cap."""
+        entries = sorted(self._entries())
+        self._size = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        for _, path, size in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+                self._size -= size
+            except OSError:
+                pass
@@ -0,0 +1,468 @@
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+from collections import deque, defaultdict
+import httpx
+import openai
+from dotenv import load_dotenv
+from utils.rate_limiter import get_rate_limiter, estimate_tokens, get_retry_after
+from utils.runtime_metrics import get_runtime_metrics
+from utils.llm_cache import LLMCache, LLM_CACHE_ENABLED, cache_key
+from utils.model_router import (
+    resolve_model, get_provider, OLLAMA, OLLAMA_API_BASE,
+    PLANNING, FILE_SELECTION, SUMMARIZATION, AGENT_GENERATION
+)
+from openai.types.chat import ChatCompletion
+
+load_dotenv()
+
+# Transport configuration
+LLM_TIMEOUT = float(os.getenv('LLM_TIMEOUT', 120))  # seconds per request
+LLM_CONNECT_TIMEOUT = 10  # seconds to establish a connection
+POOL_MAX_CONNECTIONS = 64
+POOL_MAX_KEEPALIVE = 32
+
+# Calls in flight at once per model (LLM_MAX_CONCURRENCY overrides the default)
+MODEL_CONCURRENCY = {
+    'gpt-4o-mini': 16,
+    'gpt-4o': 8,
+    'ollama_chat/': 2,  # a local server runs few generations at once
+    'ollama/': 2,
+}
+DEFAULT_CONCURRENCY = 8
+
+# Retries of transient failures (429, 5xx, timeouts, dropped connections)
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 3))
+RETRY_BASE_DELAY = 1.0  # seconds
+RETRY_MAX_DELAY = 30.0  # seconds
+
+# Time budget of a whole call, retries included, per call class
+CALL_DEADLINES = {
+    PLANNING: 120,
+    FILE_SELECTION: 45,
+    SUMMARIZATION: 30,
+    AGENT_GENERATION: 240,
+}
+
+# Hedging: when a call runs longer than the model's recent p95 latency, a
+# duplicate is sent and the first answer wins (LLM_HEDGING=false disables)
+LLM_HEDGING = os.getenv('LLM_HEDGING', 'true').lower() not in ('0', 'false', 'no')
+HEDGE_QUANTILE = 0.95
+HEDGE_MIN_SAMPLES = 20  # latencies observed before hedging starts
+HEDGE_MIN_DELAY = 2.0  # seconds
+LATENCY_WINDOW = 200  # latencies kept per model
+
+# Circuit breaker: after this many consecutive failures a provider is given a
+# rest, calls wait for it (or fail fast if their deadline is shorter)
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_OPEN_SECONDS = 30
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+
+def get_model_concurrency(model):
+    """Return the number of concurrent calls allowed for a model."""
+    limit = DEFAULT_CONCURRENCY
+    for prefix, value in sorted(MODEL_CONCURRENCY.items(), key=lambda item: -len(item[0])):
+        if model and model.startswith(prefix):
+            limit = value
+            break
+    return int(os.getenv('LLM_MAX_CONCURRENCY', limit))
+
+
+def _retry_delay(attempt, error):
+    """Delay before a retry: the provider's Retry-After, else full-jitter backoff."""
+    retry_after = get_retry_after(error)
+    if retry_after is not None:
+        return retry_after
+    return random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * (2 ** attempt)))
+
+
+class LLMDeadlineExceeded(TimeoutError):
+    """Raised when a call does not complete within its call class deadline."""
+
+
+class LLMUnavailableError(RuntimeError):
+    """Raised when a provider's circuit is open for longer than the call can wait."""
+
+
+def get_call_deadline(call_class):
+    """Return the deadline in seconds of a call class."""
+    return CALL_DEADLINES.get(call_class, LLM_TIMEOUT)
+
+
+def _call_status(error):
+    """Map an API error to the status recorded in the runtime metrics."""
+    if isinstance(error, LLMDeadlineExceeded):
+        return 'server_error'
+    if isinstance(error, openai.RateLimitError):
+        return 'throttled'
+    if isinstance(error, openai.APIStatusError) and error.status_code < 500:
+        return 'error'
+    if isinstance(error, (openai.APIStatusError, openai.APITimeoutError, openai.APIConnectionError)):
+        return 'server_error'
+    return 'error'
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker of one provider.
+
+    Server errors, timeouts and missed deadlines count as failures; rate
+    limiting does not (the rate limiter handles it). Once open, the circuit
+    lets calls through again after CIRCUIT_OPEN_SECONDS, and the next success
+    closes it.
+    """
+
+    def __init__(self, name, logger, threshold=CIRCUIT_FAILURE_THRESHOLD, cooldown=CIRCUIT_OPEN_SECONDS):
+        self.name = name
+        self.logger = logger
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self._failures = 0
+        self._opened_at = None
+        self._lock = threading.Lock()
+
+    def retry_in(self):
+        """Seconds until calls may go through, 0 when the circuit is closed or half-open."""
+        with self._lock:
+            if self._opened_at is None:
+                return 0
+            return max(0.0, self._opened_at + self.cooldown - time.monotonic())
+
+    def record_success(self):
+        with self._lock:
+            if self._opened_at is not None:
+                self.logger.info(f"✅ LLM provider {self.name} recovered, circuit closed")
+            self._failures = 0
+            self._opened_at = None
+
+    def record_failure(self, error):
+        if _call_status(error) != 'server_error':
+            return
+        with self._lock:
+            self._failures += 1
+            if self._failures < self.threshold:
+                return
+            if self._opened_at is None:
+                self.logger.warning(
+                    f"⚡ LLM provider {self.name} failing ({self._failures} errors in a row), "
+                    f"pausing calls for {self.cooldown}s"
+                )
+                get_runtime_metrics().increment('llm_circuit_opened')
+            self._opened_at = time.monotonic()
+
+
+class LLMGateway:
+    """Process-wide entry point for chat completions.
+
+    All managers share one pooled HTTP transport, so connections and TLS
+    sessions are reused across calls. Each call goes through the model's rate
+    limiter and a per-model concurrency limit, transient failures are retried
+    with jittered exponential backoff, and every attempt is recorded in the
+    runtime metrics.
+
+    Calls are async only, so waiting for quota, a circuit or a retry never
+    blocks the event loop; code without a running loop uses asyncio.run().
+    httpx clients cannot be shared across event loops, so the pooled clients
+    are recreated when the loop changes.
+
+    Deterministic call sites can pass cache=True to serve repeated requests
+    from the on-disk LLMCache under .aider.cache/.
+
+    Callers pass a call_class (see utils.model_router) so that each kind of
+    call runs on its configured model tier; ollama_chat/ models are sent to
+    the local Ollama server's OpenAI-compatible endpoint.
+
+    Each call class has a deadline covering all its retries. Calls
+    still running after the model's p95 latency are hedged with a duplicate
+    request, and a per-provider circuit breaker pauses calls to a provider
+    that keeps failing. Hedges, wins and trips are counted in the runtime
+    metrics (see stats()).
+    """
+
+    def __init__(self):
+        self._async_clients = {}  # provider -> client, for the current loop
+        self._async_loop = None
+        self._async_semaphores = {}
+        self._lock = threading.Lock()
+        self._cache = None
+        self._latencies = defaultdict(lambda: deque(maxlen=LATENCY_WINDOW))  # (model, call class) -> seconds
+        self._breakers = {}
+        self.logger = logging.getLogger('KinOS')
+
+    def _timeout(self):
+        return httpx.Timeout(LLM_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+
+    def _limits(self):
+        return httpx.Limits(
+            max_connections=POOL_MAX_CONNECTIONS,
+            max_keepalive_connections=POOL_MAX_KEEPALIVE
+        )
+
+    def _client_options(self, provider):
+        if provider == OLLAMA:
+            # Ollama ignores the key but the client requires one
+            return {'base_url': OLLAMA_API_BASE, 'api_key': 'ollama'}
+        return {}
+
+    def _get_async_client(self, provider):
+        """Return the pooled async client of a provider for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._async_loop is not loop:
+            # asyncio.run() creates a new loop; transports and semaphores are per loop
+            self._async_clients = {}
+            self._async_loop = loop
+            self._async_semaphores = {}
+        client = self._async_clients.get(provider)
+        if client is None:
+            client = openai.AsyncOpenAI(
+                http_client=httpx.AsyncClient(timeout=self._timeout(), limits=self._limits()),
+                timeout=self._timeout(),
+                max_retries=0,  # Retries are handled here
+                **self._client_options(provider)
+            )
+            self._async_clients[provider] = client
+        return client
+
+    def _get_async_semaphore(self, model):
+        semaphore = self._async_semaphores.get(model)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(get_model_concurrency(model))
+            self._async_semaphores[model] = semaphore
+        return semaphore
+
+    def _lookup_cache(self, use_cache, kwargs):
+        """
+        Look a request up in the response cache.
+
+        Returns:
+            tuple: (key, response) - key is None when the request is not
+                cacheable, response is None on a miss
+        """
+        if not (use_cache and LLM_CACHE_ENABLED) or kwargs.get('stream'):
+            return None, None
+        with self._lock:
+            if self._cache is None:
+                self._cache = LLMCache()
+        key = cache_key(**kwargs)
+        data = self._cache.get(key)
+        if data is None:
+            return key, None
+        self.logger.debug(f"💾 LLM cache hit for {kwargs.get('model')} ({key[:12]})")
+        return key, ChatCompletion.model_validate(data)
+
+    def _store_cache(self, key, response):
+        if key is None:
+            return
+        try:
+            self._cache.set(key, response.model_dump(mode='json'))
+        except OSError as e:
+            self.logger.warning(f"⚠️ Could not write LLM cache entry: {str(e)}")
+
+    def _get_breaker(self, provider):
+        with self._lock:
+            breaker = self._breakers.get(provider)
+            if breaker is None:
+                breaker = CircuitBreaker(provider, self.logger)
+                self._breakers[provider] = breaker
+            return breaker
+
+    def _circuit_wait(self, breaker, deadline):
+        """
+        Return how long to wait for a provider's circuit to let calls through.
+
+        Raises:
+            LLMUnavailableError: If the circuit stays open past the deadline
+        """
+        wait = breaker.retry_in()
+        if wait > 0 and time.monotonic() + wait >= deadline:
+            get_runtime_metrics().increment('llm_short_circuited')
+            raise LLMUnavailableError(f"LLM provider {breaker.name} is unavailable (circuit open for {wait:.0f}s)")
+        return wait
+
+    def _hedge_delay(self, model, call_class):
+        """Delay after which a call is hedged: the recent p95 latency of its model and call class, or None."""
+        latencies = self._latencies[(model, call_class)]
+        if not LLM_HEDGING or len(latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        ordered = sorted(latencies)
+        return max(HEDGE_MIN_DELAY, ordered[int(HEDGE_QUANTILE * (len(ordered) - 1))])
+
+    async def _hedged_create(self, client, request, limiter, estimated_tokens, timeout, hedge_delay):
+        """
+        Send a request, duplicating it once if it is still running after hedge_delay.
+
+        The first successful answer wins and the other request is cancelled.
+        The hedge's quota reservation is given back when it is not the request
+        reconciled by the caller (the one reservation made before calling).
+
+        Raises:
+            LLMDeadlineExceeded: If no answer arrives within timeout
+            openai.APIError: If every request sent failed
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        hedge_at = loop.time() + hedge_delay if hedge_delay and hedge_delay < timeout else None
+        first = asyncio.create_task(client.chat.completions.create(**request))
+        pending = {first}
+        hedges = 0
+        error = None
+        try:
+            while pending:
+                wake_at = min(deadline, hedge_at) if hedge_at else deadline
+                done, pending = await asyncio.wait(
+                    pending, timeout=max(0.0, wake_at - loop.time()), return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is None:
+                        if task is not first:
+                            get_runtime_metrics().increment('llm_hedge_won')
+                        return task.result()
+                    error = error or task.exception()
+                if done:
+                    continue
+                if loop.time() >= deadline:
+                    raise LLMDeadlineExceeded(f"No LLM answer within the remaining {timeout:.1f}s of the deadline")
+                # Hedge point reached; only hedge if the quota has room right now
+                hedge_at = None
+                if limiter.reserve(estimated_tokens) == 0:
+                    hedges += 1
+                    get_runtime_metrics().increment('llm_hedged')
+                    self.logger.debug(f"🪃 Hedging slow {request['model']} call after {hedge_delay:.1f}s")
+                    pending.add(asyncio.create_task(client.chat.completions.create(**request)))
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+            if hedges:
+                # Only one reservation is reconciled with the real usage
+                limiter.release(estimated_tokens, requests=hedges)
+
+    def stats(self):
+        """
+        Return the gateway counters.
+
+        Returns:
+            dict: llm_hedged, llm_hedge_won, llm_deadline_exceeded,
+                llm_circuit_opened and llm_short_circuited counts
+        """
+        counters = get_runtime_metrics().counters()
+        names = ('llm_hedged', 'llm_hedge_won', 'llm_deadline_exceeded', 'llm_circuit_opened', 'llm_short_circuited')
+        return {name: counters.get(name, 0) for name in names}
+
+    def _record_success(self, limiter, estimated_tokens, response, start_time, stream, model, call_class):
+        metrics = get_runtime_metrics()
+        latency = time.time() - start_time
+        metrics.record_llm_call(latency)
+        if not stream:
+            self._latencies[(model, call_class)].append(latency)
+        usage = None if stream else getattr(response, 'usage', None)
+        limiter.record_usage(estimated_tokens, usage.total_tokens if usage else None)
+        if usage:
+            # Prompt prefixes seen recently are billed as cached tokens
+            details = getattr(usage, 'prompt_tokens_details', None)
+            cached_tokens = getattr(details, 'cached_tokens', None) or 0
+            metrics.record_prompt_tokens(usage.prompt_tokens, cached_tokens)
+            self.logger.debug(
+                f"💾 {response.model}: {cached_tokens}/{usage.prompt_tokens} prompt tokens cached"
+            )
+
+    def _record_failure(self, limiter, breaker, error, start_time, attempt, deadline):
+        """Record a failed attempt and return whether it should be retried."""
+        metrics = get_runtime_metrics()
+        metrics.record_llm_call(time.time() - start_time, _call_status(error))
+        breaker.record_failure(error)
+        if isinstance(error, LLMDeadlineExceeded):
+            metrics.increment('llm_deadline_exceeded')
+        if isinstance(error, openai.RateLimitError):
+            limiter.report_throttled(get_retry_after(error))
+        retry = (isinstance(error, RETRYABLE_ERRORS) and attempt < LLM_MAX_RETRIES
+                 and time.monotonic() < deadline)
+        if retry:
+            self.logger.warning(f"⚠️ LLM call failed ({type(error).__name__}), retrying: {str(error)}")
+        return retry
+
+    async def chat_completion(self, cache=False, call_class=None, **kwargs):
+        """
+        Create a chat completion.
+
+        Args:
+            cache (bool): Serve and store the response in the on-disk cache
+            call_class (str, optional): Call class selecting the model tier
+            **kwargs: Arguments of openai chat.completions.create (messages is
+                required; model defaults to the tier's model; stream=True
+                returns the stream)
+
+        Returns:
+            ChatCompletion: The API response (or an async stream)
+
+        Raises:
+            openai.APIError: If the call fails after all retries
+            LLMDeadlineExceeded: If the call class deadline passes
+            LLMUnavailableError: If the provider's circuit is open
+        """
+        kwargs['model'] = model = resolve_model(call_class, kwargs.get('model'))
+        # Cache reads and writes are file I/O: keep them off the event loop
+        key, cached = await asyncio.to_thread(self._lookup_cache, cache, kwargs) if cache else (None, None)
+        if cached is not None:
+            return cached
+
+        stream = kwargs.get('stream', False)
+        limiter = get_rate_limiter(model)
+        estimated_tokens = estimate_tokens(kwargs['messages'], kwargs.get('max_tokens'))
+        provider, provider_model = get_provider(model)
+        client = self._get_async_client(provider)
+        semaphore = self._get_async_semaphore(model)
+        breaker = self._get_breaker(provider)
+        request = {**kwargs, 'model': provider_model}
+        deadline = time.monotonic() + get_call_deadline(call_class)
+
+        attempt = 0
+        while True:
+            wait = self._circuit_wait(breaker, deadline)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            await limiter.acquire(estimated_tokens)
+            async with semaphore:
+                start_time = time.time()
+                try:
+                    timeout = deadline - time.monotonic()
+                    if timeout <= 0:
+                        raise LLMDeadlineExceeded(f"LLM call exceeded its {get_call_deadline(call_class)}s deadline")
+                    hedge_delay = None if stream else self._hedge_delay(model, call_class)
+                    response = await self._hedged_create(
+                        client, request, limiter, estimated_tokens, timeout, hedge_delay
+                    )
+                except (openai.APIError, LLMDeadlineExceeded) as e:
+                    if not self._record_failure(limiter, breaker, e, start_time, attempt, deadline):
+                        raise
+                    error = e
+                else:
+                    breaker.record_success()
+                    self._record_success(limiter, estimated_tokens, response, start_time, stream, model, call_class)
+                    if key is not None:
+                        await asyncio.to_thread(self._store_cache, key, response)
+                    return response
+            await asyncio.sleep(min(_retry_delay(attempt, error), max(0.0, deadline - time.monotonic())))
+            attempt += 1
+
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+def get_llm_gateway():
+    """Return the process-wide LLMGateway instance."""
+    global _gateway
+    with _gateway_lock:
+        if _gateway is None:
+            _gateway = LLMGateway()
+        return _gateway
@@ -1,8 +1,17 @@
 import os
+import asyncio
 import logging
 from colorama import init, Fore, Style
 import openai
 from dotenv import load_dotenv
+from utils.llm_gateway import get_llm_gateway
+from utils.model_router import SUMMARIZATION
+from utils.prompt_budget import PromptBudget, KEEP_ENDS, MISSION_TOKEN_BUDGET
+
+# Size of suivi.md, in characters, above which it is summarized
+LOG_SUMMARY_THRESHOLD = 25000
+# Tokens of suivi.md sent for summarization (older summary + most recent entries)
+LOG_SUMMARY_TOKEN_BUDGET = 12000
 
 # Add SUCCESS level between INFO and WARNING
 logging.SUCCESS = 25  # Between INFO(20) and WARNING(30)
@@ -13,6 +22,8 @@ class Logger:
     
     # Class variable for global log level
     _global_level = logging.SUCCESS
+    # Log summary running in the background, shared by all instances
+    _summary_task = None
     
     def __init__(self, model=None):
         """Initialize the logger with mission context."""
@@ -202,72 +213,125 @@ class Logger:
             return ""
 
     def _check_and_summarize_logs(self):
-        """Check log file size and summarize if needed with mission context."""
+        """Start summarizing the log file once it grows past LOG_SUMMARY_THRESHOLD.
+
+        The summary needs an LLM call, so it never runs on the caller's stack:
+        inside an event loop it is scheduled as a task, otherwise it runs in a
+        loop of its own. Only one summary runs at a time.
+        """
         try:
-            if not os.path.exists(self.suivi_file):
+            # Size in bytes is an upper bound of the length in characters
+            if os.path.getsize(self.suivi_file) <= LOG_SUMMARY_THRESHOLD:
                 return
+        except OSError:
+            return
 
-            # First close the current handler
-            for handler in self.logger.handlers[:]:
-                if isinstance(handler, logging.FileHandler) and handler.baseFilename == os.path.abspath(self.suivi_file):
-                    handler.close()
-                    self.logger.removeHandler(handler)
-            
-            # Try different encodings to read the file
-            content = None
-            encodings = ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+        task = Logger._summary_task
+        if task is not None and not task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            asyncio.run(self._summarize_logs())
+            return
+        Logger._summary_task = loop.create_task(self._summarize_logs())
+
+    def _read_log_file(self):
+        """
+        Read the log file, trying several encodings.
+
+        Returns:
+            tuple: (size in bytes, content)
+
+        Raises:
+            ValueError: If no supported encoding can decode the file
+        """
+        with open(self.suivi_file, 'rb') as f:
+            raw = f.read()
+        for encoding in ['utf-8', 'latin-1', 'cp1252', 'iso-8859-1']:
+            try:
+                content = raw.decode(encoding)
+                self.logger.debug(f"Successfully read file with {encoding} encoding")
+                return len(raw), content
+            except UnicodeDecodeError:
+                continue
+        raise ValueError(f"Could not read {self.suivi_file} with any supported encoding")
+
+    def _replace_log_file(self, summarized_size, summary_content):
+        """Replace the summarized part of the log file, keeping the entries logged since it was read."""
+        # First close the current handler
+        for handler in self.logger.handlers[:]:
+            if isinstance(handler, logging.FileHandler) and handler.baseFilename == os.path.abspath(self.suivi_file):
+                handler.close()
+                self.logger.removeHandler(handler)
+        try:
+            with open(self.suivi_file, 'rb') as f:
+                f.seek(summarized_size)
+                newer = f.read().decode('utf-8', errors='replace')
+            # Write new summary with utf-8 encoding
+            with open(self.suivi_file, 'w', encoding='utf-8') as f:
+                f.write(summary_content + newer)
+        finally:
+            # Re-add the file handler
+            file_handler = logging.FileHandler(self.suivi_file, encoding='utf-8', mode='a')
+            file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s',
+                                             datefmt='%Y-%m-%d %H:%M:%S')
+            file_handler.setFormatter(file_formatter)
+            file_handler.setLevel(logging.SUCCESS)
+            self.logger.addHandler(file_handler)
+
+    async def _summarize_logs(self):
+        """Summarize the log file with mission context."""
+        try:
+            size, content = await asyncio.to_thread(self._read_log_file)
+            if len(content) <= LOG_SUMMARY_THRESHOLD:
+                return
+
+            # Format multi-line commit messages with proper indentation
+            formatted_lines = []
+            current_entry = []
             
-            for encoding in encodings:
-                try:
-                    with open(self.suivi_file, 'r', encoding=encoding) as f:
-                        content = f.read()
-                    self.logger.debug(f"Successfully read file with {encoding} encoding")
-                    break
-                except UnicodeDecodeError:
-                    continue
-                    
-            if content is None:
-                raise ValueError(f"Could not read {self.suivi_file} with any supported encoding")
-                
-            if len(content) > 25000:
-                # Format multi-line commit messages with proper indentation
-                formatted_lines = []
-                current_entry = []
-                
-                for line in content.split('\n'):
-                    if line.startswith('20'):  # New timestamp entry
-                        # Print previous entry if exists
-                        if current_entry:
-                            formatted_lines.extend(current_entry)
-                            formatted_lines.append('')  # Add blank line between entries
-                            current_entry = []
-                        current_entry.append(line)
-                    elif line.strip():  # Content line (part of commit message)
-                        # Indent continuation lines
-                        current_entry.append('    ' + line.strip())
-                    else:  # Empty line
-                        if current_entry:
-                            formatted_lines.extend(current_entry)
-                            formatted_lines.append('')  # Add blank line between entries
-                            current_entry = []
-                        formatted_lines.append('')  # Preserve empty lines
-
-                # Add any remaining entry
-                if current_entry:
-                    formatted_lines.extend(current_entry)
-                    formatted_lines.append('')
-
-                # Join all lines with newlines
-                formatted_content = '\n'.join(formatted_lines)
-
-                # Continue with GPT summarization...
-                self.logger.log(logging.SUCCESS, "📝 Generating mission tracking...")
-                
-                client = openai.OpenAI()
-                response = client.chat.completions.create(
-                    model=self.model,
-                    messages=[
-                        {"role": "system", "content": """You are an expert project progress analyst.
+            for line in content.split('\n'):
+                if line.startswith('20'):  # New timestamp entry
+                    # Print previous entry if exists
+                    if current_entry:
+                        formatted_lines.extend(current_entry)
+                        formatted_lines.append('')  # Add blank line between entries
+                        current_entry = []
+                    current_entry.append(line)
+                elif line.strip():  # Content line (part of commit message)
+                    # Indent continuation lines
+                    current_entry.append('    ' + line.strip())
+                else:  # Empty line
+                    if current_entry:
+                        formatted_lines.extend(current_entry)
+                        formatted_lines.append('')  # Add blank line between entries
+                        current_entry = []
+                    formatted_lines.append('')  # Preserve empty lines
+
+            # Add any remaining entry
+            if current_entry:
+                formatted_lines.extend(current_entry)
+                formatted_lines.append('')
+
+            # Join all lines with newlines
+            formatted_content = '\n'.join(formatted_lines)
+
+            # Continue with GPT summarization...
+            self.logger.log(logging.SUCCESS, "📝 Generating mission tracking...")
+
+            budget = PromptBudget('log summary', model=self.model,
+                                  total=MISSION_TOKEN_BUDGET + LOG_SUMMARY_TOKEN_BUDGET)
+            budget.add('mission', self.mission_content, max_tokens=MISSION_TOKEN_BUDGET, priority=2)
+            budget.add('logs', formatted_content, max_tokens=LOG_SUMMARY_TOKEN_BUDGET, keep=KEEP_ENDS)
+            sections = budget.build()
+
+            response = await get_llm_gateway().chat_completion(
+                cache=True,
+                call_class=SUMMARIZATION,
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": """You are an expert project progress analyst.
 Your task is to summarize project logs in relation to the mission objectives.
 
 Focus on:
@@ -283,50 +347,32 @@ Format your summary in markdown with clear sections:
 - Technical Changes
 - Coordination Notes
 - Next Steps"""},
-                        {"role": "user", "content": f"""# Project Mission
+                    {"role": "user", "content": f"""# Project Mission
 ````
-{self.mission_content}
+{sections['mission']}
 ````
 
 # Recent Logs to Summarize
 ````
-{formatted_content}
+{sections['logs']}
 ````
 
 # Instructions
 Create a detailed progress summary that shows how recent activities align with mission objectives."""}
-                    ],
-                    temperature=0.3,
-                    max_tokens=4000
-                )
-                
-                summary = response.choices[0].message.content
-                
-                # Add header to summary
-                final_content = "# Résumé des logs précédents\n\n"
-                final_content += summary
-                final_content += "\n\n# Nouveaux logs\n\n"
-                
-                # Write new summary with utf-8 encoding
-                with open(self.suivi_file, 'w', encoding='utf-8') as f:
-                    f.write(final_content)
-                    
-                self.logger.log(logging.SUCCESS, "✨ Mission tracking summarized successfully")
+                ],
+                temperature=0.3,
+                max_tokens=4000
+            )
             
-            # Re-add the file handler
-            file_handler = logging.FileHandler(self.suivi_file, encoding='utf-8', mode='a')
-            file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s',
-                                             datefmt='%Y-%m-%d %H:%M:%S')
-            file_handler.setFormatter(file_formatter)
-            file_handler.setLevel(logging.SUCCESS)
-            self.logger.addHandler(file_handler)
-                
+            summary = response.choices[0].message.content
+
+            # Add header to summary
+            final_content = "# Résumé des logs précédents\n\n"
+            final_content += summary
+            final_content += "\n\n# Nouveaux logs\n\n"
+
+            self._replace_log_file(size, final_content)
+            self.logger.log(logging.SUCCESS, "✨ Mission tracking summarized successfully")
+
         except Exception as e:
             self.logger.error(f"⚠️ Error summarizing mission tracking: {str(e)}")
-            # Make sure we restore the file handler even if there's an error
-            file_handler = logging.FileHandler(self.suivi_file, encoding='utf-8', mode='a')
-            file_formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s',
-                                             datefmt='%Y-%m-%d %H:%M:%S')
-            file_handler.setFormatter(file_formatter)
-            file_handler.setLevel(logging.SUCCESS)
-            self.logger.addHandler(file_handler)
@@ -0,0 +1,59 @@
+import os
+
+# Call classes: every LLM call declares what it is for, so that each class can
+# run on its own model tier
+PLANNING = 'planning'  # objective planning and interactive objective processing
+FILE_SELECTION = 'file_selection'  # picking the files of an objective
+SUMMARIZATION = 'summarization'  # one-line summaries, log and folder summaries
+AGENT_GENERATION = 'agent_generation'  # agent role definitions
+
+DEFAULT_LLM_MODEL = 'gpt-4o-mini'  # used when neither a tier nor --model is set
+
+# Model of each call class; an empty tier follows the model given with --model.
+# Summaries are short and frequent, so they default to the small OpenAI model.
+MODEL_TIERS = {
+    PLANNING: os.getenv('PLANNING_MODEL', ''),
+    FILE_SELECTION: os.getenv('FILE_SELECTION_MODEL', ''),
+    SUMMARIZATION: os.getenv('SUMMARIZATION_MODEL', 'gpt-4o-mini'),
+    AGENT_GENERATION: os.getenv('AGENT_GENERATION_MODEL', ''),
+}
+
+# Local models served by Ollama through its OpenAI-compatible endpoint
+OLLAMA_PREFIXES = ('ollama_chat/', 'ollama/')
+OLLAMA_API_BASE = os.getenv('OLLAMA_API_BASE', 'http://localhost:11434').rstrip('/') + '/v1'
+
+# Providers
+OPENAI = 'openai'
+OLLAMA = 'ollama'
+
+
+def resolve_model(call_class=None, model=None):
+    """
+    Pick the model for a call.
+
+    Args:
+        call_class (str, optional): PLANNING, FILE_SELECTION, SUMMARIZATION or
+            AGENT_GENERATION
+        model (str, optional): Model requested by the caller (usually --model)
+
+    Returns:
+        str: The tier's model if one is configured, else the requested model,
+            else DEFAULT_LLM_MODEL
+    """
+    return MODEL_TIERS.get(call_class) or model or DEFAULT_LLM_MODEL
+
+
+def get_provider(model):
+    """
+    Split a model name into its provider and the name the provider expects.
+
+    Returns:
+        tuple: (provider, model name), e.g. ('ollama', 'llama3.1:8b') for
+            'ollama_chat/llama3.1:8b'
+    """
+    for prefix in OLLAMA_PREFIXES:
+        if model.startswith(prefix):
+            return OLLAMA, model[len(prefix):]
+    if model.startswith('openai/'):
+        return OPENAI, model[len('openai/'):]
+    return OPENAI, model
@@ -0,0 +1,225 @@
+import logging
+import tiktoken
+
+# Context window per model family, used when no total budget is given
+MODEL_CONTEXT_WINDOWS = {
+    'gpt-4o-mini': 128_000,
+    'gpt-4o': 128_000,
+    'gpt-4-turbo': 128_000,
+    'gpt-3.5-turbo': 16_385,
+}
+DEFAULT_CONTEXT_WINDOW = 16_385
+DEFAULT_ENCODING = 'cl100k_base'
+
+# Default budgets of the sections shared by KinOS prompts, in tokens
+PROMPT_TOKEN_BUDGET = 16_000  # all variable sections of one prompt
+MISSION_TOKEN_BUDGET = 6_000
+AGENT_TOKEN_BUDGET = 3_000
+TODOLIST_TOKEN_BUDGET = 3_000
+SUIVI_TOKEN_BUDGET = 2_000
+OBJECTIVE_TOKEN_BUDGET = 2_500  # objective text quoted in follow-up prompts
+FILE_LIST_TOKEN_BUDGET = 6_000
+
+# Truncation strategies: keep the start, the end, or both ends of a section
+KEEP_HEAD = 'head'
+KEEP_TAIL = 'tail'
+KEEP_ENDS = 'ends'
+
+_encodings = {}
+
+
+class _ApproximateEncoding:
+    """Four-characters-per-token stand-in used when tiktoken data is unavailable."""
+
+    def encode(self, text, disallowed_special=()):
+        return [text[i:i + 4] for i in range(0, len(text), 4)]
+
+    def decode(self, tokens):
+        return ''.join(tokens)
+
+
+def get_encoding(model=None):
+    """Return the tiktoken encoding for a model (cached)."""
+    key = model or ''
+    encoding = _encodings.get(key)
+    if encoding is None:
+        try:
+            try:
+                encoding = tiktoken.encoding_for_model((model or '').split('/')[-1])
+            except KeyError:
+                encoding = tiktoken.get_encoding(DEFAULT_ENCODING)
+        except Exception as e:
+            # tiktoken downloads its tables on first use; estimate when offline
+            logging.getLogger('KinOS').debug(f"Could not load tiktoken encoding, estimating tokens: {str(e)}")
+            encoding = _ApproximateEncoding()
+        _encodings[key] = encoding
+    return encoding
+
+
+def count_tokens(text, model=None):
+    """Count the tokens of a text for a model."""
+    if not text:
+        return 0
+    return len(get_encoding(model).encode(text, disallowed_special=()))
+
+
+def get_context_window(model):
+    """Return the context window of a model in tokens."""
+    for prefix, window in sorted(MODEL_CONTEXT_WINDOWS.items(), key=lambda item: -len(item[0])):
+        if model and model.split('/')[-1].startswith(prefix):
+            return window
+    return DEFAULT_CONTEXT_WINDOW
+
+
+def truncate_to_tokens(text, max_tokens, model=None, keep=KEEP_HEAD):
+    """
+    Shorten a text to a token budget on line boundaries.
+
+    Args:
+        text (str): Text to shorten
+        max_tokens (int): Token budget
+        model (str, optional): Model whose tokenizer is used
+        keep (str): KEEP_HEAD, KEEP_TAIL or KEEP_ENDS
+
+    Returns:
+        str: Text within budget, with a marker where lines were dropped;
+            empty when the budget cannot even hold the marker
+    """
+    if count_tokens(text, model) <= max_tokens:
+        return text
+
+    lines = text.splitlines()
+    costs = [count_tokens(line, model) + 1 for line in lines]
+    budget = max(0, max_tokens - 12)  # Room for the truncation marker
+    if budget == 0:
+        # Not even the marker fits: drop the whole section
+        return ""
+
+    def take(indices, limit):
+        kept, used = [], 0
+        for i in indices:
+            if used + costs[i] > limit:
+                break
+            kept.append(i)
+            used += costs[i]
+        return kept
+
+    if keep == KEEP_TAIL:
+        kept = sorted(take(range(len(lines) - 1, -1, -1), budget))
+    elif keep == KEEP_ENDS:
+        head = take(range(len(lines)), budget // 2)
+        tail = take(range(len(lines) - 1, head[-1] if head else -1, -1), budget - budget // 2)
+        kept = head + sorted(tail)
+    else:
+        kept = take(range(len(lines)), budget)
+
+    if not kept:
+        # A single huge line: cut inside it
+        encoding = get_encoding(model)
+        tokens = encoding.encode(text, disallowed_special=())
+        part = tokens[-budget:] if keep == KEEP_TAIL else tokens[:budget]
+        dropped = len(tokens) - len(part)
+        return encoding.decode(part) + (f"\n[... {dropped} tokens truncated]" if dropped else "")
+
+    result, previous = [], -1
+    for i in kept:
+        if i != previous + 1:
+            result.append(f"[... {i - previous - 1} lines truncated]")
+        result.append(lines[i])
+        previous = i
+    if previous != len(lines) - 1:
+        result.append(f"[... {len(lines) - previous - 1} lines truncated]")
+    return '\n'.join(result)
+
+
+class PromptBudget:
+    """Fit the variable sections of a prompt into token budgets.
+
+    Each section gets its own budget and truncation strategy. If the sections
+    still exceed the total budget, the lowest priority ones are shrunk first.
+    The resulting breakdown is logged for every prompt.
+
+    Example:
+        budget = PromptBudget('objective', model=self.model, total=12000)
+        budget.add('mission', mission_content, max_tokens=4000, priority=3)
+        budget.add('suivi', suivi_content, max_tokens=2000, keep=KEEP_TAIL)
+        sections = budget.build()
+
+    Attributes:
+        label (str): Name of the prompt in the logs
+        model (str): Model whose tokenizer is used
+        total (int): Budget for all sections together
+    """
+
+    def __init__(self, label, model=None, total=None, reserved=0, logger=None):
+        """
+        Args:
+            label (str): Name of the prompt in the logs
+            model (str, optional): Model whose tokenizer is used
+            total (int, optional): Budget for all sections (defaults to half
+                the model's context window)
+            reserved (int): Tokens used by the fixed template and the answer,
+                subtracted from the total
+            logger (Logger, optional): Defaults to the KinOS logger
+        """
+        self.label = label
+        self.model = model
+        self.total = (total or get_context_window(model) // 2) - reserved
+        self.logger = logger or logging.getLogger('KinOS')
+        self._sections = []
+
+    def add(self, name, text, max_tokens=None, keep=KEEP_HEAD, priority=1):
+        """
+        Register a section.
+
+        Args:
+            name (str): Section key in the build() result
+            text (str): Section content
+            max_tokens (int, optional): Per-section budget
+            keep (str): Truncation strategy (KEEP_HEAD, KEEP_TAIL, KEEP_ENDS)
+            priority (int): Higher priority sections are shrunk last
+        """
+        self._sections.append({
+            'name': name,
+            'text': text or "",
+            'max_tokens': max_tokens,
+            'keep': keep,
+            'priority': priority,
+        })
+        return self
+
+    def build(self):
+        """
+        Apply the budgets and log the token breakdown.
+
+        Returns:
+            dict: Section name -> text fitted to its budget
+        """
+        for section in self._sections:
+            section['original'] = count_tokens(section['text'], self.model)
+            section['tokens'] = section['original']
+            if section['max_tokens'] is not None and section['tokens'] > section['max_tokens']:
+                section['text'] = truncate_to_tokens(section['text'], section['max_tokens'], self.model, section['keep'])
+                section['tokens'] = count_tokens(section['text'], self.model)
+
+        # Shrink low priority sections first until the total fits
+        excess = sum(s['tokens'] for s in self._sections) - self.total
+        for section in sorted(self._sections, key=lambda s: s['priority']):
+            if excess <= 0:
+                break
+            allowed = max(0, section['tokens'] - excess)
+            before = section['tokens']
+            section['text'] = truncate_to_tokens(section['text'], allowed, self.model, section['keep'])
+            section['tokens'] = count_tokens(section['text'], self.model)
+            excess -= before - section['tokens']
+
+        parts = []
+        for s in self._sections:
+            if s['tokens'] < s['original']:
+                parts.append(f"{s['name']} {s['tokens']} (from {s['original']})")
+            else:
+                parts.append(f"{s['name']} {s['tokens']}")
+        total = sum(s['tokens'] for s in self._sections)
+        self.logger.debug(f"📏 {self.label} prompt tokens: {', '.join(parts)} - total {total}/{self.total}")
+
+        return {s['name']: s['text'] for s in self._sections}
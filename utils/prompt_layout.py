@@ -0,0 +1,65 @@
+# Segment tiers, from most to least stable. Providers cache the longest
+# prompt prefix seen before, so content that rarely changes must come first.
+STATIC = 0  # fixed instructions and output formats
+SLOW = 1  # mission, agent definitions, project file list
+VOLATILE = 2  # suivi.md tail, todolist, objective, diagram
+
+
+class PromptLayout:
+    """Ordered segment model for chat prompts.
+
+    Segments are emitted static first, slow-changing next and volatile last
+    (insertion order is kept within a tier), and consecutive text segments of
+    the same role are merged into one message. Prompts shared by several
+    agents then start with an identical prefix the provider can cache.
+
+    Example:
+        layout = PromptLayout()
+        layout.add(STATIC, "system", instructions)
+        layout.add(SLOW, "user", f"Mission\\n{mission}")
+        layout.add(VOLATILE, "user", f"Todolist\\n{todolist}")
+        messages = layout.messages()
+    """
+
+    def __init__(self):
+        self._segments = []
+
+    def add(self, tier, role, content):
+        """
+        Add a segment.
+
+        Args:
+            tier (int): STATIC, SLOW or VOLATILE
+            role (str): Chat role of the segment
+            content (str | list): Text, or content parts (e.g. an image)
+        """
+        if content:
+            self._segments.append((tier, len(self._segments), role, content))
+        return self
+
+    def add_image(self, tier, encoded_png, caption=None):
+        """Add a base64 PNG as a user segment, optionally followed by a caption."""
+        parts = [{
+            "type": "image_url",
+            "image_url": {"url": f"data:image/png;base64,{encoded_png}"}
+        }]
+        if caption:
+            parts.append({"type": "text", "text": caption})
+        return self.add(tier, "user", parts)
+
+    def messages(self):
+        """
+        Build the chat messages.
+
+        Returns:
+            list: Messages ordered from most to least stable
+        """
+        messages = []
+        for _, _, role, content in sorted(self._segments):
+            previous = messages[-1] if messages else None
+            if (previous and previous["role"] == role
+                    and isinstance(content, str) and isinstance(previous["content"], str)):
+                previous["content"] += "\n\n" + content
+            else:
+                messages.append({"role": role, "content": content})
+        return messages
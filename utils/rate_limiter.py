@@ -0,0 +1,237 @@
+import os
+import time
+import random
+import asyncio
+import threading
+
+# Default (requests per minute, tokens per minute) per model family.
+# Conservative values matching entry-level OpenAI tiers; override with
+# LLM_RPM_LIMIT / LLM_TPM_LIMIT when the account has higher quotas.
+MODEL_RATE_LIMITS = {
+    'gpt-4o-mini': (500, 200_000),
+    'gpt-4o': (500, 30_000),
+    'gpt-4-turbo': (500, 30_000),
+    'gpt-3.5-turbo': (3_500, 200_000),
+}
+DEFAULT_RATE_LIMITS = (500, 200_000)
+
+# Backoff applied after a 429 when the provider gives no Retry-After hint
+THROTTLE_BASE_DELAY = 2.0  # seconds
+THROTTLE_MAX_DELAY = 60.0  # seconds
+
+
+class TokenBucket:
+    """Continuously refilled token bucket.
+
+    Attributes:
+        capacity (float): Maximum number of tokens held
+        refill_rate (float): Tokens added per second
+        tokens (float): Tokens currently available
+    """
+
+    def __init__(self, capacity, refill_rate):
+        self.capacity = float(capacity)
+        self.refill_rate = float(refill_rate)
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        """Add the tokens accumulated since the last update."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.refill_rate)
+        self._updated = now
+
+    def time_until(self, amount):
+        """Seconds until amount tokens are available (0 if available now)."""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.tokens >= amount:
+            return 0.0
+        return (amount - self.tokens) / self.refill_rate
+
+    def consume(self, amount):
+        """Remove amount tokens (the balance may go negative to record overuse)."""
+        self._refill()
+        self.tokens -= amount
+
+    def refund(self, amount):
+        """Give back tokens that were reserved but not used."""
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self):
+        """Empty the bucket, e.g. after the provider signalled throttling."""
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+
+class RateLimiter:
+    """Admission controller keyed on requests and tokens per minute for a model.
+
+    Every LLM call reserves one request and its estimated tokens before being
+    sent, and reports its real usage afterwards. A 429 from the provider
+    drains the buckets and pauses admissions for the Retry-After delay (or an
+    exponential backoff), so callers slow down only when the API says so.
+
+    The bucket state is guarded by a threading lock, so limiters shared by
+    several event loops or threads stay consistent; it is only held for the
+    arithmetic, never across a sleep.
+
+    Attributes:
+        model (str): Model the limits apply to
+        requests (TokenBucket): Requests-per-minute bucket
+        tokens (TokenBucket): Tokens-per-minute bucket
+    """
+
+    def __init__(self, model, requests_per_minute, tokens_per_minute):
+        self.model = model
+        self.requests = TokenBucket(requests_per_minute, requests_per_minute / 60.0)
+        self.tokens = TokenBucket(tokens_per_minute, tokens_per_minute / 60.0)
+        self._paused_until = 0.0
+        self._consecutive_throttles = 0
+        self._lock = threading.Lock()
+
+    def _wait_time(self, tokens):
+        """Seconds to wait before one request of the given size fits the quota."""
+        pause = max(0.0, self._paused_until - time.monotonic())
+        return max(pause, self.requests.time_until(1), self.tokens.time_until(tokens))
+
+    async def wait_for_capacity(self, tokens=0):
+        """
+        Wait until the quota has room for a request of the given size.
+
+        Nothing is reserved; use this to decide when to admit new work.
+        """
+        while True:
+            with self._lock:
+                delay = self._wait_time(tokens)
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    async def acquire(self, tokens=0):
+        """
+        Reserve one request and an estimated number of tokens, waiting if needed.
+
+        Args:
+            tokens (int): Estimated prompt + completion tokens for the call
+        """
+        while True:
+            delay = self.reserve(tokens)
+            if delay <= 0:
+                return
+            await asyncio.sleep(delay)
+
+    def reserve(self, tokens=0):
+        """
+        Reserve one request and tokens if the quota has room right now.
+
+        Used by acquire() and by hedged requests, which are only sent when
+        the quota has room.
+
+        Returns:
+            float: 0 if the reservation was made, else seconds to wait
+        """
+        with self._lock:
+            delay = self._wait_time(tokens)
+            if delay <= 0:
+                self.requests.consume(1)
+                self.tokens.consume(tokens)
+                return 0.0
+            return delay
+
+    def release(self, tokens=0, requests=1):
+        """
+        Give back reservations whose requests were cancelled before completing.
+
+        Args:
+            tokens (int): Tokens reserved by each request
+            requests (int): Number of reservations released
+        """
+        with self._lock:
+            self.requests.refund(requests)
+            self.tokens.refund(tokens * requests)
+
+    def record_usage(self, estimated_tokens, actual_tokens):
+        """Correct a reservation with the token count reported by the API."""
+        if actual_tokens is None:
+            return
+        difference = actual_tokens - estimated_tokens
+        with self._lock:
+            if difference > 0:
+                self.tokens.consume(difference)
+            elif difference < 0:
+                self.tokens.refund(-difference)
+            self._consecutive_throttles = 0
+
+    def report_throttled(self, retry_after=None):
+        """
+        Record a 429 response and pause admissions.
+
+        Args:
+            retry_after (float, optional): Delay suggested by the provider
+        """
+        with self._lock:
+            self._consecutive_throttles += 1
+            if retry_after is None:
+                retry_after = min(
+                    THROTTLE_MAX_DELAY,
+                    THROTTLE_BASE_DELAY * (2 ** (self._consecutive_throttles - 1))
+                )
+                retry_after *= random.uniform(0.8, 1.2)
+            self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            self.requests.drain()
+            self.tokens.drain()
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_rate_limits(model):
+    """Return (requests_per_minute, tokens_per_minute) configured for a model."""
+    rpm, tpm = DEFAULT_RATE_LIMITS
+    for prefix, limits in sorted(MODEL_RATE_LIMITS.items(), key=lambda item: -len(item[0])):
+        if model and model.startswith(prefix):
+            rpm, tpm = limits
+            break
+    rpm = int(os.getenv('LLM_RPM_LIMIT', rpm))
+    tpm = int(os.getenv('LLM_TPM_LIMIT', tpm))
+    return rpm, tpm
+
+
+def get_rate_limiter(model):
+    """Return the process-wide RateLimiter for a model."""
+    with _limiters_lock:
+        limiter = _limiters.get(model)
+        if limiter is None:
+            limiter = RateLimiter(model, *get_rate_limits(model))
+            _limiters[model] = limiter
+        return limiter
+
+
+def estimate_tokens(messages, max_tokens=0):
+    """Roughly estimate the tokens a chat completion will use."""
+    chars = 0
+    for message in messages:
+        content = message.get('content', '')
+        if isinstance(content, str):
+            chars += len(content)
+        else:
+            for part in content:
+                if part.get('type') == 'text':
+                    chars += len(part.get('text', ''))
+                else:
+                    chars += 4000  # Images are billed as a fixed-size block
+    return chars // 4 + (max_tokens or 0)
+
+
+def get_retry_after(error):
+    """Extract a Retry-After delay in seconds from an API error, if present."""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    value = headers.get('retry-after')
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
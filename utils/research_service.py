@@ -0,0 +1,217 @@
+import os
+import re
+import json
+import time
+import asyncio
+import hashlib
+import logging
+import threading
+import httpx
+from utils.file_ranker import get_embedder, tokenize
+
+# Perplexity API
+PERPLEXITY_URL = "https://api.perplexity.ai/chat/completions"
+PERPLEXITY_MODEL = "llama-3.1-sonar-small-128k-online"
+RESEARCH_SYSTEM_PROMPT = "You are a helpful research assistant providing accurate, detailed information."
+RESEARCH_TIMEOUT = 30  # seconds per request
+RESEARCH_POOL_CONNECTIONS = 8
+
+# Shared research cache
+RESEARCH_CACHE_PATH = os.path.join('.aider.cache', 'research.json')
+RESEARCH_CACHE_TTL = float(os.getenv('RESEARCH_CACHE_TTL_HOURS', 24)) * 3600  # seconds
+RESEARCH_CACHE_MAX_ENTRIES = 500
+
+# Near-identical queries reuse a cached answer (RESEARCH_SEMANTIC_MATCH=false disables);
+# queries are compared by embeddings when SEMANTIC_RANKING is on, by terms otherwise
+RESEARCH_SEMANTIC_MATCH = os.getenv('RESEARCH_SEMANTIC_MATCH', 'true').lower() not in ('0', 'false', 'no')
+EMBEDDING_SIMILARITY_THRESHOLD = 0.92  # cosine similarity of query embeddings
+TERM_SIMILARITY_THRESHOLD = 0.8  # Jaccard similarity of query terms, without embeddings
+
+
+def normalize_query(query):
+    """Lowercase a query and collapse its whitespace and trailing punctuation."""
+    return re.sub(r'\s+', ' ', query.strip().lower()).rstrip(' ?.!')
+
+
+class ResearchService:
+    """Process-wide Perplexity research client.
+
+    Requests share one pooled async HTTP client per event loop. Identical
+    queries running at the same time share a single request, and answers
+    are kept in a persistent cache under .aider.cache/ for RESEARCH_CACHE_TTL,
+    so agents asking the same (or a near-identical) question reuse the
+    earlier answer instead of paying for a new search.
+    """
+
+    def __init__(self, cache_path=RESEARCH_CACHE_PATH, ttl=RESEARCH_CACHE_TTL):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.logger = logging.getLogger('KinOS')
+        self._client = None
+        self._client_loop = None
+        self._inflight = {}  # cache key -> task fetching it
+        self._entries = None  # cache key -> {'query', 'result', 'time', 'vector'}
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        """Return the pooled client for the running event loop."""
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client_loop is not loop:
+            self._client = httpx.AsyncClient(
+                timeout=RESEARCH_TIMEOUT,
+                limits=httpx.Limits(max_connections=RESEARCH_POOL_CONNECTIONS)
+            )
+            self._client_loop = loop
+            self._inflight = {}
+        return self._client
+
+    def _load_entries(self):
+        if self._entries is None:
+            try:
+                with open(self.cache_path, 'r', encoding='utf-8') as f:
+                    self._entries = json.load(f)
+            except (OSError, json.JSONDecodeError):
+                self._entries = {}
+        now = time.time()
+        self._entries = {k: e for k, e in self._entries.items() if now - e['time'] < self.ttl}
+        return self._entries
+
+    def _save_entries(self):
+        entries = sorted(self._entries.items(), key=lambda item: -item[1]['time'])
+        self._entries = dict(entries[:RESEARCH_CACHE_MAX_ENTRIES])
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        temp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False)
+        os.replace(temp_path, self.cache_path)
+
+    def _embed(self, text):
+        embedder = get_embedder(logger=self.logger) if RESEARCH_SEMANTIC_MATCH else None
+        return embedder.embed([text])[0] if embedder else None
+
+    def _lookup(self, key, normalized):
+        """
+        Find a cached answer for a query.
+
+        Returns:
+            tuple: (entry, similarity) - entry is None on a miss
+        """
+        with self._lock:
+            entries = self._load_entries()
+            if key in entries:
+                return entries[key], 1.0
+            if not RESEARCH_SEMANTIC_MATCH or not entries:
+                return None, 0.0
+            entries = list(entries.values())
+
+        vector = self._embed(normalized)
+        best, best_similarity = None, 0.0
+        terms = set(tokenize(normalized))
+        for entry in entries:
+            if vector is not None and entry.get('vector'):
+                similarity = sum(a * b for a, b in zip(vector, entry['vector']))
+                threshold = EMBEDDING_SIMILARITY_THRESHOLD
+            else:
+                other = set(tokenize(entry['query']))
+                similarity = len(terms & other) / len(terms | other) if terms | other else 0.0
+                threshold = TERM_SIMILARITY_THRESHOLD
+            if similarity >= threshold and similarity > best_similarity:
+                best, best_similarity = entry, similarity
+        return best, best_similarity
+
+    def _store(self, key, normalized, result):
+        vector = self._embed(normalized)
+        with self._lock:
+            entries = self._load_entries()
+            entries[key] = {'query': normalized, 'result': result, 'time': time.time(), 'vector': vector}
+            try:
+                self._save_entries()
+            except OSError as e:
+                self.logger.warning(f"⚠️ Could not write research cache: {str(e)}")
+
+    async def _fetch(self, query, api_key):
+        """Run one Perplexity request; returns the answer or None on failure."""
+        headers = {
+            "Authorization": f"Bearer {api_key}",
+            "Content-Type": "application/json"
+        }
+        payload = {
+            "model": PERPLEXITY_MODEL,
+            "messages": [
+                {"role": "system", "content": RESEARCH_SYSTEM_PROMPT},
+                {"role": "user", "content": query}
+            ]
+        }
+        try:
+            response = await self._get_client().post(PERPLEXITY_URL, headers=headers, json=payload)
+        except httpx.HTTPError as e:
+            self.logger.warning(f"⚠️ Perplexity API request failed: {str(e)}")
+            return None
+
+        if response.status_code != 200:
+            error_msg = f"Perplexity API call failed with status {response.status_code}"
+            if response.text:
+                error_msg += f": {response.text}"
+            self.logger.warning(f"⚠️ {error_msg}")
+            return None
+        return response.json()["choices"][0]["message"]["content"]
+
+    async def _fetch_and_store(self, query, key, normalized, api_key):
+        result = await self._fetch(query, api_key)
+        if result:
+            await asyncio.to_thread(self._store, key, normalized, result)
+        return result
+
+    async def search(self, query):
+        """
+        Answer a research query, from the cache when possible.
+
+        Args:
+            query (str): Research question
+
+        Returns:
+            str: Research results, or None if the search failed
+
+        Raises:
+            ValueError: If PERPLEXITY_API_KEY is not set
+        """
+        api_key = os.getenv('PERPLEXITY_API_KEY')
+        if not api_key:
+            raise ValueError("Perplexity API key not found in environment variables")
+
+        normalized = normalize_query(query)
+        key = hashlib.sha256(normalized.encode('utf-8')).hexdigest()
+
+        entry, similarity = await asyncio.to_thread(self._lookup, key, normalized)
+        if entry:
+            if entry['query'] != normalized:
+                self.logger.info(f"💾 Reusing research on \"{entry['query']}\" ({similarity:.0%} similar)")
+            else:
+                self.logger.info(f"💾 Reusing cached research for \"{normalized}\"")
+            return entry['result']
+
+        # Identical queries already running share their request
+        self._get_client()
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(self._fetch_and_store(query, key, normalized, api_key))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.logger.debug(f"🔗 Joining research already running for \"{normalized}\"")
+
+        # Shielded: a cancelled caller must not cancel the other waiters' request
+        return await asyncio.shield(task)
+
+
+_service = None
+_service_lock = threading.Lock()
+
+
+def get_research_service():
+    """Return the process-wide ResearchService instance."""
+    global _service
+    with _service_lock:
+        if _service is None:
+            _service = ResearchService()
+        return _service
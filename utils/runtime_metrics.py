@@ -0,0 +1,129 @@
+import time
+import threading
+from collections import deque, Counter
+
+# Observations older than this are dropped
+METRICS_WINDOW = 300  # seconds
+
+
+class RuntimeMetrics:
+    """Process-wide sliding window of runtime observations.
+
+    Managers record LLM calls, aider phases, git lock contention and finished
+    cycles here; the concurrency controller reads aggregated snapshots.
+
+    Attributes:
+        window (float): Age in seconds after which observations are dropped
+    """
+
+    def __init__(self, window=METRICS_WINDOW):
+        self.window = window
+        self._llm_calls = deque()  # (timestamp, latency, status)
+        self._prompt_tokens = deque()  # (timestamp, prompt_tokens, cached_tokens)
+        self._phases = deque()  # (timestamp, duration)
+        self._git_locks = deque()  # (timestamp,)
+        self._cycles = deque()  # (timestamp, duration)
+        self._counters = Counter()  # event name -> count since start
+        self._lock = threading.Lock()
+
+    def _append(self, series, entry):
+        with self._lock:
+            series.append(entry)
+            cutoff = time.time() - self.window
+            while series and series[0][0] < cutoff:
+                series.popleft()
+
+    def record_llm_call(self, latency, status='ok'):
+        """
+        Record a finished LLM call.
+
+        Args:
+            latency (float): Call duration in seconds
+            status (str): 'ok', 'throttled' (429), 'server_error' (5xx) or 'error'
+        """
+        self._append(self._llm_calls, (time.time(), latency, status))
+
+    def record_prompt_tokens(self, prompt_tokens, cached_tokens):
+        """
+        Record the prompt size of a completed LLM call.
+
+        Args:
+            prompt_tokens (int): Prompt tokens billed for the call
+            cached_tokens (int): Prompt tokens served from the provider's prefix cache
+        """
+        self._append(self._prompt_tokens, (time.time(), prompt_tokens, cached_tokens))
+
+    def record_phase(self, duration):
+        """Record the duration of an aider phase in seconds."""
+        self._append(self._phases, (time.time(), duration))
+
+    def record_git_lock_contention(self):
+        """Record a git operation that hit a held index.lock."""
+        self._append(self._git_locks, (time.time(),))
+
+    def record_cycle(self, duration):
+        """Record a completed agent cycle."""
+        self._append(self._cycles, (time.time(), duration))
+
+    def increment(self, name, count=1):
+        """Increment a process-lifetime event counter (hedged requests, circuit trips...)."""
+        with self._lock:
+            self._counters[name] += count
+
+    def counters(self):
+        """Return a copy of the event counters."""
+        with self._lock:
+            return dict(self._counters)
+
+    def snapshot(self, since):
+        """
+        Aggregate observations recorded after a timestamp.
+
+        Args:
+            since (float): Epoch timestamp marking the start of the window
+
+        Returns:
+            dict: llm_calls, llm_error_rate, llm_latency (median), phase_duration
+                (median), prompt_tokens, cached_tokens, prompt_cache_hit_rate,
+                git_lock_contentions, cycles
+        """
+        with self._lock:
+            calls = [c for c in self._llm_calls if c[0] >= since]
+            prompts = [p for p in self._prompt_tokens if p[0] >= since]
+            phases = [p[1] for p in self._phases if p[0] >= since]
+            locks = sum(1 for entry in self._git_locks if entry[0] >= since)
+            cycles = sum(1 for c in self._cycles if c[0] >= since)
+
+        errors = sum(1 for c in calls if c[2] in ('throttled', 'server_error'))
+        prompt_tokens = sum(p[1] for p in prompts)
+        cached_tokens = sum(p[2] for p in prompts)
+        return {
+            'llm_calls': len(calls),
+            'llm_error_rate': errors / len(calls) if calls else 0.0,
+            'llm_latency': _median([c[1] for c in calls if c[2] == 'ok']),
+            'phase_duration': _median(phases),
+            'prompt_tokens': prompt_tokens,
+            'cached_tokens': cached_tokens,
+            'prompt_cache_hit_rate': cached_tokens / prompt_tokens if prompt_tokens else 0.0,
+            'git_lock_contentions': locks,
+            'cycles': cycles,
+        }
+
+
+def _median(values):
+    """Median of a list, or None when empty."""
+    if not values:
+        return None
+    values = sorted(values)
+    middle = len(values) // 2
+    if len(values) % 2:
+        return values[middle]
+    return (values[middle - 1] + values[middle]) / 2
+
+
+_metrics = RuntimeMetrics()
+
+
+def get_runtime_metrics():
+    """Return the process-wide RuntimeMetrics instance."""
+    return _metrics